@@ -13,13 +13,34 @@ import pandas
 import math
 import numpy as np
 import pyqtgraph as pg
-from PyQt5 import QtWidgets, uic
+from PyQt5 import QtCore, QtWidgets, uic
 import threading, time
+from Buffers import ChunkedStore
+from ACCESScript import CompileScript, ScriptRunner
+from Scheduler import Scheduler
 # import collections, struct
 # import gc
 # import cProfile, pstats
 
+# ADC_SetConfig byte 17, scan trigger / clock source
+ADC_TRIGGER_TIMER = 0x01        # Scans clocked by counter 2 (CTR_StartOutputFreq)
+ADC_TRIGGER_EXTERNAL = 0x02
+ADC_TRIGGER_SCAN = 0x04         # Each clock scans all channels from start to end channel
+ADC_TRIGGER_FALLING_EDGE = 0x08
+ADC_TRIGGER_CTR0_EXT = 0x10
+
+# ADC_SetConfig range codes (bytes 0-15, low 3 bits): volts at count 0 and full scale
+ADC_RANGES = {0: (0.0, 10.0), 1: (-10.0, 10.0), 2: (0.0, 5.0), 3: (-5.0, 5.0),
+              4: (0.0, 2.0), 5: (-2.0, 2.0), 6: (0.0, 1.0), 7: (-1.0, 1.0)}
+
+
 class ACCES(QtWidgets.QMainWindow):
+    DataColumns = ['Time', 'XSET', 'YSET', 'ZSET', 'XPOS', 'YPOS']
+    # Emitted by moveAxes from any thread; the sliders follow on the Qt thread
+    SetpointsChanged = QtCore.pyqtSignal()
+    # Emitted by the script thread with the raster being scanned, -1 when a raster ends
+    RasterChanged = QtCore.pyqtSignal(int)
+
     def __init__(self):
         QtWidgets.QMainWindow.__init__(self)
         path = os.path.abspath("") + '\\ACCES\\ACCESui.ui'
@@ -33,13 +54,31 @@ class ACCES(QtWidgets.QMainWindow):
         self.AIOUSB = ctypes.CDLL("AIOUSB")
         self.AIOUSB.ADC_GetChannelV.argtypes = (ctypes.c_ulong, ctypes.c_ulong, ctypes.POINTER(ctypes.c_double))
         self.AIOUSB.ADC_GetChannelV.restype = ctypes.c_ulong
-        self.DAQThread = 0
+        self.Scheduler = Scheduler('ACCES')     # Worker thread polling the board
+        self.Recorder = None    # Recorder.StreamRecorder while RTDAQApp is recording
+        self.DACLock = threading.Lock()
+        self.DataLock = threading.Lock()
 
         # Class attributes
         self.bAcquiring = False
         self.bManual = True
         self.datawindow = 1000
-        self.DataLength = 100000
+        self.PollRate = 100     # Hz, single x-y reads while not scanning
+        self.PlotRate = 30      # Hz
+        # Position history, rows as DataColumns; grows without bound, old blocks spill to disk
+        self.Data = ChunkedStore(len(self.DataColumns))
+        self.ScanRate = 1000    # Hz, x-y position scans clocked by the board
+        self.ScanBlock = 20     # Scans between polls of the bulk transfer
+        self.ScanSeconds = 60   # Scans per bulk transfer, in seconds; the clock stops while the next is armed
+        self.bScanning = False
+        self.ScanErrors = 0     # Bulk transfers that failed part way
+        self.ScansLost = 0      # Scans clocked but not received because of those failures
+        self.ScanRestarts = 0   # Transfers re-armed; sample times are re-anchored at each
+        self.bScanClock = False
+        self.ScanThread = None
+        self.Runner = None      # ACCESScript.ScriptRunner of the running script
+        self.Rasters = []       # Geometry of each raster in the running script, microns
+        self.RasterIndex = -1
         self.SetFiducials(time.time())
 
         # Set stage at zero position
@@ -70,6 +109,16 @@ class ACCES(QtWidgets.QMainWindow):
         self.pz.showGrid(x=True, y=True, alpha=.8)
         self.pz.setLabel('left', 'z-Axis Position', 'microns')
 
+        # Curves are created once and updated in place by DataPlot
+        self.cx = self.px.plot(pen=(0, 0, 255))
+        self.cxset = self.px.plot(pen=(255, 0, 0))
+        self.cy = self.py.plot(pen=(0, 255, 0))
+        self.cyset = self.py.plot(pen=(255, 0, 0))
+        self.czset = self.pz.plot(pen=(255, 0, 0))
+        self.PlotTimer = QtCore.QTimer(self)
+        self.PlotTimer.timeout.connect(self.RefreshPlot)
+        self.PlotTimer.start(int(1000 / self.PlotRate))
+
         self.ui.vsX.setMinimum(0)
         self.ui.vsX.setMaximum(65535)
         self.ui.vsX.setValue(self.xset)
@@ -85,6 +134,7 @@ class ACCES(QtWidgets.QMainWindow):
         self.ui.vsX.valueChanged.connect(self.setPI)
         self.ui.vsY.valueChanged.connect(self.setPI)
         self.ui.vsZ.valueChanged.connect(self.setPI)
+        self.SetpointsChanged.connect(self.SyncSliders)
 
         #Start data acquisition thread
         if self.AIOUSB.DACSetBoardRange(-3, 2):  #2 = 0-10V
@@ -93,6 +143,7 @@ class ACCES(QtWidgets.QMainWindow):
                                                     "USB-AO16-16A Disconnected.")
         else:
             self.bAcquiring = True
+            self.StartScan()
 
         self.bShow = True
         self.MoveToStart()
@@ -122,85 +173,208 @@ class ACCES(QtWidgets.QMainWindow):
             self.ui.lzset.setText(str(float(self.zset*100/65535)))
             self.bManual = True
 
-        if self.bAcquiring:
-            DAQin = ctypes.c_int16()
-            DAQin.value = self.xset
-            result = self.AIOUSB.DACDirect(-3, 0, DAQin)
-            DAQin.value = self.yset
-            result = self.AIOUSB.DACDirect(-3, 1, DAQin)
-            DAQin.value = self.zset
-            result = self.AIOUSB.DACDirect(-3, 2, DAQin)
+        self.WriteDAC()
+
+    def WriteDAC(self, axes=(0, 1, 2)):
+        # Thread safe; no Qt calls so it may run in the acquisition thread
+        if not self.bAcquiring:
+            return
+        with self.DACLock:
+            setpoints = (self.xset, self.yset, self.zset)
+            if hasattr(self.AIOUSB, 'DACMultiDirect'):
+                # All axes in one USB transfer: (channel, counts) pairs
+                data = (ctypes.c_uint16 * (2 * len(axes)))()
+                for i, axis in enumerate(axes):
+                    data[2 * i] = axis
+                    data[2 * i + 1] = int(setpoints[axis])
+                self.AIOUSB.DACMultiDirect(-3, data, len(axes))
+            else:
+                DAQin = ctypes.c_int16()
+                for axis in axes:
+                    DAQin.value = int(setpoints[axis])
+                    self.AIOUSB.DACDirect(-3, axis, DAQin)
 
     def moveAxes(self, dx, dy, dz):
-        self.bManual = False
-
-        self.xset = self.xset + (dx*65535/100)
-        if self.xset > 65535: self.xset = 65535
-        if self.xset < 0: self.xset = 0
-
-        self.yset = self.yset + (dy*65535/100)
-        if self.yset > 65535: self.yset = 65535
-        if self.yset < 0: self.yset = 0
-
-        self.zset = self.zset + (dz*65535/100)
-        if self.zset > 65535: self.zset = 65535
-        if self.zset < 0: self.zset = 0
-
-        self.setPI()
+        # Offsets in microns. Writes the DACs directly and leaves the sliders to SyncSliders,
+        # so it can be called from the acquisition thread (ClosedLoop.EventTrigger).
+        with self.DACLock:
+            self.xset = min(max(self.xset + (dx*65535/100), 0), 65535)
+            self.yset = min(max(self.yset + (dy*65535/100), 0), 65535)
+            self.zset = min(max(self.zset + (dz*65535/100), 0), 65535)
+        self.WriteDAC([axis for axis, d in enumerate((dx, dy, dz)) if d])
+        self.SetpointsChanged.emit()
+
+    def SyncSliders(self):
+        for slider, label, value in ((self.ui.vsX, self.ui.lxset, self.xset),
+                                     (self.ui.vsY, self.ui.lyset, self.yset),
+                                     (self.ui.vsZ, self.ui.lzset, self.zset)):
+            slider.blockSignals(True)
+            slider.setValue(int(value))
+            slider.blockSignals(False)
+            label.setText("{0:.1f}".format(value*100/65535))
 
     def SetFiducials(self, t):
-        self.xsetdata = np.zeros(self.DataLength, dtype=float)
-        self.ysetdata = np.zeros(self.DataLength, dtype=float)
-        self.zsetdata = np.zeros(self.DataLength, dtype=float)
-        self.xdata    = np.zeros(self.DataLength, dtype=float)
-        self.ydata    = np.zeros(self.DataLength, dtype=float)
-        self.t        = np.zeros(self.DataLength, dtype=float)
-        self.t[0]     = t
-        self.ptr      = 1
+        with self.DataLock:
+            self.Data.Clear()
+            self.t0 = t
+
+    def PositionAt(self, t):
+        """Measured x, y (microns) interpolated at times t (s since the fiducial), from recent
+        samples. NaN outside them: positions are never extrapolated past the newest sample."""
+        with self.DataLock:
+            recent = self.Data.Last(self.datawindow)
+            if recent.shape[1] == 0:
+                return np.full(np.shape(t), np.nan), np.full(np.shape(t), np.nan)
+            return (np.interp(t, recent[0], recent[4], left=np.nan, right=np.nan),
+                    np.interp(t, recent[0], recent[5], left=np.nan, right=np.nan))
+
+    def LastTime(self):
+        """Time of the newest position sample, None before the first."""
+        with self.DataLock:
+            return self.Data.LastValue(0)
+
+    def StartScan(self):
+        """Hardware timed x-y scans in long bulk transfers. Leaves bScanning False, and UpdateData
+        reading one sample per call, when the board or driver does not support it."""
+        aio = self.AIOUSB
+        try:
+            aio.ADC_BulkAcquire.argtypes = (ctypes.c_ulong, ctypes.c_ulong, ctypes.c_void_p)
+            aio.ADC_BulkPoll.argtypes = (ctypes.c_ulong, ctypes.POINTER(ctypes.c_ulong))
+            aio.CTR_StartOutputFreq.argtypes = (ctypes.c_ulong, ctypes.c_ulong, ctypes.POINTER(ctypes.c_double))
+        except AttributeError:
+            return False
+        config = (ctypes.c_ubyte * 20)()
+        size = ctypes.c_ulong(len(config))
+        if aio.ADC_GetConfig(-3, config, ctypes.byref(size)):
+            return False
+        config[17] = ADC_TRIGGER_TIMER | ADC_TRIGGER_SCAN
+        config[18] = 0x10       # Start channel 0, end channel 1 (x, y)
+        config[19] = 0          # No oversampling
+        if aio.ADC_SetConfig(-3, config, ctypes.byref(size)) or aio.ADC_SetScanLimits(-3, 0, 1):
+            return False
+        self.ScanVolts = [ADC_RANGES[config[c] & 7] for c in (0, 1)]
+        self.ScanBuffer = np.zeros((int(self.ScanSeconds * self.ScanRate), 2), dtype=np.uint16)
+        self.bScanning = True
+        self.ScanThread = threading.Thread(target=self.ScanLoop, daemon=True)
+        self.ScanThread.start()
+        return True
+
+    def StopScan(self):
+        self.bScanning = False
+        if self.ScanThread is not None:
+            self.ScanThread.join()
+            self.ScanThread = None
+        self.StopScanClock()
+        if self.ScanErrors:
+            print('ACCES bulk transfers failed:', self.ScanErrors, ', scans lost:', self.ScansLost)
+
+    def StopScanClock(self):
+        if self.bScanClock:
+            hz = ctypes.c_double(0)     # 0 Hz halts the counter
+            self.AIOUSB.CTR_StartOutputFreq(-3, 0, ctypes.byref(hz))
+            self.bScanClock = False
+
+    def ScanLoop(self):
+        # Each transfer is armed before the scan clock starts, so it holds every scan from the
+        # first clock on, and scan k is at time.time() tScanStart + (k + 1) / ScanHz; times are
+        # made relative to t0 as they are appended, so a SetFiducials mid-transfer applies. The
+        # clock is stopped while the next transfer is armed, so re-arming loses no scans, only
+        # sampling time.
+        aio = self.AIOUSB
+        buffer = self.ScanBuffer
+        scans = len(buffer)
+        left = ctypes.c_ulong()
+        failures = 0
+        while self.bScanning:
+            if aio.ADC_BulkAcquire(-3, buffer.nbytes, buffer.ctypes.data):
+                break
+            hz = ctypes.c_double(self.ScanRate)
+            if aio.CTR_StartOutputFreq(-3, 0, ctypes.byref(hz)):
+                break
+            tScanStart = time.time()
+            self.bScanClock = True
+            self.ScanHz = hz.value      # Actual scan clock, used for the sample times
+            done = 0
+            while self.bScanning and done < scans:
+                time.sleep(self.ScanBlock / self.ScanHz)
+                if aio.ADC_BulkPoll(-3, ctypes.byref(left)):
+                    # Scans after the last good poll never arrive; they are counted, not appended
+                    clocked = min(int((time.time() - tScanStart) * self.ScanHz), scans)
+                    self.ScanErrors += 1
+                    self.ScansLost += max(clocked - done, 0)
+                    break
+                received = (buffer.nbytes - left.value) // buffer[0].nbytes
+                if received > done:
+                    self.AppendScans(tScanStart, done, received)
+                    done = received
+            self.StopScanClock()
+            failures = failures + 1 if done < scans and self.bScanning else 0
+            if failures >= 3:
+                break
+            if self.bScanning:
+                self.ScanRestarts += 1
+        if self.bScanning:
+            print('ACCES bulk acquisition failed, reading single samples')
+            self.bScanning = False
+
+    def AppendScans(self, tScanStart, start, stop):
+        t = tScanStart + np.arange(start + 1, stop + 1) / self.ScanHz
+        counts = self.ScanBuffer[start:stop]
+        volts = [lo + counts[:, c] * ((hi - lo) / 65535) for c, (lo, hi) in enumerate(self.ScanVolts)]
+        self.AppendSamples(t, volts[0] * 20, volts[1] * 20)  # Convert 0-5V to 0-100um
+
+    def AppendSamples(self, t, x, y):
+        n = len(t)
+        chunk = np.vstack((t,
+                           np.full(n, self.xset*100/65535),
+                           np.full(n, self.yset*100/65535),
+                           np.full(n, self.zset*100/65535),
+                           x,
+                           y))
+        with self.DataLock:
+            chunk[0] -= self.t0     # t is time.time(); t0 read here, where SetFiducials sets it
+            self.Data.Append(chunk)
+        # Outside the lock: Write may block briefly on a slow disk
+        recorder = self.Recorder
+        if recorder is not None:
+            recorder.Write(chunk)
 
     def UpdateData(self):
-        self.t[self.ptr] = time.time() - self.t[0]
-        if self.bAcquiring:
-            data_in = ctypes.c_longdouble()  # double-precision IEEE floating point data from ADC
-            if self.AIOUSB.ADC_GetChannelV(-3, 0, ctypes.byref(data_in)) is 0:
-                self.xdata[self.ptr] = float(data_in.value) * 20  # Convert 0-5V to 0-100nm
-            else:
-                self.xdata[self.ptr] = 0
-            if self.AIOUSB.ADC_GetChannelV(-3, 1, ctypes.byref(data_in)) is 0:
-                self.ydata[self.ptr] = float(data_in.value) * 20
-            else:
-                self.ydata[self.ptr] = 0
-
-        if __debug__ and not self.bAcquiring:
-            self.xdata[self.ptr] = (math.sin(self.t[self.ptr]) + 1) * 50
-            self.ydata[self.ptr] = (math.cos(self.t[self.ptr]) + 1) * 50
-
-        self.xsetdata[self.ptr] = self.xset*100/65535
-        self.ysetdata[self.ptr] = self.yset*100/65535
-        self.zsetdata[self.ptr] = self.zset*100/65535
-
-        if self.ptr > self.datawindow:
-            self.DataPlot(self.t[self.ptr-self.datawindow:self.ptr],
-                          self.xdata[self.ptr-self.datawindow:self.ptr],
-                          self.xsetdata[self.ptr-self.datawindow:self.ptr],
-                          self.ydata[self.ptr-self.datawindow:self.ptr],
-                          self.ysetdata[self.ptr-self.datawindow:self.ptr],
-                          self.zsetdata[self.ptr-self.datawindow:self.ptr])
-
-        self.ptr = self.ptr + 1
-
-    def DataAcquisitionThread(self):
-        self.SetFiducials(time.time())
-        while True:
-            time.sleep(.01)
-            self.UpdateData()
+        if not self.bScanning:
+            t = time.time()
+            x = y = 0
+            if self.bAcquiring:
+                data_in = ctypes.c_longdouble()  # double-precision IEEE floating point data from ADC
+                if self.AIOUSB.ADC_GetChannelV(-3, 0, ctypes.byref(data_in)) is 0:
+                    x = float(data_in.value) * 20  # Convert 0-5V to 0-100nm
+                if self.AIOUSB.ADC_GetChannelV(-3, 1, ctypes.byref(data_in)) is 0:
+                    y = float(data_in.value) * 20
+
+            if __debug__ and not self.bAcquiring:
+                x = (math.sin(t - self.t0) + 1) * 50
+                y = (math.cos(t - self.t0) + 1) * 50
+            self.AppendSamples([t], [x], [y])
+
+    def StartAcquisition(self):
+        # Polling runs in this device's own thread, so slow AIOUSB calls delay nothing else.
+        # The poll is a no-op while bulk scans run, and takes over if they stop.
+        self.Scheduler.Add('UpdateData', self.UpdateData, 1 / self.PollRate)
+        self.Scheduler.Start()
+
+    def RefreshPlot(self):
+        # Runs on the Qt thread at PlotRate
+        with self.DataLock:
+            if len(self.Data) <= self.datawindow:
+                return
+            t, xset, yset, zset, x, y = self.Data.Last(self.datawindow).copy()
+        self.DataPlot(t, x, xset, y, yset, zset)
 
     def DataPlot(self, t, x1, x2, y1, y2, z2):
-        self.px.plot(x=t, y=x1, pen=(0, 0, 255), clear=True, _callSync='off')
-        self.px.plot(x=t, y=x2, pen=(255, 0, 0), clear=False, _callSync='off')
-        self.py.plot(x=t, y=y1, pen=(0, 255, 0), clear=True, _callSync='off')
-        self.py.plot(x=t, y=y2, pen=(255, 0, 0), clear=False, _callSync='off')
-        self.pz.plot(x=t, y=z2, pen=(255, 0, 0), clear=True, _callSync='off')
+        self.cx.setData(x=t, y=x1, _callSync='off')
+        self.cxset.setData(x=t, y=x2, _callSync='off')
+        self.cy.setData(x=t, y=y1, _callSync='off')
+        self.cyset.setData(x=t, y=y2, _callSync='off')
+        self.czset.setData(x=t, y=z2, _callSync='off')
 
     def OpenScriptDialog(self):
         self.filename = QtWidgets.QFileDialog.getOpenFileName(self,
@@ -213,51 +387,40 @@ class ACCES(QtWidgets.QMainWindow):
             self.ExecuteScript()
 
     def ExecuteScript(self):
-        rows = self.scriptfile.shape[0]
-        self.script = self.scriptfile.as_matrix()
-        for i in range(rows):
-            cmd = self.script[i][0]
-            if cmd != 'loop':
-                self.ExecuteCmd(cmd, 0, i)
-            else:
-                nRepeat = int(self.script[i][1])
-                start = i + 1
-                for j in range(nRepeat):
-                    k = 0
-                    while str(self.script[start+k][0]) == '' and self.script[start+k][1]:
-                        cmd = self.script[start+k][1]
-                        self.ExecuteCmd(cmd, 1, start+k)
-                        k += 1
-                i = i + k
-
-    def ExecuteCmd(self, cmd, nIndent, i):
-        if cmd == 'wait':
-            pause = float(self.script[i][1+nIndent]) / 1000 #wait in milliseconds
-            time.sleep(pause)
-        elif cmd == 'absolute':
-            axis = self.script[i][1+nIndent]
-            temp = float(self.script[i][2+nIndent])/1000 #script distances in nanometers
-            if axis == 'x':
-                self.xset = temp
-            elif axis == 'y':
-                self.yset = temp
-            else:
-                self.zset = temp
-            self.setPI()
-        elif cmd == 'relative':
-            axis = self.script[i][1+nIndent]
-            temp = float(self.script[i][2+nIndent]) / 1000
-            if axis == 'x':
-                self.xset = self.xset + temp
-            elif axis == 'y':
-                self.yset = self.yset + temp
-            else:
-                self.zset = self.zset + temp
-            self.setPI()
+        # Compiled once, then played back off the Qt thread
+        self.script = self.scriptfile.values
+        rasters = []
+        steps, duration = CompileScript(self.script, (self.xset, self.yset, self.zset), rasters)
+        if self.Runner is not None:
+            self.Runner.Stop()
+        self.Rasters = rasters
+        self.Runner = ScriptRunner(steps, duration, self.ApplySetpoints, self.ScriptDone)
+        self.Runner.Start()
+
+    def ApplySetpoints(self, step, axes):
+        # Script set-points in DAC counts; called from the script thread
+        with self.DACLock:
+            self.xset, self.yset, self.zset = (int(round(v)) for v in step['setpoints'])
+        self.WriteDAC(axes)
+        self.SetpointsChanged.emit()
+        if step['raster'] != self.RasterIndex:
+            self.RasterIndex = int(step['raster'])
+            self.RasterChanged.emit(self.RasterIndex)
+
+    def ScriptDone(self, runner):
+        if self.RasterIndex != -1:
+            self.RasterIndex = -1
+            self.RasterChanged.emit(-1)
+        print("Script finished:", runner.Report())
 
     def closeEvent(self, event):
+        if self.Runner is not None:
+            self.Runner.Stop()
+        self.PlotTimer.stop()
+        self.Scheduler.Stop()
+        self.StopScan()
+        self.Data.Close()
         self.bAcquiring = False
-        if self.DAQThread and self.DAQThread != None:
-            self.DAQThread.join()
+        print("ACCES polling:", self.Scheduler.Summary())
         event.accept()
 
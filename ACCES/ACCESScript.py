@@ -0,0 +1,142 @@
+""" ACCESScript.py
+Demonpore stage scripts for the ACCES nanopositioner
+A script (CSV) is compiled once into a timeline of set-points and played back
+by a worker thread against absolute perf_counter deadlines, so timing errors
+do not accumulate over waits and loops.
+Script rows:
+    wait, <ms>
+    absolute, <x|y|z>, <nm>
+    relative, <x|y|z>, <nm>
+    loop, <n>               followed by the rows to repeat, indented one column
+    raster, <nx>, <ny>, <width nm>, <height nm>, <dwell ms>
+                            serpentine x-y raster from the current x-y set-point
+"""
+
+import threading, time
+import numpy as np
+from RasterScan import Serpentine
+
+COUNTS_PER_MICRON = 65535 / 100     # 16 bit DAC over the 100 um stage range
+AXES = {'x': 0, 'y': 1, 'z': 2}
+
+# One row per set-point change
+StepType = np.dtype([('row', 'i4'),             # Script row the step came from
+                     ('planned', 'f8'),         # s from the start of the run
+                     ('actual', 'f8'),          # s from the start of the run, after the DAC write
+                     ('setpoints', 'f8', (3,)),     # DAC counts x, y, z
+                     ('raster', 'i4')])         # Index into the compiled rasters, -1 outside rasters
+
+
+def CompileScript(script, start=(0, 0, 0), rasters=None):
+    """Timeline of a script (2D array of cells, as read with pandas) starting from
+    set-points `start` in DAC counts. Returns (steps, duration). The geometry of each
+    raster, in microns, is appended to `rasters` if a list is given."""
+    if rasters is None:
+        rasters = []
+    setpoints = np.array(start, dtype=float)
+    steps = []
+    now = 0.0
+
+    def Command(row, cells):
+        nonlocal now
+        cmd = cells[0]
+        if cmd == 'wait':
+            now += float(cells[1]) / 1000          # wait in milliseconds
+        elif cmd in ('absolute', 'relative'):
+            axis = AXES.get(cells[1], 2)
+            counts = float(cells[2]) / 1000 * COUNTS_PER_MICRON     # script distances in nanometers
+            if cmd == 'relative':
+                counts += setpoints[axis]
+            setpoints[axis] = min(max(counts, 0), 65535)
+            steps.append((row, now, np.nan, setpoints.copy(), -1))
+        elif cmd == 'raster':
+            nx, ny = int(cells[1]), int(cells[2])
+            geometry = {'nx': nx, 'ny': ny,
+                        'x0': float(setpoints[0]) / COUNTS_PER_MICRON, 'y0': float(setpoints[1]) / COUNTS_PER_MICRON,
+                        'width': float(cells[3]) / 1000, 'height': float(cells[4]) / 1000}
+            dwell = float(cells[5]) / 1000
+            x, y = Serpentine(nx, ny, geometry['x0'], geometry['y0'], geometry['width'], geometry['height'])
+            for k in range(nx * ny):
+                setpoints[0] = min(max(x[k] * COUNTS_PER_MICRON, 0), 65535)
+                setpoints[1] = min(max(y[k] * COUNTS_PER_MICRON, 0), 65535)
+                steps.append((row, now + k * dwell, np.nan, setpoints.copy(), len(rasters)))
+            now += nx * ny * dwell
+            rasters.append(geometry)
+
+    i = 0
+    while i < len(script):
+        cmd = script[i][0]
+        if cmd == 'loop':
+            nRepeat = int(script[i][1])
+            body = []
+            k = i + 1
+            while k < len(script) and str(script[k][0]) == '' and script[k][1]:
+                body.append(k)
+                k += 1
+            for j in range(nRepeat):
+                for row in body:
+                    Command(row, script[row][1:])
+            i = k
+        else:
+            Command(i, script[i])
+            i += 1
+    return np.array(steps, dtype=StepType), now
+
+
+class ScriptRunner:
+    def __init__(self, steps, duration, apply, done=None, spin=0):
+        """apply    Callable (step, axes) writing the DACs; runs in the worker thread
+        done        Optional callable (runner) at the end of the run, in the worker thread
+        spin        Seconds before each deadline to stop sleeping and poll the clock, yielding
+                    the GIL; 0 leaves the timing to the OS timer, a poll costs a core"""
+        self.Steps = steps.copy()
+        self.Duration = duration
+        self.apply = apply
+        self.done = done
+        self.spin = spin
+        self.StopEvent = threading.Event()
+        self.Thread = None
+
+    def Start(self):
+        self.StopEvent.clear()
+        self.Thread = threading.Thread(target=self.Run, daemon=True)
+        self.Thread.start()
+
+    def Stop(self):
+        self.StopEvent.set()
+        if self.Thread is not None:
+            self.Thread.join()
+            self.Thread = None
+
+    def Run(self):
+        previous = None
+        t0 = time.perf_counter()
+        for step in self.Steps:
+            # Absolute deadlines from t0: a late step does not delay the ones after it
+            deadline = t0 + step['planned']
+            remaining = deadline - time.perf_counter()
+            if remaining > self.spin and self.StopEvent.wait(remaining - self.spin):
+                break
+            while time.perf_counter() < deadline:
+                time.sleep(0)
+            axes = [a for a in range(3) if previous is None or step['setpoints'][a] != previous[a]]
+            self.apply(step, axes)
+            step['actual'] = time.perf_counter() - t0
+            previous = step['setpoints']
+        # A trailing wait is part of the script: done fires at the end of the timeline
+        remaining = t0 + self.Duration - time.perf_counter()
+        if remaining > 0:
+            self.StopEvent.wait(remaining)
+        if self.done is not None:
+            self.done(self)
+
+    def Report(self):
+        """Lateness of the executed steps in ms."""
+        done = self.Steps[~np.isnan(self.Steps['actual'])]
+        late = (done['actual'] - done['planned']) * 1e3
+        if len(late) == 0:
+            return {'steps': 0}
+        return {'steps': len(done),
+                'mean_ms': float(late.mean()),
+                'p99_ms': float(np.percentile(late, 99)),
+                'max_ms': float(late.max())}
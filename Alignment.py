@@ -0,0 +1,92 @@
+""" Alignment.py
+Timestamp alignment of multi-rate streams for RTDAQ-32bit
+Every stream keeps its native rate and its own time column (seconds since
+the RTDAQApp fiducial). Merged output is produced on demand, block by block,
+by resampling each stream onto the timestamps of a chosen master stream:
+    'interp'    linear interpolation (continuous signals, e.g. XPOS)
+    'asof'      last value at or before the master timestamp (set-points)
+Only the slice of each stream overlapping the current master block is read,
+so memory-mapped recordings are never loaded as a whole.
+"""
+
+import numpy as np
+from Recorder import ReadRecording
+
+
+class Stream:
+    def __init__(self, name, t, data, columns, methods='interp'):
+        self.name = name
+        self.t = t                  # (rows,) non-decreasing
+        self.data = data            # (rows, len(columns))
+        self.columns = list(columns)
+        if isinstance(methods, str):
+            methods = [methods] * len(self.columns)
+        self.methods = list(methods)
+
+    def __len__(self):
+        return len(self.t)
+
+    def Window(self, t0, t1):
+        # Index range covering [t0, t1] plus one sample either side for interpolation
+        lo = max(int(np.searchsorted(self.t, t0, side='right')) - 1, 0)
+        hi = min(int(np.searchsorted(self.t, t1, side='left')) + 1, len(self.t))
+        return lo, hi
+
+    def Resample(self, tm):
+        """Values of every column at master timestamps tm, shaped (len(tm), columns).
+        NaN where the stream has no sample to interpolate from / hold."""
+        out = np.full((len(tm), len(self.columns)), np.nan)
+        if len(tm) == 0 or len(self.t) == 0:
+            return out
+        lo, hi = self.Window(tm[0], tm[-1])
+        tw = np.asarray(self.t[lo:hi], dtype=float)
+        dw = np.asarray(self.data[lo:hi], dtype=float)
+        if len(tw) == 0:
+            return out
+        idx = np.searchsorted(tw, tm, side='right') - 1
+        held = idx >= 0
+        for c, method in enumerate(self.methods):
+            if method == 'asof':
+                out[held, c] = dw[idx[held], c]
+            else:
+                out[:, c] = np.interp(tm, tw, dw[:, c], left=np.nan, right=np.nan)
+        return out
+
+
+def StreamFromRecording(name, filename, timecolumn=0, methods='interp'):
+    """Stream over a Recorder recording; column `timecolumn` is the timebase."""
+    columns, data = ReadRecording(filename)
+    keep = [c for c in range(len(columns)) if c != timecolumn]
+    if isinstance(methods, dict):
+        methods = [methods.get(columns[c], 'interp') for c in keep]
+    return Stream(name, data[:, timecolumn], data[:, keep], [columns[c] for c in keep], methods)
+
+
+def MergedColumns(master, streams):
+    columns = ['Time'] + master.columns
+    for stream in streams:
+        columns += stream.columns
+    return columns
+
+
+def Align(master, streams, start=0, stop=None, step=1, blocksize=65536):
+    """Yields (t, block) with block shaped (n, len(MergedColumns) - 1) for
+    every step-th master row in [start, stop), blocksize rows at a time."""
+    if stop is None:
+        stop = len(master)
+    for i in range(start, stop, blocksize * step):
+        j = min(i + blocksize * step, stop)
+        tm = np.asarray(master.t[i:j:step], dtype=float)
+        parts = [np.asarray(master.data[i:j:step], dtype=float)]
+        for stream in streams:
+            parts.append(stream.Resample(tm))
+        yield tm, np.hstack(parts)
+
+
+def WriteCSV(filename, master, streams, start=0, stop=None, step=1, blocksize=65536, fmt='%.10g'):
+    """Text export of Align(); slow at full PCA rate, so run it off the GUI thread
+    and use start/stop/step for a window or a decimated export."""
+    with open(filename, 'w') as f:
+        f.write(','.join(MergedColumns(master, streams)) + '\n')
+        for tm, block in Align(master, streams, start, stop, step, blocksize):
+            np.savetxt(f, np.column_stack((tm, block)), delimiter=',', fmt=fmt)
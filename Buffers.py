@@ -0,0 +1,337 @@
+""" Buffers.py
+Shared sample storage for RTDAQ-32bit
+    RingBuffer      Fixed-capacity, multi-column sample history
+    ChunkQueue      Bounded producer/consumer hand-off of sample chunks
+    TripleBuffer    Latest-wins hand-off of fixed-size frames
+    MinMaxPyramid   Multi-level min/max decimation for live plots
+    ChunkedStore    Unbounded multi-column history in fixed blocks, spilled to disk
+"""
+
+import collections
+import os
+import tempfile
+import threading
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-capacity ring of `columns` x `capacity` samples.
+
+    Samples are kept contiguous in a backing array twice the capacity, so the
+    most recent samples are always available as a zero-copy view. When the
+    write position reaches the end of the backing array the newest `capacity`
+    samples are moved back to the front, which keeps append O(1) amortized.
+    Views returned by Last()/View() are only valid until the next Append().
+    """
+    def __init__(self, capacity, columns=1, dtype=np.float64):
+        self.capacity = int(capacity)
+        self.columns = int(columns)
+        self.buffer = np.zeros((self.columns, 2 * self.capacity), dtype=dtype)
+        self.Clear()
+
+    def Clear(self):
+        self.start = 0      # Index of oldest held sample in self.buffer
+        self.end = 0        # One past the newest held sample
+        self.total = 0      # Samples appended since Clear(), including overwritten ones
+
+    def __len__(self):
+        return self.end - self.start
+
+    def Append(self, chunk):
+        """Append samples shaped (columns, n), or (n,) for single-column buffers."""
+        chunk = np.asarray(chunk)
+        if chunk.ndim == 1:
+            chunk = chunk.reshape(self.columns, -1)
+        n = chunk.shape[1]
+        if n == 0:
+            return
+        self.total += n
+        if n >= self.capacity:
+            self.buffer[:, :self.capacity] = chunk[:, n - self.capacity:]
+            self.start, self.end = 0, self.capacity
+            return
+        if self.end + n > self.buffer.shape[1]:
+            keep = min(len(self), self.capacity - n)
+            self.buffer[:, :keep] = self.buffer[:, self.end - keep:self.end]
+            self.start, self.end = 0, keep
+        self.buffer[:, self.end:self.end + n] = chunk
+        self.end += n
+        if self.end - self.start > self.capacity:
+            self.start = self.end - self.capacity
+
+    def View(self):
+        """Zero-copy view of every held sample, shaped (columns, len)."""
+        return self.buffer[:, self.start:self.end]
+
+    def Last(self, n):
+        """Zero-copy view of the newest n samples (fewer if not yet available)."""
+        n = min(int(n), len(self))
+        return self.buffer[:, self.end - n:self.end]
+
+    def LastValue(self, column=0):
+        if self.end == self.start:
+            return None
+        return self.buffer[column, self.end - 1]
+
+
+class ChunkQueue:
+    """Bounded single-producer/single-consumer queue of sample chunks.
+
+    Put() never blocks: when the consumer falls behind the oldest chunk is
+    discarded (and counted in self.dropped), so the producer always runs at
+    full rate and the consumer always sees the newest data.
+    """
+    def __init__(self, maxchunks=64):
+        self.chunks = collections.deque(maxlen=maxchunks)
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def Put(self, chunk):
+        if len(self.chunks) == self.chunks.maxlen:
+            self.dropped += 1
+        self.chunks.append(chunk)
+
+    def Get(self):
+        try:
+            return self.chunks.popleft()
+        except IndexError:
+            return None
+
+    def GetAll(self):
+        chunks = []
+        chunk = self.Get()
+        while chunk is not None:
+            chunks.append(chunk)
+            chunk = self.Get()
+        return chunks
+
+
+class TripleBuffer:
+    """Latest-wins single-producer/single-consumer hand-off of fixed-size arrays.
+
+    Three preallocated arrays rotate between the producer's back buffer, the
+    newest published buffer and the consumer's front buffer. Neither side
+    waits for the other or allocates: the producer fills Back() and
+    Publish()es it, and a buffer the consumer did not Take() in time is
+    overwritten (and counted in self.dropped).
+    """
+    def __init__(self, shape, dtype=np.uint8):
+        self.buffers = [np.zeros(shape, dtype=dtype) for k in range(3)]
+        self.info = [None] * 3
+        self.lock = threading.Lock()
+        self.back, self.ready, self.front = 0, 1, 2
+        self.bNew = False
+        self.published = 0
+        self.dropped = 0
+
+    def Back(self):
+        return self.buffers[self.back]
+
+    def Publish(self, info=None):
+        """Hands the filled back buffer over; info (e.g. a frame timestamp) travels with it."""
+        with self.lock:
+            self.info[self.back] = info
+            self.back, self.ready = self.ready, self.back
+            if self.bNew:
+                self.dropped += 1
+            self.bNew = True
+            self.published += 1
+
+    def Take(self):
+        """(array, info) of the newest published buffer, or (None, None) if nothing
+        new was published. The array is valid until the next Take()."""
+        with self.lock:
+            if not self.bNew:
+                return None, None
+            self.front, self.ready = self.ready, self.front
+            self.bNew = False
+        return self.buffers[self.front], self.info[self.front]
+
+
+class MinMaxPyramid:
+    """Incrementally maintained min/max decimation of a (time + channels) stream.
+
+    Level 0 keeps the newest raw samples. Level k keeps, for consecutive blocks
+    of factor**k raw samples, the block start time and the min and max of every
+    channel. Window() picks the coarsest level that still gives at least one
+    block per output point, so a plot of any window length costs at most two
+    points per pixel column and narrow spikes survive the decimation.
+    """
+    def __init__(self, maxwindow, channels, maxpoints=4096, factor=4):
+        self.channels = channels
+        self.factor = factor
+        self.maxpoints = maxpoints
+        self.total = 0
+        self.Raw = RingBuffer(maxpoints, 1 + channels)
+        # Output of Window(), reused so live plots do not allocate per refresh
+        self.tOut = np.zeros(2 * maxpoints)
+        self.yOut = np.zeros((channels, 2 * maxpoints))
+        self.Levels = [None]
+        self.carry = [None]
+        blocksize = factor
+        while True:
+            # rows: block start time, min per channel, max per channel
+            self.Levels.append(RingBuffer(maxpoints * factor, 1 + 2 * channels))
+            self.carry.append(np.zeros((1 + 2 * channels, 0)))
+            if maxpoints * factor * blocksize >= maxwindow:
+                break
+            blocksize *= factor
+
+    def Clear(self):
+        self.total = 0
+        self.Raw.Clear()
+        for k in range(1, len(self.Levels)):
+            self.Levels[k].Clear()
+            self.carry[k] = self.carry[k][:, :0]
+
+    def Append(self, chunk):
+        """Append samples shaped (1 + channels, n), time in row 0."""
+        chunk = np.asarray(chunk, dtype=float)
+        self.total += chunk.shape[1]
+        self.Raw.Append(chunk)
+        c = self.channels
+        # Level 0 expressed as blocks of one sample: min == max == value
+        blocks = np.vstack((chunk, chunk[1:]))
+        for k in range(1, len(self.Levels)):
+            blocks = np.hstack((self.carry[k], blocks))
+            m = (blocks.shape[1] // self.factor) * self.factor
+            self.carry[k] = blocks[:, m:]
+            if m == 0:
+                break
+            grouped = blocks[:, :m].reshape(blocks.shape[0], -1, self.factor)
+            blocks = np.vstack((grouped[0, :, 0],
+                                grouped[1:1 + c].min(axis=2),
+                                grouped[1 + c:].max(axis=2)))
+            self.Levels[k].Append(blocks)
+
+    def Window(self, n, points):
+        """Newest n samples decimated to at most 2 * points values per channel.
+        Returns (t, y) with y shaped (channels, len(t)). Like RingBuffer views,
+        the arrays are only valid until the next Append() or Window()."""
+        n = min(int(n), self.total)
+        points = max(1, min(int(points), self.maxpoints))
+        if n <= points:
+            raw = self.Raw.Last(n)
+            return raw[0], raw[1:]
+        k, blocksize = 1, self.factor
+        while k < len(self.Levels) - 1 and -(-n // blocksize) > points:
+            k += 1
+            blocksize *= self.factor
+        level = self.Levels[k].Last(-(-n // blocksize))
+        c = self.channels
+        if level.shape[1] > points:
+            # Window longer than the coarsest level resolves at this width: merge its blocks further
+            g = -(-level.shape[1] // points)
+            level = level[:, level.shape[1] % g:].reshape(level.shape[0], -1, g)
+            level = np.vstack((level[0, :, 0], level[1:1 + c].min(axis=2), level[1 + c:].max(axis=2)))
+        m = 2 * level.shape[1]
+        t = self.tOut[:m]
+        y = self.yOut[:, :m]
+        t[0::2] = level[0]
+        t[1::2] = level[0]
+        y[:, 0::2] = level[1:1 + c]
+        y[:, 1::2] = level[1 + c:]
+        return t, y
+
+
+class ChunkedStore:
+    """Unbounded history of `columns` x n samples in fixed-size blocks.
+
+    Append is O(1): samples go into the newest block and a new block is
+    allocated when it fills. Only the newest `hotblocks` blocks stay in memory;
+    older full blocks are appended to a spill file and read back through a
+    memory map when a window touches them. Views returned by Last() are only
+    valid until the next Append().
+    """
+    def __init__(self, columns, blocksize=65536, hotblocks=16, dtype=np.float64, spilldir=None):
+        self.columns = int(columns)
+        self.blocksize = int(blocksize)
+        self.hotblocks = max(int(hotblocks), 1)
+        self.dtype = np.dtype(dtype)
+        self.spilldir = spilldir
+        self.SpillFileName = None
+        self.spillfile = None
+        self.Clear()
+
+    def Clear(self):
+        self.blocks = []        # (columns, blocksize) arrays, or None once spilled
+        self.spilled = 0        # Leading blocks held in the spill file
+        self.spillmap = None
+        self.count = 0
+        if self.spillfile is not None:
+            self.spillfile.close()
+            self.spillfile = None
+        if self.SpillFileName is not None:
+            os.remove(self.SpillFileName)
+            self.SpillFileName = None
+
+    def Close(self):
+        self.spillmap = None
+        self.Clear()
+
+    def __len__(self):
+        return self.count
+
+    def Append(self, chunk):
+        """Append samples shaped (columns, n)."""
+        chunk = np.asarray(chunk, dtype=self.dtype).reshape(self.columns, -1)
+        n = chunk.shape[1]
+        i = 0
+        while i < n:
+            offset = self.count % self.blocksize
+            if offset == 0:
+                self.blocks.append(np.empty((self.columns, self.blocksize), dtype=self.dtype))
+                if len(self.blocks) - self.spilled > self.hotblocks:
+                    self.Spill()
+            m = min(n - i, self.blocksize - offset)
+            self.blocks[-1][:, offset:offset + m] = chunk[:, i:i + m]
+            self.count += m
+            i += m
+
+    def Spill(self):
+        # Move the oldest in-memory block to the end of the spill file
+        if self.spillfile is None:
+            fd, self.SpillFileName = tempfile.mkstemp(prefix='chunks_', suffix='.dat', dir=self.spilldir)
+            self.spillfile = os.fdopen(fd, 'wb')
+        self.spillfile.write(self.blocks[self.spilled].tobytes())
+        self.spillfile.flush()
+        self.blocks[self.spilled] = None
+        self.spilled += 1
+        self.spillmap = None
+
+    def Block(self, k):
+        if self.blocks[k] is not None:
+            return self.blocks[k]
+        if self.spillmap is None:
+            self.spillmap = np.memmap(self.SpillFileName, dtype=self.dtype, mode='r',
+                                      shape=(self.spilled, self.columns, self.blocksize))
+        return self.spillmap[k]
+
+    def Window(self, start, stop):
+        """Samples [start, stop) shaped (columns, stop - start). A view when they
+        lie in one block, otherwise a copy."""
+        start = max(int(start), 0)
+        stop = min(int(stop), self.count)
+        if stop <= start:
+            return np.zeros((self.columns, 0), dtype=self.dtype)
+        first, last = start // self.blocksize, (stop - 1) // self.blocksize
+        if first == last:
+            offset = first * self.blocksize
+            return self.Block(first)[:, start - offset:stop - offset]
+        parts = []
+        for k in range(first, last + 1):
+            offset = k * self.blocksize
+            parts.append(self.Block(k)[:, max(start - offset, 0):min(stop - offset, self.blocksize)])
+        return np.hstack(parts)
+
+    def Last(self, n):
+        """Newest n samples (fewer if not yet available)."""
+        return self.Window(self.count - int(n), self.count)
+
+    def LastValue(self, column=0):
+        if self.count == 0:
+            return None
+        offset = (self.count - 1) % self.blocksize
+        return self.blocks[-1][column, offset]
@@ -0,0 +1,68 @@
+""" ClosedLoop.py
+Event to nanopositioner path for RTDAQ-32bit
+EventTrigger is called by EDLReader in the acquisition thread with the events
+found in each chunk and moves the stage by the preset offsets straight away,
+through a callable that writes the DACs without touching Qt. The latency from
+detection to the completed DAC write is recorded for every trigger.
+"""
+
+import threading, time
+import numpy as np
+from Buffers import RingBuffer
+
+
+class EventTrigger:
+    def __init__(self, move, holdoff=0.1, budget=0.005, history=10000):
+        """move     Callable (dx, dy, dz) in microns that writes the DACs
+        holdoff     Seconds after a trigger during which further events are ignored
+        budget      Latency budget in seconds; triggers over it are counted in Overruns"""
+        self.move = move
+        self.Holdoff = holdoff
+        self.Budget = budget
+        self.Lock = threading.Lock()
+        self.Offsets = (0.0, 0.0, 0.0)
+        self.Channels = None            # Channels (1-4) that may trigger, None for all
+        self.bEnabled = False
+        self.tLastTrigger = -np.inf
+        # rows: event start time (s since fiducial), perf_counter at trigger (s), latency (s)
+        self.Latencies = RingBuffer(history, 3)
+        self.Triggers = 0
+        self.Overruns = 0
+        self.Ignored = 0
+
+    def SetMove(self, dx, dy, dz):
+        self.Offsets = (float(dx), float(dy), float(dz))
+        self.bEnabled = any(self.Offsets)
+
+    def OnEvents(self, events, tDetect):
+        """events as EventDetector.EventType, tDetect perf_counter_ns() at detection."""
+        if not self.bEnabled or len(events) == 0:
+            return False
+        if self.Channels is not None:
+            events = events[np.isin(events['channel'], self.Channels)]
+            if len(events) == 0:
+                return False
+        now = time.perf_counter()
+        if now - self.tLastTrigger < self.Holdoff:
+            self.Ignored += len(events)
+            return False
+        self.tLastTrigger = now
+        self.move(*self.Offsets)
+        latency = (time.perf_counter_ns() - tDetect) * 1e-9
+        with self.Lock:
+            self.Latencies.Append([[events['tStart'][0]], [now], [latency]])
+            self.Triggers += 1
+            if latency > self.Budget:
+                self.Overruns += 1
+        return True
+
+    def Summary(self):
+        """Trigger count, overruns and latency percentiles in ms."""
+        with self.Lock:
+            latency = np.array(self.Latencies.View()[2]) * 1e3
+        summary = {'triggers': self.Triggers, 'overruns': self.Overruns, 'ignored': self.Ignored}
+        if len(latency):
+            summary.update({'p50_ms': float(np.percentile(latency, 50)),
+                            'p99_ms': float(np.percentile(latency, 99)),
+                            'max_ms': float(latency.max())})
+        return summary
@@ -7,12 +7,18 @@ Latest revision, June 2019
 """
 
 import os
-import edl_py
+try:
+    import edl_py
+except ImportError:
+    # No e4 driver on this machine (e.g. Linux): use the simulated device
+    import edl_py_sim as edl_py
 import edl_py_constants as epc
 from localtools import ElementsData
+from EDLReader import EDLReader
+from Buffers import MinMaxPyramid
 import pyqtgraph as pg
 import numpy as np
-from PyQt5 import QtWidgets, uic
+from PyQt5 import QtCore, QtWidgets, uic
 import threading, time
 
 class EDL(QtWidgets.QMainWindow):
@@ -28,17 +34,23 @@ class EDL(QtWidgets.QMainWindow):
         self.ui.setupUi(self)
         self.bRun = True
         self.bAcquiring = False
-        self.DAQThread = None
 
 
         # Class attributes
         self.datawindow = 1000
         self.maxData = 1000000
+        self.PlotRate = 30  # Hz
         self.DetectionThreshold = 0
         self.LatestPackets = 0
 
-        # Initialize EDL class object
+        # Initialize EDL class object, reader thread owns all data reads
         self.edl = edl_py.EDL_PY()
+        self.Reader = EDLReader(self.edl, self.maxData)
+        self.Data = self.Reader.Data
+        # Min/max decimated history for display, filled from the reader's queue on the Qt side.
+        # datawindow (samples) may be anything up to maxData; the plot cost depends only on its width.
+        self.PlotData = MinMaxPyramid(self.maxData, epc.EDL_PY_CHANNEL_NUM)
+        self.bClearPlot = False
 
         # String list to collect detected devices
         self.devices = [""] * 0
@@ -49,7 +61,7 @@ class EDL(QtWidgets.QMainWindow):
         self.ui.sbVhold.setValue(0)
         self.Range = epc.EDL_PY_RADIO_RANGE_200_NA
         self.SR = epc.EDL_PY_RADIO_SAMPLING_RATE_1_25_KHZ
-        self.t_step = 1 / 100
+        self.t_step = epc.EDL_PY_SAMPLING_PERIODS[self.SR]
         self.BandwidthDivisor = epc.EDL_PY_RADIO_FINAL_BANDWIDTH_SR_2
         self.UpdateSettings()
         self.SetPotential()
@@ -144,9 +156,22 @@ class EDL(QtWidgets.QMainWindow):
         self.p4.setLabel('left', 'CHANNEL 4', 'nA')
         #self.p4.addLegend()
 
+        # One curve per trace, created once and updated in place by DataPlot
+        self.Curves = [self.p0.plot(pen=(127, 127, 127)),
+                       self.p1.plot(pen=(0, 0, 255)),
+                       self.p2.plot(pen=(0, 255, 0)),
+                       self.p3.plot(pen=(255, 0, 0)),
+                       self.p4.plot(pen=(255, 0, 255))]
+        self.CurveChecks = [self.ui.showVhold, self.ui.showCh1, self.ui.showCh2, self.ui.showCh3, self.ui.showCh4]
+
 
         # Detect devices and set acquisition flag accordingly
         self.DetectandConnectDevices()
+        self.Reader.bAcquiring = self.bAcquiring
+
+        self.PlotTimer = QtCore.QTimer(self)
+        self.PlotTimer.timeout.connect(self.RefreshPlot)
+        self.PlotTimer.start(int(1000 / self.PlotRate))
 
         if self.bAcquiring == False:
             QtWidgets.QMessageBox.information(self,
@@ -163,92 +188,34 @@ class EDL(QtWidgets.QMainWindow):
         self.MoveToStart()
 
     def SetFiducials(self, t):
-        self.vHolddata = np.zeros(1, dtype=float)
-        self.ch1data = np.zeros(1, dtype=float)
-        self.ch2data = np.zeros(1, dtype=float)
-        self.ch3data = np.zeros(1, dtype=float)
-        self.ch4data = np.zeros(1, dtype=float)
-        self.t = np.zeros(1, dtype=float)
-        self.t[0]     = t
-        self.ptr      = 1
-
-    def UpdateData(self):
-        if __debug__ and not self.bAcquiring:
-            readPacketsNum = 10
-
-            start = self.t[-1] + self.t_step
-            span = (readPacketsNum + 1) * self.t_step
-            stop = self.t[-1] + span
-            step = self.t_step
-            self.t = np.append(self.t,
-                               np.arange(start, stop, step))
-            self.vHolddata = np.sin(self.t) * 100
-            self.ch1data = np.sin(self.t + 1) * 100
-            self.ch2data = np.sin(self.t + 2) * 100
-            self.ch3data = np.sin(self.t + 3) * 100
-            self.ch4data = np.sin(self.t + 4) * 100
-
-        if self.bAcquiring:
-            status = edl_py.EdlDeviceStatus_t()
-            readPacketsNum = [0]
-            res = self.edl.purgeData()
-            # if self.edl.purgeData() != epc.EdlPySuccess and not self.bAcquiring and not __debug__:
-            #     print('Elements Old Data purge error. Result = ', res)
-
-            # Get number of available data packets EdlDeviceStatus_t::availableDataPackets.
-            res = self.edl.getDeviceStatus(status)
-            if res != epc.EdlPySuccess:
-                QtWidgets.QMessageBox.information(self,
-                                                  'Elements Connection Error',
-                                                  "Error getting device status")
-                return res
-            if status.bufferOverflowFlag or status.lostDataFlag:
-                print('Elements Buffer overflow, data loss. Result = ', res)
-            if status.availableDataPackets >= 10:
-                data = [0.0] * 0
-                self.edl.readData(status.availableDataPackets, readPacketsNum, data)
-                self.LatestPackets = readPacketsNum[0]
-
-                self.vHolddata = np.append(self.vHolddata, data[0::5])
-                self.ch1data = np.append(self.ch1data, data[1::5])
-                self.ch2data = np.append(self.ch2data, data[2::5])
-                self.ch3data = np.append(self.ch3data, data[3::5])
-                self.ch4data = np.append(self.ch4data, data[4::5])
-
-                start = self.t[-1] + self.t_step
-                span = (readPacketsNum[0] + 1) * self.t_step
-                stop = self.t[-1] + span
-                step = self.t_step
-                self.t = np.append(self.t, np.arange(start, stop, step))
-            else:
-                # If no read, wait 1 ms and retry.
-                time.sleep(0.001)
-
-        self.DataPlot(self.t[-self.datawindow:],
-                      self.vHolddata[-self.datawindow:],
-                      self.ch1data[-self.datawindow:],
-                      self.ch2data[-self.datawindow:],
-                      self.ch3data[-self.datawindow:],
-                      self.ch4data[-self.datawindow:])
-        self.ptr = self.ptr + 1
-
-    def DataAcquisitionThread(self):
-        self.SetFiducials(time.time())
-        while self.bRun:
-            self.UpdateData()
+        self.Reader.SetFiducials(t)
+        self.bClearPlot = True
+
+    def StartAcquisition(self):
+        self.Reader.Start()
+
+    def RefreshPlot(self):
+        # Runs on the Qt thread at PlotRate; takes whatever the reader has produced since the last refresh.
+        if self.Reader.LastError is not None:
+            self.Reader.LastError = None
+            QtWidgets.QMessageBox.information(self,
+                                              'Elements Connection Error',
+                                              "Error getting device status")
+        if self.bClearPlot:
+            self.bClearPlot = False
+            self.PlotData.Clear()
+        for chunk in self.Reader.Queue.GetAll():
+            self.PlotData.Append(chunk)
+        self.LatestPackets = self.Reader.LatestPackets
+        t, y = self.PlotData.Window(self.datawindow, self.ui.Ch1Data.width())
+        self.DataPlot(t, *y)
 
     def DataPlot(self, t, data0, data1, data2, data3, data4):
-        if len(self.t) > self.datawindow:
-            if self.ui.showVhold.isChecked() == True:
-                self.p0.plot(x=t, y=data0, pen=(127, 127, 127), linewidth=1, clear=True, _callSync='off')
-            if self.ui.showCh1.isChecked() == True:
-                self.p1.plot(x=t, y=data1, pen=(0, 0, 255), linewidth=.5, clear=True, _callSync='off')
-            if self.ui.showCh2.isChecked() == True:
-                self.p2.plot(x=t, y=data2, pen=(0, 255, 0), linewidth=.5, clear=True, _callSync='off')
-            if self.ui.showCh3.isChecked() == True:
-                self.p3.plot(x=t, y=data3, pen=(255, 0, 0), linewidth=.5, clear=True, _callSync='off')
-            if self.ui.showCh4.isChecked() == True:
-                self.p4.plot(x=t, y=data4, pen=(255, 0, 255), linewidth=.5, clear=True, _callSync='off')
+        if self.PlotData.total >= self.datawindow:
+            # Channels hidden through ToggleChannelView are not sent to their plot
+            for curve, check, data in zip(self.Curves, self.CurveChecks, (data0, data1, data2, data3, data4)):
+                if check.isChecked():
+                    curve.setData(x=t, y=data, _callSync='off')
 
 
     def DetectandConnectDevices(self):
@@ -312,46 +279,39 @@ class EDL(QtWidgets.QMainWindow):
             self.DetectionThreshold = self.ui.sbThreshold.value()
         else:
             self.DetectionThreshold = -self.ui.sbThreshold.value()
+        # Threshold in nA from the baseline; 0 turns detection off
+        self.Reader.Detector.Threshold = self.DetectionThreshold
 
     def SetNano(self):
         self.XMove = self.ui.sbMoveX.value()
         self.YMove = self.ui.sbMoveY.value()
         self.ZMove = self.ui.sbMoveZ.value()
+        # Offsets in microns applied on each detected event, when a trigger is attached
+        trigger = self.Reader.Trigger
+        if trigger is not None:
+            trigger.SetMove(self.XMove, self.YMove, self.ZMove)
 
     def UpdateSettings(self):
-        if self.ui.rb200pA.isChecked == True: self.Range = epc.EDL_PY_RADIO_RANGE_200_PA
-        if self.ui.rb2nA.isChecked == True: self.Range = epc.EDL_PY_RADIO_RANGE_2_NA
-        if self.ui.rb20nA.isChecked == True: self.Range = epc.EDL_PY_RADIO_RANGE_20_NA
-        if self.ui.rb200nA.isChecked == True: self.Range = epc.EDL_PY_RADIO_RANGE_200_NA
-        if self.ui.rb1_25KHz.isChecked == True:
-            self.SR = epc.EDL_PY_RADIO_SAMPLING_RATE_1_25_KHZ
-            self.t_step = 1024/1250000    #1.25MHz sampling rate downsampled
-        if self.ui.rb5KHz.isChecked == True:
-            self.SR = epc.EDL_PY_RADIO_SAMPLING_RATE_5_KHZ
-            self.t_step = 256/1250
-        if self.ui.rb10KHz.isChecked == True:
-            self.SR = epc.EDL_PY_RADIO_SAMPLING_RATE_10_KHZ
-            self.t_step = 128/1250
-        if self.ui.rb20KHz.isChecked == True:
-            self.SR = epc.EDL_PY_RADIO_SAMPLING_RATE_20_KHZ
-            self.t_step = 64/1250
-        if self.ui.rb50KHz.isChecked == True:
-            self.SR = epc.EDL_PY_RADIO_SAMPLING_RATE_50_KHZ
-            self.t_step = 1/50
-        if self.ui.rb100KHz.isChecked == True:
-            self.SR = epc.EDL_PY_RADIO_SAMPLING_RATE_100_KHZ
-            self.t_step = 1/100
-        if self.ui.rb200KHz.isChecked == True:
-            self.SR = epc.EDL_PY_RADIO_SAMPLING_RATE_200_KHZ
-            self.t_step = 1/200
-        if self.ui.rbSRby2.isChecked == True: self.BandwidthDivisor = epc.EDL_PY_RADIO_FINAL_BANDWIDTH_SR_2
-        if self.ui.rbSRby8.isChecked == True: self.BandwidthDivisor = epc.EDL_PY_RADIO_FINAL_BANDWIDTH_SR_8
-        if self.ui.rbSRby10.isChecked == True: self.BandwidthDivisor = epc.EDL_PY_RADIO_FINAL_BANDWIDTH_SR_10
-        if self.ui.rbSRby20.isChecked == True: self.BandwidthDivisor = epc.EDL_PY_RADIO_FINAL_BANDWIDTH_SR_20
+        if self.ui.rb200pA.isChecked() == True: self.Range = epc.EDL_PY_RADIO_RANGE_200_PA
+        if self.ui.rb2nA.isChecked() == True: self.Range = epc.EDL_PY_RADIO_RANGE_2_NA
+        if self.ui.rb20nA.isChecked() == True: self.Range = epc.EDL_PY_RADIO_RANGE_20_NA
+        if self.ui.rb200nA.isChecked() == True: self.Range = epc.EDL_PY_RADIO_RANGE_200_NA
+        if self.ui.rb1_25KHz.isChecked() == True: self.SR = epc.EDL_PY_RADIO_SAMPLING_RATE_1_25_KHZ
+        if self.ui.rb5KHz.isChecked() == True: self.SR = epc.EDL_PY_RADIO_SAMPLING_RATE_5_KHZ
+        if self.ui.rb10KHz.isChecked() == True: self.SR = epc.EDL_PY_RADIO_SAMPLING_RATE_10_KHZ
+        if self.ui.rb20KHz.isChecked() == True: self.SR = epc.EDL_PY_RADIO_SAMPLING_RATE_20_KHZ
+        if self.ui.rb50KHz.isChecked() == True: self.SR = epc.EDL_PY_RADIO_SAMPLING_RATE_50_KHZ
+        if self.ui.rb100KHz.isChecked() == True: self.SR = epc.EDL_PY_RADIO_SAMPLING_RATE_100_KHZ
+        if self.ui.rb200KHz.isChecked() == True: self.SR = epc.EDL_PY_RADIO_SAMPLING_RATE_200_KHZ
+        self.t_step = epc.EDL_PY_SAMPLING_PERIODS[self.SR]     # seconds per sample
+        if self.ui.rbSRby2.isChecked() == True: self.BandwidthDivisor = epc.EDL_PY_RADIO_FINAL_BANDWIDTH_SR_2
+        if self.ui.rbSRby8.isChecked() == True: self.BandwidthDivisor = epc.EDL_PY_RADIO_FINAL_BANDWIDTH_SR_8
+        if self.ui.rbSRby10.isChecked() == True: self.BandwidthDivisor = epc.EDL_PY_RADIO_FINAL_BANDWIDTH_SR_10
+        if self.ui.rbSRby20.isChecked() == True: self.BandwidthDivisor = epc.EDL_PY_RADIO_FINAL_BANDWIDTH_SR_20
         self.ConfigureEDL()
 
     def ConfigureEDL(self):
-        self.bAcquiring = False
+        self.Reader.bPaused = True
         commandStruct = edl_py.EdlCommandStruct_t()
         commandStruct.radioId = self.SR
         self.edl.setCommand(epc.EdlPyCommandSamplingRate, commandStruct, False)
@@ -359,7 +319,8 @@ class EDL(QtWidgets.QMainWindow):
         self.edl.setCommand(epc.EdlPyCommandRange, commandStruct, False)
         commandStruct.radioId = self.BandwidthDivisor
         self.edl.setCommand(epc.EdlPyCommandFinalBandwidth, commandStruct, True)
-        self.bAcquiring = True
+        self.Reader.t_step = self.t_step
+        self.Reader.bPaused = False
 
     def CompensateDigitalOffset(self):
         commandStruct = edl_py.EdlCommandStruct_t()
@@ -411,16 +372,11 @@ class EDL(QtWidgets.QMainWindow):
                                                "Elements Header Files (*.edh)")[0]
         self.ED = ElementsData(self.filename)
 
-    def DetectSignal(self, channel, high = True):
-        # if high:
-        #     threshold = channel.mean() + self.DetectionThreshold
-        #     if channel > threshold:
-        #         return True
-        # else:
-        #     threshold = channel.mean() - self.DetectionThreshold
-        #     if channel < threshold:
-        #         return True
-        return False
+    def DetectSignal(self, channel=None):
+        """True while channel (1-4, any if None) is inside a detected event."""
+        if channel is None:
+            return bool(self.Reader.Detector.bInEvent.any())
+        return bool(self.Reader.Detector.bInEvent[channel - 1])
 
     def MoveToStart(self):
         ag = QtWidgets.QDesktopWidget().availableGeometry()
@@ -433,5 +389,6 @@ class EDL(QtWidgets.QMainWindow):
     def closeEvent(self, event):
         self.bAcquiring = False
         self.bRun = False
-        if self.DAQThread != None: self.DAQThread.join()
+        self.PlotTimer.stop()
+        self.Reader.Stop()
         event.accept()
\ No newline at end of file
@@ -0,0 +1,143 @@
+""" EDLReader.py
+Acquisition side of the Elements e4 PCA
+Reads data packets from an EDL_PY device in a dedicated thread, stores them
+in the sample history, runs event detection on them and hands each new chunk
+to the plot queue. The plot queue drops its oldest chunks when the GUI
+falls behind; consumers that need every chunk and event (recording, event
+tables, maps) register a lossless queue.Queue in Taps instead.
+Nothing in here touches Qt, so reads never wait on rendering.
+"""
+
+import threading, time
+import numpy as np
+try:
+    import edl_py
+except ImportError:
+    # No e4 driver on this machine (e.g. Linux): use the simulated device
+    import edl_py_sim as edl_py
+import edl_py_constants as epc
+from Buffers import RingBuffer, ChunkQueue
+from EventDetector import EventDetector
+
+
+class EDLReader:
+    DataColumns = ['PCATime', 'VHold', 'PCA1', 'PCA2', 'PCA3', 'PCA4']
+
+    def __init__(self, edl, capacity, minPackets=10):
+        self.edl = edl
+        self.minPackets = minPackets
+        # Sample history, rows: time, V-Hold, Ch1..Ch4
+        self.Data = RingBuffer(capacity, epc.EDL_PY_CHANNEL_NUM + 1)
+        self.Queue = ChunkQueue()
+        self.Detector = EventDetector(epc.EDL_PY_CHANNEL_NUM - 1)
+        self.Trigger = None         # ClosedLoop.EventTrigger, acts on events in this thread
+        self.Recorder = None        # Recorder.StreamRecorder while RTDAQApp is recording
+        self.Taps = []              # queue.Queue, each gets (chunk, events) of every read
+        self.Lock = threading.Lock()
+        self.ReadBuffer = np.empty((10000, epc.EDL_PY_CHANNEL_NUM), dtype=np.float32)
+        self.bArrayRead = hasattr(edl, 'readDataArray')   # False with an edl_py.pyd built before readDataArray
+        self.t_step = epc.EDL_PY_SAMPLING_PERIODS[epc.EDL_PY_RADIO_SAMPLING_RATE_1_25_KHZ]
+        self.t0 = time.time()       # Fiducial; sample times are seconds since t0
+        self.tLast = None           # Time of the newest sample, None until the first read
+
+        self.bAcquiring = False     # True once a device is connected
+        self.bPaused = False        # Set while the device is being configured
+        self.bRun = False
+        self.Thread = None
+
+        self.LatestPackets = 0
+        self.OverflowCount = 0
+        self.LostCount = 0
+        self.LastError = None
+
+    def SetFiducials(self, t):
+        with self.Lock:
+            self.Data.Clear()
+            self.Detector.Reset()
+            self.t0 = t
+            self.tLast = None
+
+    def AppendPackets(self, packets):
+        # packets: (n, EDL_PY_CHANNEL_NUM) as read from the device, V-Hold first
+        n = len(packets)
+        if n == 0:
+            return None
+        with self.Lock:
+            if self.tLast is None:
+                # Anchor the sample clock to the host clock on the first read after the fiducial,
+                # then count samples so the timebase follows the device rate.
+                self.tLast = time.time() - self.t0 - n * self.t_step
+            t = self.tLast + self.t_step * np.arange(1, n + 1)
+            chunk = np.vstack((t, np.transpose(packets)))
+            self.Data.Append(chunk)
+            self.tLast = t[-1]
+            events = self.Detector.Process(t, chunk[2:], chunk[1])
+            tDetect = time.perf_counter_ns()
+        # Outside the lock: Write may block briefly on a slow disk
+        recorder = self.Recorder
+        if recorder is not None:
+            recorder.Write(chunk)
+        if len(events):
+            trigger = self.Trigger
+            if trigger is not None:
+                trigger.OnEvents(events, tDetect)
+        for tap in self.Taps:
+            tap.put((chunk, events))
+        self.Queue.Put(chunk)
+        return chunk
+
+    def ReadPackets(self):
+        """Single poll of the device. Returns the number of packets read."""
+        if not self.bAcquiring or self.bPaused:
+            return 0
+
+        # Get number of available data packets EdlDeviceStatus_t::availableDataPackets.
+        status = edl_py.EdlDeviceStatus_t()
+        res = self.edl.getDeviceStatus(status)
+        if res != epc.EdlPySuccess:
+            self.LastError = res
+            return 0
+        if status.bufferOverflowFlag:
+            self.OverflowCount += 1
+        if status.lostDataFlag:
+            self.LostCount += 1
+        if status.bufferOverflowFlag or status.lostDataFlag:
+            print('Elements Buffer overflow, data loss. Result = ', res)
+        if status.availableDataPackets < self.minPackets:
+            return 0
+
+        readPacketsNum = [0]
+        if self.bArrayRead:
+            if status.availableDataPackets > len(self.ReadBuffer):
+                self.ReadBuffer = np.empty((2 * status.availableDataPackets, epc.EDL_PY_CHANNEL_NUM),
+                                           dtype=np.float32)
+            self.edl.readDataArray(status.availableDataPackets, readPacketsNum, self.ReadBuffer)
+            packets = self.ReadBuffer[:readPacketsNum[0]]
+        else:
+            data = [0.0] * 0
+            self.edl.readData(status.availableDataPackets, readPacketsNum, data)
+            packets = np.reshape(data, (-1, epc.EDL_PY_CHANNEL_NUM))
+        self.LatestPackets = readPacketsNum[0]
+        self.AppendPackets(packets)
+        return readPacketsNum[0]
+
+    def Run(self):
+        # Get rid of data acquired before the reader was started.
+        if self.bAcquiring:
+            self.edl.purgeData()
+        while self.bRun:
+            if self.ReadPackets() == 0:
+                # If no read, wait 1 ms and retry.
+                time.sleep(0.001)
+
+    def Start(self):
+        if self.Thread is None:
+            self.bRun = True
+            self.Thread = threading.Thread(target=self.Run, daemon=True)
+            self.Thread.start()
+
+    def Stop(self):
+        self.bRun = False
+        if self.Thread is not None:
+            self.Thread.join()
+            self.Thread = None
@@ -0,0 +1,144 @@
+""" EventDetector.py
+Chunk-wise threshold detection of translocation events on the e4 current channels
+Each chunk from EDLReader is classified against a per-channel running
+baseline with numpy only. An event starts when the deviation from baseline
+crosses the threshold and ends when it comes back within threshold *
+hysteresis. The in-event state, partial event sums and the
+baseline carry over between chunks, so events spanning chunk boundaries are
+reported once, when they end.
+"""
+
+import numpy as np
+
+# One row per detected event; times are seconds since the RTDAQApp fiducial
+EventType = np.dtype([('channel', 'i4'),        # 1..4
+                      ('start', 'i8'),          # First sample in the event, counted since Reset()
+                      ('end', 'i8'),            # One past the last sample in the event
+                      ('tStart', 'f8'),
+                      ('dwell', 'f8'),          # s
+                      ('depth', 'f8'),          # Mean deviation from baseline, nA (signed)
+                      ('peak', 'f8'),           # Largest deviation from baseline, nA (signed)
+                      ('baseline', 'f8'),       # nA
+                      ('vhold', 'f8')])         # V-Hold at the first sample of the event, mV
+
+
+class EventDetector:
+    def __init__(self, channels=4, threshold=0.0, hysteresis=0.5, tau=100000, minSamples=1):
+        """threshold    Deviation from baseline in nA. Positive detects rises, negative
+                        detects drops; 0 disables detection.
+        hysteresis      Fraction of threshold the deviation must fall back below to end an event
+        tau             Baseline time constant in samples (event samples excluded)
+        minSamples      Shorter excursions are not reported"""
+        self.channels = channels
+        self.Threshold = threshold
+        self.Hysteresis = hysteresis
+        self.tau = float(tau)
+        self.minSamples = minSamples
+        self.Reset()
+
+    def Reset(self):
+        c = self.channels
+        self.count = 0                              # Samples processed
+        self.Baseline = np.full(c, np.nan)
+        self.bInEvent = np.zeros(c, dtype=bool)
+        self.eventStart = np.zeros(c, dtype=np.int64)
+        self.eventTime = np.zeros(c)
+        self.eventSum = np.zeros(c)
+        self.eventPeak = np.zeros(c)
+        self.eventVhold = np.full(c, np.nan)
+
+    def Process(self, t, current, vhold=None):
+        """t (n,) sample times, current (channels, n), vhold (n,) V-Hold in mV or None.
+        Returns the events that ended in this chunk as an EventType array."""
+        n = len(t)
+        if n == 0:
+            return np.zeros(0, dtype=EventType)
+        if vhold is None:
+            vhold = np.full(n, np.nan)
+        threshold = self.Threshold
+        i0 = self.count
+        self.count += n
+        events = []
+        for c in range(self.channels):
+            x = current[c]
+            if np.isnan(self.Baseline[c]):
+                self.Baseline[c] = np.median(x)
+            baseline = self.Baseline[c]
+            if threshold == 0:
+                self.bInEvent[c] = False
+                self.Baseline[c] += (1.0 - np.exp(-n / self.tau)) * (x.mean() - baseline)
+                continue
+            deviation = x - baseline
+            if threshold > 0:
+                enter = deviation > threshold
+                leave = deviation <= threshold * self.Hysteresis
+            else:
+                enter = deviation < threshold
+                leave = deviation >= threshold * self.Hysteresis
+            # Inside an event where the latest enter crossing is more recent than the latest leave
+            index = np.arange(n)
+            entered = np.maximum.accumulate(np.where(enter, index, -1 if self.bInEvent[c] else -2))
+            left = np.maximum.accumulate(np.where(leave, index, -2 if self.bInEvent[c] else -1))
+            inside = entered > left
+
+            # Transitions, with the state at the end of the previous chunk in front
+            edges = np.diff(np.concatenate(([self.bInEvent[c]], inside)).astype(np.int8))
+            starts = np.flatnonzero(edges == 1)
+            ends = np.flatnonzero(edges == -1)
+            if inside[-1]:
+                ends = np.append(ends, n)           # Still open at the end of the chunk
+            if self.bInEvent[c]:
+                starts = np.insert(starts, 0, 0)    # Carried over from the previous chunk
+
+            if len(starts):
+                # Samples outside events contribute nothing to the reductions over [start, next start)
+                high = threshold > 0
+                sums = np.add.reduceat(np.where(inside, deviation, 0.0), starts)
+                masked = np.where(inside, deviation, -np.inf if high else np.inf)
+                peaks = (np.maximum if high else np.minimum).reduceat(masked, starts)
+                if self.bInEvent[c]:
+                    sums[0] += self.eventSum[c]
+                    peaks[0] = max(peaks[0], self.eventPeak[c]) if high else min(peaks[0], self.eventPeak[c])
+                begin = i0 + starts
+                tBegin = t[np.minimum(starts, n - 1)]
+                vBegin = vhold[np.minimum(starts, n - 1)]
+                if self.bInEvent[c]:
+                    begin[0] = self.eventStart[c]
+                    tBegin[0] = self.eventTime[c]
+                    vBegin[0] = self.eventVhold[c]
+
+                closed = slice(0, len(starts) - 1) if inside[-1] else slice(0, len(starts))
+                if inside[-1]:
+                    # Keep the open event for the next chunk
+                    self.eventStart[c] = begin[-1]
+                    self.eventTime[c] = tBegin[-1]
+                    self.eventVhold[c] = vBegin[-1]
+                    self.eventSum[c] = sums[-1]
+                    self.eventPeak[c] = peaks[-1]
+                length = (i0 + ends - begin)[closed]
+                keep = length >= self.minSamples
+                if np.any(keep):
+                    e = np.zeros(np.count_nonzero(keep), dtype=EventType)
+                    e['channel'] = c + 1
+                    e['start'] = begin[closed][keep]
+                    e['end'] = (i0 + ends)[closed][keep]
+                    e['tStart'] = tBegin[closed][keep]
+                    # Closed events end inside this chunk, at the first sample back on baseline
+                    e['dwell'] = t[ends[closed][keep]] - e['tStart']
+                    e['depth'] = sums[closed][keep] / length[keep]
+                    e['peak'] = peaks[closed][keep]
+                    e['baseline'] = baseline
+                    e['vhold'] = vBegin[closed][keep]
+                    events.append(e)
+            self.bInEvent[c] = inside[-1]
+
+            # Running baseline from the samples outside events
+            outside = ~inside
+            m = np.count_nonzero(outside)
+            if m:
+                alpha = 1.0 - np.exp(-m / self.tau)
+                self.Baseline[c] += alpha * (x[outside].mean() - baseline)
+
+        if events:
+            return np.concatenate(events)
+        return np.zeros(0, dtype=EventType)
@@ -0,0 +1,128 @@
+""" benchmarkEDL.py
+Sustained throughput of the EDL ingest path (EDLReader) against the simulated
+e4 device, for every sampling rate / final bandwidth setting.
+One JSON object per setting is written per line, e.g.
+    python benchmarkEDL.py --duration 10 --output results.jsonl
+Fields:
+    sr, bandwidth           Radio ids as in edl_py_constants
+    rate                    Nominal device rate in packets/s
+    packets_per_s           Packets ingested per second of wall clock
+    latency_us              Percentiles of ReadPackets() calls that returned data
+    cpu_us_per_sample       Process CPU time per ingested packet
+    overflow_events, lost_events
+                            Reads that reported bufferOverflowFlag / lostDataFlag
+"""
+
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+import argparse
+import contextlib
+import json
+import platform
+import tempfile
+import time
+import numpy as np
+import edl_py_constants as epc
+import edl_py_sim
+from EDLReader import EDLReader
+from Recorder import StreamRecorder
+
+SamplingRates = [epc.EDL_PY_RADIO_SAMPLING_RATE_1_25_KHZ,
+                 epc.EDL_PY_RADIO_SAMPLING_RATE_5_KHZ,
+                 epc.EDL_PY_RADIO_SAMPLING_RATE_10_KHZ,
+                 epc.EDL_PY_RADIO_SAMPLING_RATE_20_KHZ,
+                 epc.EDL_PY_RADIO_SAMPLING_RATE_50_KHZ,
+                 epc.EDL_PY_RADIO_SAMPLING_RATE_100_KHZ,
+                 epc.EDL_PY_RADIO_SAMPLING_RATE_200_KHZ]
+
+
+def Benchmark(sr, bandwidth, duration, capacity, bufferPackets, record):
+    edl = edl_py_sim.EDL_PY(bufferPackets=bufferPackets, seed=0)
+    devices = []
+    edl.detectDevices(devices)
+    edl.connectDevice(devices[0])
+    commandStruct = edl_py_sim.EdlCommandStruct_t()
+    commandStruct.radioId = sr
+    edl.setCommand(epc.EdlPyCommandSamplingRate, commandStruct, False)
+    commandStruct.radioId = bandwidth
+    edl.setCommand(epc.EdlPyCommandFinalBandwidth, commandStruct, True)
+
+    reader = EDLReader(edl, capacity)
+    reader.t_step = epc.EDL_PY_SAMPLING_PERIODS[sr]
+    reader.bAcquiring = True
+    reader.SetFiducials(time.time())
+    if record:
+        recorder = StreamRecorder(os.path.join(tempfile.mkdtemp(), 'benchmark.dat'), EDLReader.DataColumns)
+        recorder.Start()
+        reader.Recorder = recorder
+
+    # Same loop as EDLReader.Run, timed per read
+    latencies = []
+    packets = 0
+    edl.purgeData()
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < duration:
+        tRead = time.perf_counter()
+        n = reader.ReadPackets()
+        if n == 0:
+            time.sleep(0.001)
+        else:
+            latencies.append(time.perf_counter() - tRead)
+            packets += n
+    elapsed = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+
+    result = {'sr': sr,
+              'bandwidth': bandwidth,
+              'rate': 1.0 / epc.EDL_PY_SAMPLING_PERIODS[sr],
+              'duration': elapsed,
+              'packets': packets,
+              'packets_per_s': packets / elapsed,
+              'reads': len(latencies),
+              'latency_us': {},
+              'cpu_us_per_sample': 1e6 * cpu / packets if packets else None,
+              'overflow_events': reader.OverflowCount,
+              'lost_events': reader.LostCount,
+              'plot_queue_dropped': reader.Queue.dropped}
+    if latencies:
+        latencies = 1e6 * np.array(latencies)
+        for p in (50, 90, 99):
+            result['latency_us']['p' + str(p)] = float(np.percentile(latencies, p))
+        result['latency_us']['max'] = float(latencies.max())
+    if record:
+        reader.Recorder = None
+        recorder.Stop()
+        result['recorder_dropped'] = recorder.Dropped
+        result['recorder_gaps'] = len(recorder.Gaps)
+        recorder.Discard()
+    edl.disconnectDevice()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per setting')
+    parser.add_argument('--sr', type=int, nargs='*', default=SamplingRates, help='sampling rate radio ids')
+    parser.add_argument('--bandwidth', type=int, nargs='*', default=[epc.EDL_PY_RADIO_FINAL_BANDWIDTH_SR_2],
+                        help='final bandwidth radio ids')
+    parser.add_argument('--capacity', type=int, default=1000000, help='EDLReader history in samples')
+    parser.add_argument('--buffer', type=int, default=1 << 20, help='simulated device buffer in packets')
+    parser.add_argument('--record', action='store_true', help='also stream to a StreamRecorder')
+    parser.add_argument('--output', help='append results to this file instead of stdout')
+    args = parser.parse_args()
+
+    out = open(args.output, 'a') if args.output else sys.stdout
+    for sr in args.sr:
+        for bandwidth in args.bandwidth:
+            # Reader diagnostics go to stderr so stdout stays one JSON object per line
+            with contextlib.redirect_stdout(sys.stderr):
+                result = Benchmark(sr, bandwidth, args.duration, args.capacity, args.buffer, args.record)
+            result['record'] = args.record
+            result['python'] = platform.python_version()
+            result['numpy'] = np.__version__
+            result['timestamp'] = time.strftime('%Y-%m-%d %H:%M:%S')
+            out.write(json.dumps(result) + '\n')
+            out.flush()
+    if args.output:
+        out.close()
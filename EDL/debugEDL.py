@@ -1,12 +1,13 @@
 # ...for class debugging
 
+import os, sys
+sys.path.append(os.path.abspath('..'))   # Shared modules (Buffers.py) live at the project root
 from EDL import *
-import sys
 
 if __name__ == "__main__":
     app = QtWidgets.QApplication(sys.argv)
     window = EDL()
-    window.DAQThread = threading.Thread(target=window.DataAcquisitionThread)
-    window.DAQThread.start()
+    window.SetFiducials(time.time())
+    window.StartAcquisition()
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
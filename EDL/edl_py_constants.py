@@ -75,6 +75,15 @@ EDL_PY_RADIO_SAMPLING_RATE_50_KHZ = 4
 EDL_PY_RADIO_SAMPLING_RATE_100_KHZ = 5
 EDL_PY_RADIO_SAMPLING_RATE_200_KHZ = 6
 
+# Sample period in seconds for each sampling rate radio; the lower rates are 1.25MHz divided down
+EDL_PY_SAMPLING_PERIODS = {EDL_PY_RADIO_SAMPLING_RATE_1_25_KHZ: 1024 / 1.25e6,
+                           EDL_PY_RADIO_SAMPLING_RATE_5_KHZ: 256 / 1.25e6,
+                           EDL_PY_RADIO_SAMPLING_RATE_10_KHZ: 128 / 1.25e6,
+                           EDL_PY_RADIO_SAMPLING_RATE_20_KHZ: 64 / 1.25e6,
+                           EDL_PY_RADIO_SAMPLING_RATE_50_KHZ: 1 / 50e3,
+                           EDL_PY_RADIO_SAMPLING_RATE_100_KHZ: 1 / 100e3,
+                           EDL_PY_RADIO_SAMPLING_RATE_200_KHZ: 1 / 200e3}
+
 EDL_PY_RADIO_FINAL_BANDWIDTH_SR_2 = 0
 EDL_PY_RADIO_FINAL_BANDWIDTH_SR_8 = 1
 EDL_PY_RADIO_FINAL_BANDWIDTH_SR_10 = 2
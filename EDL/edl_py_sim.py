@@ -0,0 +1,225 @@
+""" edl_py_sim.py
+Simulated Elements e4 PCA with the same interface as edl_py.pyd
+Used in place of edl_py where the Windows driver is not available, e.g.
+    try:
+        import edl_py
+    except ImportError:
+        import edl_py_sim as edl_py
+
+Packets are produced in real time at the configured sampling rate and held in a
+bounded device buffer. Reading too slowly overflows the buffer: the oldest
+packets are discarded and bufferOverflowFlag / lostDataFlag are reported by the
+next getDeviceStatus(), as with the real device.
+Each packet is V-Hold (mV) followed by Ch1..Ch4 (nA): open pore current set by
+V-Hold and the pore conductance, Gaussian noise scaled with the final
+bandwidth, and Poisson distributed step-like blockade events.
+"""
+
+import threading, time
+import numpy as np
+import edl_py_constants as epc
+
+# Full scale current in nA for each range radio
+RangeFullScale = {epc.EDL_PY_RADIO_RANGE_200_PA: 0.2,
+                  epc.EDL_PY_RADIO_RANGE_2_NA: 2.0,
+                  epc.EDL_PY_RADIO_RANGE_20_NA: 20.0,
+                  epc.EDL_PY_RADIO_RANGE_200_NA: 200.0}
+
+# Final bandwidth divisor for each bandwidth radio
+BandwidthDivisors = {epc.EDL_PY_RADIO_FINAL_BANDWIDTH_SR_2: 2,
+                     epc.EDL_PY_RADIO_FINAL_BANDWIDTH_SR_8: 8,
+                     epc.EDL_PY_RADIO_FINAL_BANDWIDTH_SR_10: 10,
+                     epc.EDL_PY_RADIO_FINAL_BANDWIDTH_SR_20: 20}
+
+
+class EdlDeviceStatus_t:
+    def __init__(self):
+        self.availableDataPackets = 0
+        self.bufferOverflowFlag = False
+        self.lostDataFlag = False
+
+
+class EdlCommandStruct_t:
+    def __init__(self):
+        self.radioId = 0
+        self.checkboxChecked = False
+        self.buttonPressed = False
+        self.value = 0.0
+
+
+class EDL_PY:
+    DeviceId = "SIM-e4"
+
+    def __init__(self, bufferPackets=1 << 20, vhold=100.0, conductance=10.0, noise=0.01,
+                 eventRate=20.0, dwell=1e-3, depth=(0.2, 0.8), seed=None):
+        """bufferPackets    Device buffer size in packets
+        vhold               Initial V-Hold in mV
+        conductance         Open pore conductance in nS
+        noise               RMS current noise in nA at 10 kHz bandwidth
+        eventRate           Mean blockade events per second per channel
+        dwell               Mean event dwell time in s
+        depth               Range of fractional blockade depth"""
+        self.BufferPackets = int(bufferPackets)
+        self.Conductance = conductance
+        self.Noise = noise
+        self.EventRate = eventRate
+        self.Dwell = dwell
+        self.Depth = depth
+        self.rng = np.random.RandomState(seed)
+        self.Lock = threading.Lock()
+        self.bConnected = False
+
+        # Applied settings, and settings staged by setCommand(..., False)
+        self.Settings = {epc.EdlPyCommandSamplingRate: epc.EDL_PY_RADIO_SAMPLING_RATE_1_25_KHZ,
+                         epc.EdlPyCommandRange: epc.EDL_PY_RADIO_RANGE_20_NA,
+                         epc.EdlPyCommandFinalBandwidth: epc.EDL_PY_RADIO_FINAL_BANDWIDTH_SR_2,
+                         epc.EdlPyCommandVhold: vhold}
+        self.Staged = {}
+        self.Purge()
+
+    def Purge(self):
+        self.tStart = time.perf_counter()
+        self.produced = 0           # Packets produced before tStart at earlier rates
+        self.consumed = 0           # Index of the oldest packet still in the device buffer
+        self.bOverflow = False
+        self.bLost = False
+        # Per channel (start, end, depth) of the next or current event, in packet indexes
+        self.Events = [self.NextEvent(0) for _ in range(epc.EDL_PY_CHANNEL_NUM - 1)]
+
+    def SamplingPeriod(self):
+        return epc.EDL_PY_SAMPLING_PERIODS[self.Settings[epc.EdlPyCommandSamplingRate]]
+
+    def Produced(self):
+        return self.produced + int((time.perf_counter() - self.tStart) / self.SamplingPeriod())
+
+    def NextEvent(self, after):
+        rate = self.EventRate * self.SamplingPeriod()     # events per packet
+        if rate <= 0:
+            return (np.inf, np.inf, 0.0)
+        start = after + int(self.rng.exponential(1.0 / rate))
+        end = start + 1 + int(self.rng.exponential(self.Dwell / self.SamplingPeriod()))
+        return (start, end, self.rng.uniform(*self.Depth))
+
+    def Update(self):
+        # Apply device buffer limits to everything produced so far
+        available = self.Produced() - self.consumed
+        if available > self.BufferPackets:
+            self.Skip(available - self.BufferPackets)
+            self.bOverflow = True
+            self.bLost = True
+            available = self.BufferPackets
+        return available
+
+    def Skip(self, n):
+        # Discarded packets still advance the event process
+        self.consumed += n
+        for c, (start, end, depth) in enumerate(self.Events):
+            while end <= self.consumed:
+                start, end, depth = self.NextEvent(end)
+            self.Events[c] = (start, end, depth)
+
+    def Generate(self, n):
+        """Next n packets, shaped (n, EDL_PY_CHANNEL_NUM)."""
+        i0 = self.consumed
+        index = np.arange(i0, i0 + n)
+        vhold = self.Settings[epc.EdlPyCommandVhold]
+        fullscale = RangeFullScale[self.Settings[epc.EdlPyCommandRange]]
+        bandwidth = 1.0 / (self.SamplingPeriod() * BandwidthDivisors[self.Settings[epc.EdlPyCommandFinalBandwidth]])
+        sigma = self.Noise * np.sqrt(bandwidth / 10e3)
+        packets = np.empty((n, epc.EDL_PY_CHANNEL_NUM), dtype=np.float32)
+        packets[:, 0] = vhold
+        packets[:, 1:] = self.rng.normal(self.Conductance * vhold / 1000, sigma, (n, epc.EDL_PY_CHANNEL_NUM - 1))
+        for c, (start, end, depth) in enumerate(self.Events):
+            while start < i0 + n:
+                inside = (index >= start) & (index < end)
+                packets[inside, c + 1] -= depth * self.Conductance * vhold / 1000
+                if end > i0 + n:
+                    break
+                start, end, depth = self.NextEvent(end)
+            self.Events[c] = (start, end, depth)
+        np.clip(packets[:, 1:], -fullscale, fullscale, out=packets[:, 1:])
+        self.consumed += n
+        return packets
+
+    def detectDevices(self, devices_py):
+        devices_py.append(self.DeviceId)
+        return epc.EdlPySuccess
+
+    def connectDevice(self, deviceId_py):
+        if deviceId_py != self.DeviceId:
+            return epc.EdlPyDeviceConnectionError
+        if self.bConnected:
+            return epc.EdlPyDeviceAlreadyConnectedError
+        with self.Lock:
+            self.bConnected = True
+            self.Purge()
+        return epc.EdlPySuccess
+
+    def disconnectDevice(self):
+        if not self.bConnected:
+            return epc.EdlPyDeviceNotConnectedError
+        self.bConnected = False
+        return epc.EdlPySuccess
+
+    def getDeviceStatus(self, status):
+        if not self.bConnected:
+            return epc.EdlPyDeviceNotConnectedError
+        with self.Lock:
+            status.availableDataPackets = self.Update()
+            status.bufferOverflowFlag = self.bOverflow
+            status.lostDataFlag = self.bLost
+            self.bOverflow = False
+            self.bLost = False
+        return epc.EdlPySuccess
+
+    def Read(self, dataToRead):
+        if not self.bConnected:
+            return epc.EdlPyDeviceNotConnectedError, None
+        with self.Lock:
+            if dataToRead > self.Update():
+                return epc.EdlPyNotEnoughAvailableDataError, None
+            return epc.EdlPySuccess, self.Generate(int(dataToRead))
+
+    def readData(self, dataToRead_py, dataRead_py, buffer_py):
+        res, packets = self.Read(dataToRead_py)
+        if packets is None:
+            dataRead_py[0] = 0
+            return res
+        buffer_py.extend(packets.ravel().tolist())
+        dataRead_py[0] = len(packets)
+        return res
+
+    def readDataArray(self, dataToRead_py, dataRead_py, array_py):
+        array_py = array_py.reshape(-1, epc.EDL_PY_CHANNEL_NUM)
+        res, packets = self.Read(min(dataToRead_py, len(array_py)))
+        if packets is None:
+            dataRead_py[0] = 0
+            return res
+        array_py[:len(packets)] = packets
+        dataRead_py[0] = len(packets)
+        return res
+
+    def purgeData(self):
+        if not self.bConnected:
+            return epc.EdlPyDeviceNotConnectedError
+        with self.Lock:
+            self.Purge()
+        return epc.EdlPySuccess
+
+    def setCommand(self, commandId_py, commandStruct_py, sendFlag_py):
+        if commandId_py < epc.EdlPyCommandRange or commandId_py > epc.EdlPyCommandTPeriod:
+            return epc.EdlPyCommandIdOutOfRangeError
+        if commandId_py in (epc.EdlPyCommandSamplingRate, epc.EdlPyCommandRange, epc.EdlPyCommandFinalBandwidth):
+            self.Staged[commandId_py] = commandStruct_py.radioId
+        elif commandId_py == epc.EdlPyCommandVhold:
+            self.Staged[commandId_py] = commandStruct_py.value
+        if sendFlag_py:
+            with self.Lock:
+                if self.Staged.get(epc.EdlPyCommandSamplingRate, self.Settings[epc.EdlPyCommandSamplingRate]) \
+                        != self.Settings[epc.EdlPyCommandSamplingRate]:
+                    # Keep what was produced at the old rate, count on from now at the new one
+                    self.produced = self.Produced()
+                    self.tStart = time.perf_counter()
+                self.Settings.update(self.Staged)
+                self.Staged = {}
+        return epc.EdlPySuccess
@@ -3,6 +3,7 @@
 
 #include "edl.h"
 
+#include <cstring>
 #include <boost/python.hpp>
 
 using namespace boost::python;
@@ -51,6 +52,43 @@ public:
         return res;
     }
 
+    // Reads into a caller-provided, C-contiguous, writable float32 buffer (e.g. a numpy array
+    // shaped (packets, EDL_CHANNEL_NUM)). No Python object is created per sample and the GIL is
+    // released while the device buffer is copied out.
+    unsigned int readDataArray(int dataToRead_py, list &dataRead_py, object array_py) {
+        Py_buffer view;
+        if (PyObject_GetBuffer(array_py.ptr(), &view, PyBUF_WRITABLE | PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) != 0) {
+            throw_error_already_set();
+        }
+        size_t formatLength = (view.format == NULL) ? 0 : std::strlen(view.format);
+        if (view.itemsize != sizeof(float) || formatLength == 0 || view.format[formatLength - 1] != 'f') {
+            PyBuffer_Release(&view);
+            PyErr_SetString(PyExc_TypeError, "readDataArray requires a float32 buffer");
+            throw_error_already_set();
+        }
+        unsigned int capacity = (unsigned int)(view.len / (sizeof(float) * EDL_CHANNEL_NUM));
+        unsigned int dataToRead = (unsigned int)dataToRead_py;
+        if (dataToRead > capacity) {
+            dataToRead = capacity;
+        }
+        unsigned int dataRead = 0;
+        unsigned int res;
+        Py_BEGIN_ALLOW_THREADS
+        arrayBuffer.clear();
+        res = (unsigned int)EDL::readData(dataToRead,
+                                          dataRead,
+                                          arrayBuffer);
+        size_t bytes = arrayBuffer.size() * sizeof(float);
+        if (bytes > (size_t)view.len) {
+            bytes = (size_t)view.len;
+        }
+        std::memcpy(view.buf, arrayBuffer.data(), bytes);
+        Py_END_ALLOW_THREADS
+        PyBuffer_Release(&view);
+        dataRead_py[0] = (int)dataRead;
+        return res;
+    }
+
     unsigned int purgeData() {
         unsigned int res = (unsigned int)EDL::purgeData();
         return res;
@@ -65,6 +103,9 @@ public:
                                                          sendFlag_py);
         return res;
     }
+
+private:
+    std::vector <float> arrayBuffer;
 };
 
 BOOST_PYTHON_MODULE(edl_py) {
@@ -87,6 +128,7 @@ BOOST_PYTHON_MODULE(edl_py) {
         .def("disconnectDevice", &EDL_PY::disconnectDevice)
         .def("getDeviceStatus", &EDL_PY::getDeviceStatus)
         .def("readData", &EDL_PY::readData)
+        .def("readDataArray", &EDL_PY::readDataArray)
         .def("purgeData", &EDL_PY::purgeData)
         .def("setCommand", &EDL_PY::setCommand);
 }
@@ -4,9 +4,104 @@ EYafuso, 06/2019"""
 
 import os
 import sys
-import struct
 import numpy as np
 
+"""SegmentedData Class Definition
+Lazy, array-like concatenation of the _000.._NNN.dat segments of one acquisition.
+Indexed with global row numbers (int, slice, integer array, optionally followed by
+a column index) exactly like a single (rows, columns) float32 array. Segment sizes
+come from the file sizes; a segment is only mapped when a read first touches it.
+A read inside one segment returns a view onto the mapped file, a read spanning
+segment boundaries returns a copy of just the requested rows.
+
+Attributes:
+    FileNames       # Segment data files, in order
+    Offsets         # Global index of the first row of each segment, plus total rows
+    shape           # (total rows, columns)
+"""
+class SegmentedData:
+    def __init__(self, filenames, recordtype):
+        self.FileNames = list(filenames)
+        self.RecordType = recordtype
+        self.columns = recordtype.itemsize // 4
+        rows = [os.path.getsize(f) // recordtype.itemsize for f in self.FileNames]
+        self.Offsets = np.concatenate(([0], np.cumsum(rows))).astype(np.int64)
+        self.shape = (int(self.Offsets[-1]), self.columns)
+        self.dtype = np.dtype('<f4')
+        self.ndim = 2
+        self.mapped = [None] * len(self.FileNames)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def Records(self, k):
+        """Structured memmap of segment k."""
+        if self.mapped[k] is None:
+            rows = int(self.Offsets[k + 1] - self.Offsets[k])
+            if rows > 0:
+                self.mapped[k] = np.memmap(self.FileNames[k], dtype=self.RecordType, mode='r', shape=(rows,))
+            else:
+                self.mapped[k] = np.zeros(0, dtype=self.RecordType)
+        return self.mapped[k]
+
+    def Segment(self, k):
+        """Float32 (rows, columns) view of segment k."""
+        records = self.Records(k)
+        return records.view('<f4').reshape(len(records), self.columns)
+
+    def Locate(self, rows):
+        """Segment number of each global row index."""
+        return np.searchsorted(self.Offsets, rows, side='right') - 1
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            rowkey, colkey = key[0], key[1:]
+        else:
+            rowkey, colkey = key, ()
+
+        if isinstance(rowkey, slice):
+            start, stop, step = rowkey.indices(len(self))
+            if step < 0:
+                return self[(np.arange(start, stop, step),) + colkey]
+            pieces = []
+            if start < stop:
+                for k in range(int(self.Locate(start)), int(self.Locate(stop - 1)) + 1):
+                    # First row of this segment on the slice's stride
+                    first = max(start, int(self.Offsets[k]))
+                    first += (start - first) % step
+                    last = min(stop, int(self.Offsets[k + 1]))
+                    if first < last:
+                        offset = int(self.Offsets[k])
+                        pieces.append(self.Segment(k)[(slice(first - offset, last - offset, step),) + colkey])
+            if len(pieces) == 1:
+                return pieces[0]
+            if len(pieces) == 0:
+                return np.zeros((0, self.columns), dtype=self.dtype)[(slice(None),) + colkey]
+            return np.concatenate(pieces)
+
+        if np.ndim(rowkey) == 0:
+            i = int(rowkey)
+            if i < 0:
+                i += len(self)
+            if i < 0 or i >= len(self):
+                raise IndexError("row index out of range")
+            k = int(self.Locate(i))
+            return self.Segment(k)[(i - int(self.Offsets[k]),) + colkey]
+
+        rows = np.asarray(rowkey)
+        if rows.dtype == bool:
+            rows = np.nonzero(rows)[0]
+        rows = np.where(rows < 0, rows + len(self), rows)
+        if rows.size and (rows.min() < 0 or rows.max() >= len(self)):
+            raise IndexError("row index out of range")
+        segments = self.Locate(rows)
+        out = np.empty((len(rows), self.columns), dtype=self.dtype)
+        for k in np.unique(segments):
+            sel = segments == k
+            out[sel] = self.Segment(int(k))[rows[sel] - self.Offsets[k]]
+        return out[(slice(None),) + colkey]
+
+
 """ElementsData Class Definition
 Methods:
     __init__(self, filename)
@@ -19,10 +114,13 @@ Attributes:
     Sampfrq         # Sample rate in KHz
     BandwidthDivisor# Integer divisor to derive actual bandwidth
     DAQStart        # Acquisition initialization mark
-    Data            # Single multi-dimensional array
-    current         # Data array with current values for acquired channel(s) in nA
-    voltage         # 1D Data array with acquired potentials in mV
+    RecordType      # Structured float32 dtype of one data row, sized from Channels
+    Records         # Read-only memory map of the data file, one RecordType per row
+    Data            # Single multi-dimensional float32 view of Records
+    current         # Data view with current values for acquired channel(s) in nA
+    voltage         # 1D Data view with acquired potentials in mV
     Rows            # Acquired data points, each having current(s) and voltage
+    AllData         # SegmentedData over every segment, for global row indexing
 """
 class ElementsData:
     def __init__(self, filename):
@@ -51,14 +149,27 @@ class ElementsData:
                     print("Acquisition start:", self.DAQStart)
 
         self.DataFileName = filename
+        if self.Channels != 1 and self.Channels != 4:
+            print("Unrecognized patch clamp amplifier. Exiting...")
+            exit()
+        # Each row is float32 current(s) followed by float32 voltage.
+        self.RecordType = np.dtype([('current', '<f4', (self.Channels,)), ('voltage', '<f4')])
+
         self.maxindex = 0
-        temp = self.DataFileName.split(".edh")[0] + "_" + str('{:03d}'.format(int(self.maxindex+1))) + ".dat"
+        segments = [self.SegmentFileName(0)]
+        temp = self.SegmentFileName(self.maxindex+1)
         while os.path.isfile(temp):
+            segments.append(temp)
             self.maxindex += 1
-            temp = self.DataFileName.split(".edh")[0] + "_" + str('{:03d}'.format(int(self.maxindex+1))) + ".dat"
+            temp = self.SegmentFileName(self.maxindex+1)
+        self.AllData = SegmentedData(segments, self.RecordType)
+        print("Total rows in", len(segments), "segment(s) =", len(self.AllData))
         self.index = 0
         self.OpenDataFile()
 
+    def SegmentFileName(self, index):
+        return self.DataFileName.split(".edh")[0] + "_" + str('{:03d}'.format(int(index))) + ".dat"
+
 
     # Initialize Raw Data
     def OpenDataFile(self):
@@ -66,35 +177,21 @@ class ElementsData:
             self.index = 0
         if self.index > self.maxindex:
             self.index = self.maxindex
-        fin = self.DataFileName.split(".edh")[0] + "_" + str('{:03d}'.format(int(self.index))) + ".dat"
+        fin = self.SegmentFileName(self.index)
         if not os.path.isfile(fin):
             self.index = self.index - 1
-        with open(fin, 'rb') as file: # Read binary
-            databytes = os.path.getsize(fin)
-            print("Datasize in bytes =",databytes)
-            columns = self.Channels + 1
-            self.Rows = int(databytes // 4 // columns)
-
-            # Use struct to unpack binary data into Data array
-            formatstring = str(columns * 'f')
-            buffersize = struct.calcsize(formatstring)
-            #Read into python list for speed...
-            test = []
-            for i in range(self.Rows):
-                test.append(struct.unpack(formatstring, file.read(buffersize)))
-            #Store as numpy array for indexing versatility...
-            self.Data = np.array(test)
-
-            # Read Data from PCA (either 1 or 4-channel) into local arrays
-            self.voltage = []
-            self.current = np.empty(shape=(self.Rows, self.Channels), dtype=float)
-            if self.Channels == 1 or self.Channels == 4:
-                for i in range(self.Channels):
-                    self.current[:,i] = self.Data[:,i]
-                self.voltage = self.Data[:,self.Channels]
-            else:
-                print("Unrecognized patch clamp amplifier. Exiting...")
-                exit()
+        print("Datasize in bytes =",os.path.getsize(fin))
+
+        # Map the file rather than reading it; pages are only loaded from disk as they are touched.
+        columns = self.Channels + 1
+        self.Records = self.AllData.Records(self.index)
+        self.Rows = len(self.Records)
+
+        # Views onto the mapped file, no copies:
+        #   Data (Rows, columns), current (Rows, Channels) in nA, voltage (Rows,) in mV
+        self.Data = self.Records.view('<f4').reshape(self.Rows, columns)
+        self.current = self.Records['current']
+        self.voltage = self.Records['voltage']
 
     # Do not use for now...
     # def Concatenate(self):   # Concatenate binary data files into full data file
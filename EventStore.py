@@ -0,0 +1,181 @@
+""" EventStore.py
+Append-only columnar table of detected translocation events for RTDAQ-32bit
+One directory per recording session, holding one raw little-endian file per
+column (<column>.dat) and a "Key: value" text header (events.evh), so a
+column can be memory mapped and scanned on its own. Rows are derived from
+the file sizes, which keeps a session cut short by a crash readable.
+Queries scan the mapped columns block by block with numpy, so histograms
+over tens of millions of events need neither the raw traces nor the whole
+table in memory.
+"""
+
+import os
+import shutil
+import time
+import numpy as np
+
+# Column name, on-disk dtype
+EventColumns = [('channel', '<i1'),         # 1..4
+                ('tStart', '<f8'),          # s since the RTDAQApp fiducial
+                ('dwell', '<f4'),           # s
+                ('amplitude', '<f4'),       # Mean deviation from baseline, nA
+                ('baseline', '<f4'),        # nA
+                ('vhold', '<f4'),           # mV
+                ('x', '<f4'),               # Stage position at tStart, microns
+                ('y', '<f4')]
+
+HeaderFileName = 'events.evh'
+
+
+class EventStore:
+    def __init__(self, directory, columns=EventColumns):
+        """Opens the session in directory, creating it if needed."""
+        self.Directory = directory
+        header = os.path.join(directory, HeaderFileName)
+        self.StartTime = None
+        if os.path.isfile(header):
+            columns = []
+            with open(header, 'r') as f:
+                for line in f.readlines():
+                    text = line.split(": ")[0]
+                    if text == "Columns":
+                        for column in line.split(": ")[1].strip().split(','):
+                            columns.append(tuple(column.split(':')))
+                    if text == "Session start time":
+                        self.StartTime = line.split(": ")[1].strip()
+        self.Columns = [name for name, dtype in columns]
+        self.dtypes = dict((name, np.dtype(dtype)) for name, dtype in columns)
+        self.files = None
+        self.mapped = {}
+        self.mappedRows = -1
+        if not os.path.isfile(header):
+            os.makedirs(directory, exist_ok=True)
+            self.StartTime = time.strftime('%Y-%m-%d %H:%M:%S')
+            self.WriteHeader(None)
+
+    def ColumnFileName(self, name):
+        return os.path.join(self.Directory, name + '.dat')
+
+    def WriteHeader(self, rows):
+        with open(os.path.join(self.Directory, HeaderFileName), 'w') as f:
+            f.write("Columns: " + ','.join(name + ':' + self.dtypes[name].str for name in self.Columns) + "\n")
+            f.write("Session start time: " + str(self.StartTime) + "\n")
+            if rows is not None:
+                f.write("Rows: " + str(rows) + "\n")
+
+    def __len__(self):
+        return min(os.path.getsize(self.ColumnFileName(name)) // self.dtypes[name].itemsize
+                   if os.path.isfile(self.ColumnFileName(name)) else 0
+                   for name in self.Columns)
+
+    def Append(self, rows):
+        """rows: structured array or dict of equal length arrays, one per column."""
+        if self.files is None:
+            self.files = dict((name, open(self.ColumnFileName(name), 'ab')) for name in self.Columns)
+        for name in self.Columns:
+            np.asarray(rows[name], dtype=self.dtypes[name]).tofile(self.files[name])
+
+    def Flush(self):
+        if self.files is not None:
+            for f in self.files.values():
+                f.flush()
+
+    def Close(self):
+        if self.files is not None:
+            for f in self.files.values():
+                f.close()
+            self.files = None
+        self.mapped = {}
+        self.WriteHeader(len(self))
+
+    def Discard(self):
+        self.Close()
+        shutil.rmtree(self.Directory, ignore_errors=True)
+
+    def Move(self, directory):
+        """Rename a closed session."""
+        shutil.move(self.Directory, directory)
+        self.Directory = directory
+
+    def Column(self, name):
+        """Read-only memmap of one column."""
+        self.Flush()
+        rows = len(self)
+        if rows != self.mappedRows:
+            self.mapped = {}
+            self.mappedRows = rows
+        if name not in self.mapped:
+            if rows == 0:
+                self.mapped[name] = np.zeros(0, dtype=self.dtypes[name])
+            else:
+                self.mapped[name] = np.memmap(self.ColumnFileName(name), dtype=self.dtypes[name],
+                                              mode='r', shape=(rows,))
+        return self.mapped[name]
+
+    def Blocks(self, filters, blocksize):
+        # Yields (slice, mask) for consecutive blocks; filters map column -> value or (lo, hi)
+        rows = len(self)
+        for i in range(0, rows, blocksize):
+            block = slice(i, min(i + blocksize, rows))
+            mask = np.ones(block.stop - block.start, dtype=bool)
+            for name, value in filters.items():
+                column = self.Column(name)[block]
+                if isinstance(value, tuple):
+                    lo, hi = value
+                    if lo is not None:
+                        mask &= column >= lo
+                    if hi is not None:
+                        mask &= column < hi
+                else:
+                    mask &= column == value
+            yield block, mask
+
+    def Query(self, columns=None, blocksize=1 << 22, **filters):
+        """Rows matching every filter, as a dict of arrays. A filter is column=value
+        or column=(lo, hi) for lo <= value < hi, either bound None for open, e.g.
+            store.Query(['dwell', 'amplitude'], channel=2, tStart=(60, 120))"""
+        if columns is None:
+            columns = self.Columns
+        parts = dict((name, []) for name in columns)
+        for block, mask in self.Blocks(filters, blocksize):
+            for name in columns:
+                parts[name].append(self.Column(name)[block][mask])
+        return dict((name, np.concatenate(parts[name]) if parts[name] else np.zeros(0, dtype=self.dtypes[name]))
+                    for name in columns)
+
+    def Count(self, blocksize=1 << 22, **filters):
+        return sum(int(np.count_nonzero(mask)) for block, mask in self.Blocks(filters, blocksize))
+
+    def Histogram(self, column, bins=100, range=None, blocksize=1 << 22, **filters):
+        """(counts, edges) of one column over the matching rows, accumulated block by block."""
+        if range is None and np.ndim(bins) == 0:
+            range = self.Range(column, blocksize, **filters)
+        edges = np.histogram_bin_edges([], bins, range) if np.ndim(bins) == 0 else np.asarray(bins)
+        counts = np.zeros(len(edges) - 1, dtype=np.int64)
+        for block, mask in self.Blocks(filters, blocksize):
+            counts += np.histogram(self.Column(column)[block][mask], edges)[0]
+        return counts, edges
+
+    def Histogram2D(self, xcolumn, ycolumn, bins=100, range=None, blocksize=1 << 22, **filters):
+        """(counts, xedges, yedges), e.g. dwell against amplitude."""
+        if range is None:
+            range = [self.Range(xcolumn, blocksize, **filters), self.Range(ycolumn, blocksize, **filters)]
+        counts, xedges, yedges = np.histogram2d([], [], bins, range)
+        counts = counts.astype(np.int64)
+        for block, mask in self.Blocks(filters, blocksize):
+            counts += np.histogram2d(self.Column(xcolumn)[block][mask], self.Column(ycolumn)[block][mask],
+                                     [xedges, yedges])[0].astype(np.int64)
+        return counts, xedges, yedges
+
+    def Range(self, column, blocksize=1 << 22, **filters):
+        lo, hi = np.inf, -np.inf
+        for block, mask in self.Blocks(filters, blocksize):
+            values = self.Column(column)[block][mask]
+            if len(values):
+                lo = min(lo, float(values.min()))
+                hi = max(hi, float(values.max()))
+        if lo > hi:
+            return (0.0, 1.0)
+        if lo == hi:
+            return (lo - 0.5, hi + 0.5)
+        return (lo, hi)
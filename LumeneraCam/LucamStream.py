@@ -0,0 +1,209 @@
+""" LucamStream.py
+Streaming capture from Lumenera cameras through the LuCam API (lucamapi.dll)
+    Load        Loads lucamapi with the prototypes below bound, or the
+                simulated stand-in (lucamapi_sim) when the DLL is missing
+    LucamStream Streaming-callback capture into a pool of reusable buffers
+The API calls the streaming callback from its own thread with every frame.
+The callback only copies the frame into a free pool buffer and queues it
+with its hardware frame counter and timestamp; a frame arriving while no
+buffer is free is dropped and counted. Consumers take frames with
+GetFrame() and hand the buffer back with Release().
+"""
+
+import collections
+import ctypes
+from ctypes import POINTER, Structure, byref, c_float, c_int, c_long, c_ubyte, c_ulong, c_ulonglong, c_ushort, c_void_p
+import queue
+import time
+import numpy as np
+from Buffers import RingBuffer
+
+
+class LUCAM_FRAME_FORMAT(Structure):
+    _fields_ = [('xOffset', c_ulong),
+                ('yOffset', c_ulong),
+                ('width', c_ulong),
+                ('height', c_ulong),
+                ('pixelFormat', c_ulong),
+                ('binningX', c_ushort),     # subSampleX when flagsX is 0
+                ('flagsX', c_ushort),
+                ('binningY', c_ushort),
+                ('flagsY', c_ushort)]
+
+
+class LUCAM_IMAGE_FORMAT(Structure):
+    _fields_ = [('Size', c_ulong),
+                ('Width', c_ulong),
+                ('Height', c_ulong),
+                ('PixelFormat', c_ulong),
+                ('ImageSize', c_ulong),
+                ('LucamReserved', c_ulong * 8)]
+
+
+LUCAM_PF_8 = 0
+LUCAM_PF_16 = 1
+PixelTypes = {LUCAM_PF_8: np.uint8, LUCAM_PF_16: np.uint16}     # Raw formats streamed by the callback
+STOP_STREAMING = 0
+START_STREAMING = 1
+LUCAM_METADATA_FRAME_COUNTER = 1
+LUCAM_METADATA_TIMESTAMP = 2
+
+# Streaming callback: (context, frame data, data length); the API is __stdcall on Windows
+StreamingCallback = getattr(ctypes, 'WINFUNCTYPE', ctypes.CFUNCTYPE)(None, c_void_p, POINTER(c_ubyte), c_ulong)
+
+# Function name, argtypes, restype
+Prototypes = [
+    ('LucamCameraOpen',               [c_ulong], c_void_p),
+    ('LucamCameraClose',              [c_void_p], c_int),
+    ('LucamGetFormat',                [c_void_p, POINTER(LUCAM_FRAME_FORMAT), POINTER(c_float)], c_int),
+    ('LucamGetVideoImageFormat',      [c_void_p, POINTER(LUCAM_IMAGE_FORMAT)], c_int),
+    ('LucamStreamVideoControl',       [c_void_p, c_ulong, c_void_p], c_int),
+    ('LucamAddStreamingCallback',     [c_void_p, StreamingCallback, c_void_p], c_long),
+    ('LucamRemoveStreamingCallback',  [c_void_p, c_long], c_int),
+    ('LucamEnableTimestamp',          [c_void_p, c_int], c_int),
+    ('LucamGetTimestampFrequency',    [c_void_p, POINTER(c_ulonglong)], c_int),
+    ('LucamGetTimestamp',             [c_void_p, POINTER(c_ulonglong)], c_int),
+    ('LucamGetMetadata',              [c_void_p, POINTER(c_ubyte), POINTER(LUCAM_IMAGE_FORMAT), c_ulonglong,
+                                       POINTER(c_ulonglong)], c_int),
+    ('LucamGetLastError',             [], c_ulong),
+]
+
+
+def Load(name='lucamapi'):
+    """The LuCam API with the prototypes bound; the simulated camera if the DLL
+    cannot be loaded. Functions missing from older API versions are left unbound."""
+    try:
+        api = getattr(ctypes, 'WinDLL', ctypes.CDLL)(name)
+    except OSError:
+        import lucamapi_sim
+        print('lucamapi not found, using the simulated camera')
+        return lucamapi_sim.LucamAPI()
+    for function, argtypes, restype in Prototypes:
+        try:
+            f = getattr(api, function)
+        except AttributeError:
+            continue
+        f.argtypes = argtypes
+        f.restype = restype
+    return api
+
+
+class LucamStream:
+    def __init__(self, api=None, index=1, buffers=16, history=10000):
+        """api      From Load(), or any object with the same calls; Load() if None
+        index       Camera number, 1-based as in the LuCam API
+        buffers     Frames the pool holds while consumers catch up"""
+        self.api = Load() if api is None else api
+        self.hCamera = self.api.LucamCameraOpen(index)
+        if not self.hCamera:
+            raise IOError('Lumenera camera {0} could not be opened'.format(index))
+        self.Format = LUCAM_FRAME_FORMAT()
+        rate = c_float()
+        self.api.LucamGetFormat(self.hCamera, byref(self.Format), byref(rate))
+        self.FrameRate = rate.value
+        f = self.Format
+        self.Shape = (f.height // f.binningY, f.width // f.binningX)
+        dtype = PixelTypes.get(f.pixelFormat)
+        if dtype is None:
+            raise ValueError('Unsupported streaming pixel format {0}'.format(f.pixelFormat))
+        self.Pool = [np.zeros(self.Shape, dtype=dtype) for k in range(buffers)]
+        self.free = collections.deque(range(buffers))
+        self.Ready = queue.Queue()
+        self.ImageFormat = LUCAM_IMAGE_FORMAT()
+        self.ImageFormat.Size = ctypes.sizeof(LUCAM_IMAGE_FORMAT)
+        self.metadata = c_ulonglong()
+        self.callback = StreamingCallback(self.OnFrame)     # Kept referenced while streaming
+        self.CallbackID = -1
+        self.t0 = time.time()
+        self.bHardwareTime = False
+        # rows: frame time (s since the fiducial), hardware frame counter
+        self.Times = RingBuffer(history, 2)
+        self.Frames = 0
+        self.Dropped = 0
+
+    def SetFiducials(self, t):
+        self.t0 = t
+        if self.bHardwareTime:
+            self.SyncClock()
+
+    def SyncClock(self):
+        # Pairs the camera clock with the host clock; frame times are camera ticks since then
+        ticks = c_ulonglong()
+        self.api.LucamGetTimestamp(self.hCamera, byref(ticks))
+        self.tick0 = ticks.value
+        self.tHost0 = time.time() - self.t0
+
+    def Start(self):
+        self.bHardwareTime = False
+        try:
+            frequency = c_ulonglong()
+            if (self.api.LucamEnableTimestamp(self.hCamera, 1)
+                    and self.api.LucamGetTimestampFrequency(self.hCamera, byref(frequency))
+                    and self.api.LucamGetVideoImageFormat(self.hCamera, byref(self.ImageFormat))):
+                self.TickPeriod = 1.0 / frequency.value
+                self.bHardwareTime = True
+                self.SyncClock()
+        except AttributeError:
+            pass
+        if not self.bHardwareTime:
+            print('Lumenera hardware timestamps unavailable, using host arrival times')
+        self.CallbackID = self.api.LucamAddStreamingCallback(self.hCamera, self.callback, None)
+        if self.CallbackID == -1:
+            raise IOError('Lumenera streaming callback refused, error {0}'.format(self.api.LucamGetLastError()))
+        self.api.LucamStreamVideoControl(self.hCamera, START_STREAMING, None)
+
+    def Stop(self):
+        if self.CallbackID == -1:
+            return
+        self.api.LucamStreamVideoControl(self.hCamera, STOP_STREAMING, None)
+        self.api.LucamRemoveStreamingCallback(self.hCamera, self.CallbackID)
+        self.CallbackID = -1
+
+    def Close(self):
+        self.Stop()
+        self.api.LucamCameraClose(self.hCamera)
+
+    def OnFrame(self, context, data, length):
+        # API streaming thread: copy out and return, the camera does not wait
+        tHost = time.time() - self.t0
+        try:
+            k = self.free.popleft()
+        except IndexError:
+            self.Dropped += 1
+            return
+        buffer = self.Pool[k]
+        ctypes.memmove(buffer.ctypes.data, data, min(length, buffer.nbytes))
+        counter = self.Frames
+        t = tHost
+        if self.bHardwareTime:
+            m = self.metadata
+            if self.api.LucamGetMetadata(self.hCamera, data, byref(self.ImageFormat), LUCAM_METADATA_TIMESTAMP, byref(m)):
+                t = self.tHost0 + (m.value - self.tick0) * self.TickPeriod
+            if self.api.LucamGetMetadata(self.hCamera, data, byref(self.ImageFormat), LUCAM_METADATA_FRAME_COUNTER, byref(m)):
+                counter = m.value
+        self.Frames += 1
+        self.Times.Append([[t], [counter]])
+        self.Ready.put((k, counter, t))
+
+    def GetFrame(self, timeout=None):
+        """(k, frame, counter, t) of the oldest captured frame, None on timeout.
+        frame is pool buffer k, valid until Release(k)."""
+        try:
+            k, counter, t = self.Ready.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        return k, self.Pool[k], counter, t
+
+    def Release(self, k):
+        self.free.append(k)
+
+    def Summary(self):
+        """Frame counts, and the frame interval and its spread from the frame times, in ms."""
+        times = np.array(self.Times.View())
+        summary = {'frames': self.Frames, 'dropped': self.Dropped, 'hardware_time': self.bHardwareTime}
+        if times.shape[1] > 1:
+            interval = np.diff(times[0]) * 1e3
+            summary.update({'fps': 1e3 / float(np.median(interval)),
+                            'interval_sd_ms': float(interval.std()),
+                            'counter_gaps': int(np.count_nonzero(np.diff(times[1]) > 1))})
+        return summary
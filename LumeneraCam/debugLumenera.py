@@ -1,10 +1,15 @@
 # ...for class debugging
 
-from Video import *
+import os
 import sys
+sys.path.append(os.path.abspath('..'))
+sys.path.append(os.path.abspath('../Video'))
+from PyQt5 import QtWidgets
+from Lucam import *
 
 if __name__ == "__main__":
     app = QtWidgets.QApplication(sys.argv)
-    window = VidWin()
+    window = LuCAMWindow()
+    window.bCanClose = True
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
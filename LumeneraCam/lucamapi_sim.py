@@ -0,0 +1,134 @@
+""" lucamapi_sim.py
+Simulated Lumenera camera with the streaming calls of lucamapi.dll used by
+LucamStream, for running and testing capture without the camera:
+    LucamStream.LucamStream(lucamapi_sim.LucamAPI(fps=100))
+LucamStream.Load() falls back to it when lucamapi cannot be loaded.
+Pointer arguments are the ctypes byref() objects LucamStream passes to the DLL.
+Streaming frames are raw8 (or raw16) images of a bar moving across fixed
+noise, delivered to the streaming callbacks from a Scheduler thread at the
+configured frame rate. Each frame carries a frame counter and a timestamp in
+perf_counter_ns ticks, read back with LucamGetMetadata as with the camera.
+"""
+
+import ctypes
+from ctypes import POINTER, c_ubyte
+import time
+import numpy as np
+import LucamStream as ls
+from Scheduler import Scheduler
+
+
+class LucamAPI:
+    TimestampFrequency = 1000000000     # perf_counter_ns ticks
+
+    def __init__(self, width=1280, height=1024, fps=60.0, pixelformat=ls.LUCAM_PF_8, buffers=4,
+                 timestamps=True, seed=None):
+        """buffers      Driver-side frame buffers the frames rotate through
+        timestamps      False simulates an API without frame metadata"""
+        self.width, self.height = width, height
+        self.fps = float(fps)
+        self.pixelformat = pixelformat
+        self.timestamps = timestamps
+        dtype = ls.PixelTypes[pixelformat]
+        rng = np.random.RandomState(seed)
+        self.Background = (rng.randint(0, 32, (height, width)) * (np.iinfo(dtype).max // 255)).astype(dtype)
+        self.Buffers = [self.Background.copy() for k in range(buffers)]
+        self.Pointers = [ctypes.cast(b.ctypes.data, POINTER(c_ubyte)) for b in self.Buffers]
+        self.Metadata = {}      # buffer address -> (frame counter, timestamp)
+        self.Callbacks = {}     # callback id -> (function, context)
+        self.nextID = 0
+        self.bOpen = False
+        self.bTimestamp = False
+        self.Counter = 0
+        self.Scheduler = None
+        self.LastError = 0
+
+    def LucamCameraOpen(self, index):
+        if index != 1 or self.bOpen:
+            self.LastError = 1
+            return None
+        self.bOpen = True
+        return 1
+
+    def LucamCameraClose(self, hCamera):
+        self.LucamStreamVideoControl(hCamera, ls.STOP_STREAMING, None)
+        self.bOpen = False
+        return 1
+
+    def LucamGetFormat(self, hCamera, pFormat, pFrameRate):
+        f = pFormat._obj
+        f.xOffset, f.yOffset = 0, 0
+        f.width, f.height = self.width, self.height
+        f.pixelFormat = self.pixelformat
+        f.binningX, f.binningY = 1, 1
+        f.flagsX, f.flagsY = 0, 0
+        pFrameRate._obj.value = self.fps
+        return 1
+
+    def LucamGetVideoImageFormat(self, hCamera, pImageFormat):
+        f = pImageFormat._obj
+        f.Width, f.Height = self.width, self.height
+        f.PixelFormat = self.pixelformat
+        f.ImageSize = self.Buffers[0].nbytes
+        return 1
+
+    def LucamStreamVideoControl(self, hCamera, controlType, hWnd):
+        if controlType == ls.START_STREAMING and self.Scheduler is None:
+            self.Scheduler = Scheduler('lucamapi_sim')
+            self.Scheduler.Add('Frame', self.Frame, 1.0 / self.fps)
+            self.Scheduler.Start()
+        elif controlType == ls.STOP_STREAMING and self.Scheduler is not None:
+            self.Scheduler.Stop()
+            self.Scheduler = None
+        return 1
+
+    def LucamAddStreamingCallback(self, hCamera, callback, context):
+        self.nextID += 1
+        self.Callbacks[self.nextID] = (callback, context)
+        return self.nextID
+
+    def LucamRemoveStreamingCallback(self, hCamera, callbackId):
+        return 1 if self.Callbacks.pop(callbackId, None) is not None else 0
+
+    def LucamEnableTimestamp(self, hCamera, enable):
+        if not self.timestamps:
+            self.LastError = 1
+            return 0
+        self.bTimestamp = bool(enable)
+        return 1
+
+    def LucamGetTimestampFrequency(self, hCamera, pFrequency):
+        pFrequency._obj.value = self.TimestampFrequency
+        return 1
+
+    def LucamGetTimestamp(self, hCamera, pTimestamp):
+        pTimestamp._obj.value = time.perf_counter_ns()
+        return 1
+
+    def LucamGetMetadata(self, hCamera, pImageBuffer, pFormat, index, pMetaData):
+        metadata = self.Metadata.get(ctypes.addressof(pImageBuffer.contents))
+        if metadata is None or not self.bTimestamp:
+            return 0
+        if index == ls.LUCAM_METADATA_FRAME_COUNTER:
+            pMetaData._obj.value = metadata[0]
+        elif index == ls.LUCAM_METADATA_TIMESTAMP:
+            pMetaData._obj.value = metadata[1]
+        else:
+            return 0
+        return 1
+
+    def LucamGetLastError(self):
+        return self.LastError
+
+    def Frame(self):
+        # Scheduler thread: exposure ends now, then the frame is handed to every callback
+        timestamp = time.perf_counter_ns()
+        k = self.Counter % len(self.Buffers)
+        frame = self.Buffers[k]
+        column = self.Counter % self.width
+        frame[:, column] = np.iinfo(frame.dtype).max
+        self.Metadata[frame.ctypes.data] = (self.Counter, timestamp)
+        for callback, context in list(self.Callbacks.values()):
+            callback(context, self.Pointers[k], frame.nbytes)
+        frame[:, column] = self.Background[:, column]
+        self.Counter += 1
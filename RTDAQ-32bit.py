@@ -9,16 +9,21 @@ E.Yafuso
 Feb 2019
 """
 
-import sys, glob
+import sys, os, glob, tempfile, queue, collections
 import numpy as np
 import string
 import ctypes
-from PyQt5 import QtWidgets, uic
+from PyQt5 import QtCore, QtWidgets, uic
 
 import threading, time
 #import Video
 import ACCES
 import EDL
+from Recorder import StreamRecorder
+from ClosedLoop import EventTrigger
+from EventStore import EventStore
+from RasterScan import CurrentMap, MapWindow
+import Alignment
 #import uF
 
 WINDOWS = False
@@ -53,17 +58,28 @@ class RTDAQApp(QtWidgets.QDialog):
        # self.ui.bVideo.clicked.connect(self.VideoShow)
         self.ui.bNanoControl.clicked.connect(self.NanoWindowShow)
         self.ui.bElements.clicked.connect(self.ElementsShow)
+        self.ui.bExport.clicked.connect(self.ExportCSV)
         #self.ui.buF.clicked.connect(self.uFluidicsShow)
 
         # Class attributes
         self.bRecord = False
-
-        # Real-time data...
-        self.t = np.zeros(1, dtype=float)
+        self.Recorders = {}
+        self.EventStore = None
+        self.VideoRecorder = None
+        self.CurrentMap = None      # Map of the raster being scanned by an ACCES script
+        self.MapWindow = None
+        self.MapIndex = -1
+        self.SavedBase = None       # Last saved run, offered first for CSV export
+        self.ExportThread = None
+        # Exported runs are merged onto this stream's timestamps; set-points are held, positions interpolated.
+        self.MasterClock = 'PCA'
+        self.AlignMethods = {'XSET': 'asof', 'YSET': 'asof', 'ZSET': 'asof',
+                             'Frame': 'asof', 'CaptureFrame': 'asof'}
 
         self.show()
 
         # Externally developed classes
+        self.VidWin = None      # Video.VidWin when the camera is in use
         #self.VidWin = Video.VidWin()
         #self.VidWin.show()
         self.NanoControl = ACCES.ACCES()
@@ -73,47 +89,81 @@ class RTDAQApp(QtWidgets.QDialog):
         self.Elements = EDL.EDL()
         self.Elements.show()
 
-        # Start real-time data acquisition thread
-        self.DAQProcess = threading.Thread(target=self.DataAcquisitionProcess)
-        self.DAQProcess.start()
-
-    def DataAcquisitionProcess(self):
-        self.InitDataArrays()
-        self.t0 = self.t = time.time()
+        # Detected events move the stage by the EDL presets, straight from the EDL reader thread
+        self.Trigger = EventTrigger(self.NanoControl.moveAxes)
+        self.Elements.Reader.Trigger = self.Trigger
+        self.Elements.SetNano()
+        # Every chunk and event from the EDL reader, losslessly, for the event table and current maps
+        self.Tap = queue.Queue()
+        self.Elements.Reader.Taps.append(self.Tap)
+        self.StoreLock = threading.Lock()
+        self.tConsumed = -np.inf    # Time of the newest chunk handled by Consume
+        self.PositionWait = 0.5     # s a chunk waits for stage positions covering it
+        self.bConsume = True
+        self.ConsumerThread = threading.Thread(target=self.Consume, daemon=True)
+        self.ConsumerThread.start()
+        self.NanoControl.RasterChanged.connect(self.RasterChanged)
+
+        # Each instrument acquires in its own worker thread; this window only shows status
+        self.StartAcquisition()
+        self.StatusTimer = QtCore.QTimer(self)
+        self.StatusTimer.timeout.connect(self.UpdateData)
+        self.StatusTimer.start(100)
+
+    def StartAcquisition(self):
         self.SetFiducials()
-        while True:
-            time.sleep(0.01)
-            self.UpdateData()
-            #self.DataPlot()
+        self.Elements.StartAcquisition()
+        self.NanoControl.StartAcquisition()
+        #self.uF.StartAcquisition()
 
     def SetFiducials(self):
         self.t0 = time.time()
+        self.tConsumed = -np.inf
         self.Elements.SetFiducials(self.t0)
         self.NanoControl.SetFiducials(self.t0)
+        if self.VidWin is not None:
+            self.VidWin.SetFiducials(self.t0)
 
     def UpdateData(self):
-        self.t = np.append(self.t, time.time()-self.t0)
-        self.NanoControl.UpdateData()
-        self.Elements.UpdateData()
-        #self.uF.UpdateData(self.t)
+        t = time.time()-self.t0
         if self.bRecord:
-            self.ui.pbREC.setText("RECORDING: ", self.t[-1])
-
-    # def DataPlot(self):
-    #     self.NanoControl.DataPlot(self.t)
-    #     self.Elements.DataPlot()
-    #     #self.uF.DataPlot(self.t)
+            self.ui.pbREC.setText("RECORDING: {0:.1f} s".format(t))
+        if self.ExportThread is not None and not self.ExportThread.is_alive():
+            self.ExportThread = None
+            self.ui.bExport.setText("Export CSV")
 
     def ToggleRecording(self):
         if self.bRecord == False:
-            self.bRecord = True
+            # Stream to a working file while recording; moved next to the chosen file name on save.
+            base = os.path.join(tempfile.gettempdir(), time.strftime('RTDAQ_%Y%m%d_%H%M%S'))
+            self.Recorders = {'PCA': StreamRecorder(base + '_PCA.dat', self.Elements.Reader.DataColumns),
+                              'XYZ': StreamRecorder(base + '_XYZ.dat', self.NanoControl.DataColumns)}
+            for recorder in self.Recorders.values():
+                recorder.Start()
+            self.Elements.Reader.Recorder = self.Recorders['PCA']
+            self.NanoControl.Recorder = self.Recorders['XYZ']
+            with self.StoreLock:
+                self.EventStore = EventStore(base + '_events')
+                self.bRecord = True
+            if self.VidWin is not None:
+                self.VideoRecorder = self.VidWin.StartRecording(base + '_video.avi')
             self.ui.pbREC.setStyleSheet("background-color:rgb(0,255,0)")
             self.ui.pbREC.setText("RECORDING")
-            self.InitDataArrays()
         else:
-            self.bRecord = False
+            self.Elements.Reader.Recorder = None
+            self.NanoControl.Recorder = None
+            for recorder in self.Recorders.values():
+                recorder.Stop()
+            # Events detected before the stop are still stored
+            self.WaitConsumed(time.time() - self.t0)
+            with self.StoreLock:
+                self.bRecord = False
+                self.EventStore.Close()
+            if self.VideoRecorder is not None:
+                self.VidWin.StopRecording()
             self.ui.pbREC.setStyleSheet("background-color:rgb(255,0,0)")
             self.ui.pbREC.setText("RECORDING STOPPED")
+            savefilename = ''
             if QtWidgets.QMessageBox.question(self, 'Save data run?', "Save last run to file?",
                                                 QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
                                                 QtWidgets.QMessageBox.No) == QtWidgets.QMessageBox.Yes:
@@ -121,46 +171,138 @@ class RTDAQApp(QtWidgets.QDialog):
                                                                       'Save data to file',
                                                                       'C:\\',
                                                                       "Demonpore Data Files (*.csv)")[0]
+            if savefilename:
                 self.SaveData(savefilename)
-
-    def InitDataArrays(self):
-        self.NanoControl.xsetdata = np.zeros(1, dtype=float)
-        self.NanoControl.ysetdata = np.zeros(1, dtype=float)
-        self.NanoControl.zsetdata = np.zeros(1, dtype=float)
-        self.NanoControl.xdata = np.zeros(1, dtype=float)
-        self.NanoControl.ydata = np.zeros(1, dtype=float)
-
-        self.Elements.InitDataArrays()
-
-        # self.uF.Psetdata = np.zeros(1, dtype=float)
-        # self.uF.Pdata = np.zeros(1, dtype=float)
-        # self.uF.Flowdata = np.zeros(1, dtype=float)
-
-        self.t[0] = self.Elements.t[0] = time.time()
+            else:
+                for recorder in self.Recorders.values():
+                    recorder.Discard()
+                self.EventStore.Discard()
+                if self.VideoRecorder is not None:
+                    self.VideoRecorder.Discard()
+            self.Recorders = {}
+            self.EventStore = None
+            self.VideoRecorder = None
+
+    def Consume(self):
+        # Consumer thread: takes every chunk the EDL reader produces, in order. Stage positions
+        # come from the ACCES thread, so a chunk is held until positions cover it, or for at
+        # most PositionWait, after which its samples beyond the newest position get none.
+        # The chunks ready in a pass are mapped together, one CurrentMap.Add for all of them.
+        pending = collections.deque()
+        while self.bConsume:
+            try:
+                pending.append(self.Tap.get(timeout=0.01 if pending else 0.1))
+            except queue.Empty:
+                pass
+            tPosition = self.NanoControl.LastTime()
+            tNow = time.time() - self.t0
+            ready = []
+            while pending:
+                chunk, events = pending[0]
+                tChunk = chunk[0, -1]
+                if (tPosition is None or tChunk > tPosition) and tNow - tChunk < self.PositionWait:
+                    break
+                pending.popleft()
+                if len(events):
+                    self.StoreEvents(events)
+                ready.append(chunk)
+            if ready:
+                self.MapChunk(ready[0] if len(ready) == 1 else np.hstack(ready))
+                self.tConsumed = ready[-1][0, -1]
+                for chunk in ready:
+                    self.Tap.task_done()
+
+    def WaitConsumed(self, t, timeout=1.0):
+        # Until Consume has handled the chunks up to t, or nothing is left in the tap
+        tEnd = time.perf_counter() + timeout
+        while self.tConsumed < t and self.Tap.unfinished_tasks and time.perf_counter() < tEnd:
+            time.sleep(0.005)
+
+    def StoreEvents(self, events):
+        # Runs on the consumer thread
+        with self.StoreLock:
+            if not self.bRecord:
+                return
+            x, y = self.NanoControl.PositionAt(events['tStart'])
+            self.EventStore.Append({'channel': events['channel'],
+                                    'tStart': events['tStart'],
+                                    'dwell': events['dwell'],
+                                    'amplitude': events['depth'],
+                                    'baseline': events['baseline'],
+                                    'vhold': events['vhold'],
+                                    'x': x,
+                                    'y': y})
+
+    def RasterChanged(self, index):
+        # A new raster gets a new map; the window of a finished raster stays open
+        self.MapIndex = index
+        if index < 0:
+            return
+        self.CurrentMap = CurrentMap(**self.NanoControl.Rasters[index])
+        self.MapWindow = MapWindow(self.CurrentMap)
+        self.MapWindow.show()
+
+    def MapChunk(self, chunk):
+        # Runs on the consumer thread; bins PCA current by measured stage position
+        currentmap = self.CurrentMap
+        if self.MapIndex < 0 or self.NanoControl.RasterIndex != self.MapIndex or currentmap is None:
+            return
+        x, y = self.NanoControl.PositionAt(chunk[0])
+        currentmap.Add(x, y, chunk[2:])
 
     def SaveData(self, savefilename):
-        DataToSave = np.column_stack((self.t,
-                                      self.Elements.t,
-                                      self.Elements.vHolddata,
-                                      self.Elements.ch1data,
-                                      self.Elements.ch2data,
-                                      self.Elements.ch3data,
-                                      self.Elements.ch4data,
-                                      self.NanoControl.xsetdata,
-                                      self.NanoControl.ysetdata,
-                                      self.NanoControl.zsetdata,
-                                      self.NanoControl.xdata,
-                                      self.NanoControl.ydata))
-                                      # self.uF.Psetdata,
-                                      # self.uF.Pdata,
-                                      # self.uF.Flowdata))
-
-        np.savetxt(savefilename,
-                   DataToSave,
-                   delimiter=',',
-                   header='Time,PCATime,VHold,PCA1,PCA2,PCA3,PCA4,XSET,YSET,ZSET,XPOS,YPOS,PSET,PDAT,FLOW',
-                   comments='')
-
+        # One binary stream per instrument: <name>_PCA.dat/.rth, <name>_XYZ.dat/.rth, and the
+        # detected events in <name>_events/. Video goes to <name>_video.avi with its frame
+        # index in <name>_video.dat/.rth. The aligned <name>.csv is written on demand (ExportCSV).
+        base = os.path.splitext(savefilename)[0]
+        self.EventStore.Move(base + '_events')
+        for name, recorder in self.Recorders.items():
+            recorder.Move(base + '_' + name)
+        if self.VideoRecorder is not None:
+            self.VideoRecorder.Move(base + '_video')
+        self.SavedBase = base
+
+    def SavedStreams(self, base):
+        # Every <base>_<name>.dat/.rth of a saved run, master clock first
+        streams = []
+        for header in sorted(glob.glob(glob.escape(base) + '_*.rth')):
+            name = header[len(base) + 1:-len('.rth')]
+            stream = Alignment.StreamFromRecording(name, header, methods=self.AlignMethods)
+            if name == self.MasterClock:
+                streams.insert(0, stream)
+            else:
+                streams.append(stream)
+        return streams
+
+    def ExportCSV(self):
+        # Writes <base>.csv of a saved run, every stream aligned onto the master clock,
+        # in a background thread; every Nth master sample for a lighter file
+        if self.ExportThread is not None:
+            print('CSV export already running')
+            return
+        start = self.SavedBase + '_' + self.MasterClock + '.rth' if self.SavedBase else 'C:\\'
+        header = QtWidgets.QFileDialog.getOpenFileName(self, 'Export saved run to CSV', start,
+                                                       "Demonpore recordings (*_" + self.MasterClock + ".rth)")[0]
+        if not header:
+            return
+        step, ok = QtWidgets.QInputDialog.getInt(self, 'Export CSV', 'Keep every Nth ' + self.MasterClock + ' sample:',
+                                                 1, 1, 1000000)
+        if not ok:
+            return
+        base = header[:-len('_' + self.MasterClock + '.rth')]
+        streams = self.SavedStreams(base)
+        if not streams or streams[0].name != self.MasterClock:
+            print('No', self.MasterClock, 'recording for', base)
+            return
+        self.ExportThread = threading.Thread(target=self.Export, args=(base + '.csv', streams, step), daemon=True)
+        self.ExportThread.start()
+        self.ui.bExport.setText("EXPORTING CSV")
+
+    def Export(self, filename, streams, step):
+        # Export thread
+        tStart = time.time()
+        Alignment.WriteCSV(filename, streams[0], streams[1:], step=step)
+        print('Exported', filename, 'in {0:.1f} s'.format(time.time() - tStart))
 
     def GetPorts(self):
         if WINDOWS:
@@ -214,7 +356,12 @@ class RTDAQApp(QtWidgets.QDialog):
     #         self.uF.bShow = True
 
     def Close(self):
-        self.VidWin.close()
+        self.bConsume = False
+        self.ConsumerThread.join()
+        if self.Trigger.Triggers:
+            print("Event triggers:", self.Trigger.Summary())
+        if self.VidWin is not None:
+            self.VidWin.close()
         self.NanoControl.close()
         self.Elements.close()
         #self.uF.close()
@@ -226,8 +373,7 @@ class RTDAQApp(QtWidgets.QDialog):
                                            QtWidgets.QMessageBox.Yes,
                                            QtWidgets.QMessageBox.No)
         if reply == QtWidgets.QMessageBox.Yes:
-            if self.DAQProcess != None:
-                self.DAQProcess.join()
+            self.StatusTimer.stop()
             self.Close()
             event.accept()
         else:
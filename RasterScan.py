@@ -0,0 +1,85 @@
+""" RasterScan.py
+Raster scans of the nanopositioner with live current maps for RTDAQ-32bit
+    Serpentine      Pixel-center set-points of a serpentine raster
+    CurrentMap      Per-pixel mean PCA current, binned by measured stage position
+    MapWindow       Live image of a CurrentMap
+Samples are binned with np.bincount over the pixels a chunk touches, so adding
+a chunk costs a few vector operations per channel whatever the map size.
+"""
+
+import numpy as np
+import pyqtgraph as pg
+from PyQt5 import QtCore, QtWidgets
+
+
+def Serpentine(nx, ny, x0, y0, width, height):
+    """(x, y) pixel centers, row by row with every other row reversed."""
+    dx, dy = width / nx, height / ny
+    ix = np.tile(np.arange(nx), ny)
+    iy = np.repeat(np.arange(ny), nx)
+    odd = iy % 2 == 1
+    ix[odd] = nx - 1 - ix[odd]
+    return x0 + (ix + 0.5) * dx, y0 + (iy + 0.5) * dy
+
+
+class CurrentMap:
+    def __init__(self, nx, ny, x0, y0, width, height, channels=4):
+        self.nx, self.ny = int(nx), int(ny)
+        self.x0, self.y0 = x0, y0
+        self.dx, self.dy = width / nx, height / ny
+        self.channels = channels
+        self.Clear()
+
+    def Clear(self):
+        self.Sums = np.zeros((self.channels, self.ny * self.nx))
+        self.Counts = np.zeros(self.ny * self.nx, dtype=np.int64)
+
+    def Add(self, x, y, current):
+        """Bin samples at measured positions x, y (microns); current (channels, n) in nA.
+        Samples outside the grid or without a position are ignored."""
+        ix = np.floor((np.asarray(x) - self.x0) / self.dx)
+        iy = np.floor((np.asarray(y) - self.y0) / self.dy)
+        valid = (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny)
+        if not np.any(valid):
+            return 0
+        pixel = (iy[valid] * self.nx + ix[valid]).astype(np.intp)
+        # Only the touched pixels: bins over the whole map would cost O(nx * ny) per chunk
+        touched, index = np.unique(pixel, return_inverse=True)
+        self.Counts[touched] += np.bincount(index)
+        for c in range(self.channels):
+            self.Sums[c, touched] += np.bincount(index, weights=current[c][valid])
+        return len(pixel)
+
+    def Map(self, channel=1):
+        """Mean current per pixel, shaped (nx, ny) as pg.ImageView expects; NaN where unvisited."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.Sums[channel - 1] / self.Counts
+        return mean.reshape(self.ny, self.nx).T
+
+
+class MapWindow(QtWidgets.QMainWindow):
+    def __init__(self, currentmap, channel=1, rate=5):
+        QtWidgets.QMainWindow.__init__(self)
+        self.CurrentMap = currentmap
+        self.Channel = channel
+        self.setWindowTitle('Current map, channel {0}'.format(channel))
+        self.ImageView = pg.ImageView()
+        self.setCentralWidget(self.ImageView)
+        self.bFirst = True
+        self.Timer = QtCore.QTimer(self)
+        self.Timer.timeout.connect(self.Refresh)
+        self.Timer.start(int(1000 / rate))
+
+    def Refresh(self):
+        m = self.CurrentMap
+        image = self.CurrentMap.Map(self.Channel)
+        if np.all(np.isnan(image)):
+            return
+        # Unvisited pixels at the lowest level; image positioned in stage microns
+        image = np.where(np.isnan(image), np.nanmin(image), image)
+        self.ImageView.setImage(image, autoRange=self.bFirst, autoLevels=True, pos=(m.x0, m.y0), scale=(m.dx, m.dy))
+        self.bFirst = False
+
+    def closeEvent(self, event):
+        self.Timer.stop()
+        event.accept()
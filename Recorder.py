@@ -0,0 +1,170 @@
+""" Recorder.py
+Streaming disk recorder for RTDAQ-32bit
+Each recorded stream is a raw binary data file (rows of float values, one
+column per channel, same layout as the Elements .dat files) plus a text
+header in "Key: value" form describing the columns.
+    StreamRecorder  Background writer thread fed through a queue bounded in samples
+    ReadRecording   Memory-mapped access to a finished (or interrupted) recording
+    ReadGaps        Samples a recording is missing, from its header
+A writer that cannot keep up first blocks the caller briefly; samples that
+still do not fit are dropped, and every such gap is written to the header as
+"row+samples" (data row the gap precedes, samples missing) so readers can
+tell exactly where the recording is discontinuous.
+"""
+
+import os
+import queue
+import shutil
+import threading, time
+import numpy as np
+
+
+def HeaderFileName(datafilename):
+    return os.path.splitext(datafilename)[0] + '.rth'
+
+
+class StreamRecorder:
+    def __init__(self, filename, columns, dtype=np.float64, maxsamples=1 << 22, blocktimeout=0.1, flushinterval=1.0):
+        """maxsamples     Samples queued for the writer before Write() blocks
+        blocktimeout        Seconds Write() blocks for queue space before dropping the chunk"""
+        self.DataFileName = filename
+        self.HeaderFileName = HeaderFileName(filename)
+        self.Columns = list(columns)
+        self.dtype = np.dtype(dtype)
+        self.FlushInterval = flushinterval
+        self.MaxSamples = int(maxsamples)
+        self.BlockTimeout = blocktimeout
+        self.Queue = queue.Queue()
+        self.Space = threading.Condition()
+        self.Pending = 0        # Samples queued, not yet written
+        self.Accepted = 0       # Samples queued since Start()
+        self.Rows = 0
+        self.Dropped = 0        # Samples dropped
+        self.Gaps = []          # (row, samples) of each drop
+        self.StartTime = None
+        self.Thread = None
+
+    def Start(self):
+        self.StartTime = time.strftime('%Y-%m-%d %H:%M:%S')
+        self.Pending = self.Accepted = self.Rows = self.Dropped = 0
+        self.Gaps = []
+        self.WriteHeader(None)
+        self.file = open(self.DataFileName, 'wb')
+        self.Thread = threading.Thread(target=self.WriterThread, daemon=True)
+        self.Thread.start()
+
+    def Write(self, chunk):
+        """Queue samples shaped (columns, n); the chunk is copied, so views into
+        live buffers may be passed. Blocks at most BlockTimeout for queue space,
+        then drops the chunk, records the gap and returns False."""
+        if self.Thread is None:
+            return False
+        chunk = np.ascontiguousarray(np.transpose(chunk), dtype=self.dtype)
+        n = len(chunk)
+        with self.Space:
+            if not self.Space.wait_for(lambda: self.Pending == 0 or self.Pending + n <= self.MaxSamples,
+                                       self.BlockTimeout):
+                self.Dropped += n
+                if self.Gaps and self.Gaps[-1][0] == self.Accepted:
+                    self.Gaps[-1] = (self.Accepted, self.Gaps[-1][1] + n)
+                else:
+                    self.Gaps.append((self.Accepted, n))
+                return False
+            self.Pending += n
+            self.Accepted += n
+            self.Queue.put(chunk)
+        return True
+
+    def Stop(self):
+        if self.Thread is None:
+            return
+        self.Queue.put(None)
+        self.Thread.join()
+        self.Thread = None
+        self.file.close()
+        self.WriteHeader(self.Rows)
+        if self.Dropped:
+            print('Recorder queue full, samples dropped from', self.DataFileName, ':', self.Dropped,
+                  'in', len(self.Gaps), 'gaps')
+
+    def WriterThread(self):
+        lastflush = time.monotonic()
+        gaps = 0
+        while True:
+            try:
+                chunk = self.Queue.get(timeout=self.FlushInterval)
+            except queue.Empty:
+                chunk = False
+            if chunk is None:
+                break
+            if chunk is not False:
+                self.file.write(chunk.tobytes())
+                self.Rows += len(chunk)
+                with self.Space:
+                    self.Pending -= len(chunk)
+                    self.Space.notify_all()
+            if time.monotonic() - lastflush >= self.FlushInterval:
+                self.file.flush()
+                lastflush = time.monotonic()
+                if len(self.Gaps) != gaps:
+                    # Gaps reach the header while recording, so an interrupted recording still has them
+                    gaps = len(self.Gaps)
+                    self.WriteHeader(None)
+
+    def WriteHeader(self, rows):
+        # Rows is only known once recording stops
+        with open(self.HeaderFileName, 'w') as f:
+            f.write("Columns: " + ','.join(self.Columns) + "\n")
+            f.write("Data type: " + self.dtype.name + "\n")
+            f.write("Acquisition start time: " + str(self.StartTime) + "\n")
+            if rows is not None:
+                f.write("Rows: " + str(rows) + "\n")
+            gaps = list(self.Gaps)
+            f.write("Dropped samples: " + str(sum(n for row, n in gaps)) + "\n")
+            if gaps:
+                f.write("Gaps: " + ','.join('{0}+{1}'.format(row, n) for row, n in gaps) + "\n")
+
+    def Move(self, base):
+        """Rename a stopped recording to base + extension."""
+        shutil.move(self.DataFileName, base + '.dat')
+        shutil.move(self.HeaderFileName, base + '.rth')
+        self.DataFileName = base + '.dat'
+        self.HeaderFileName = base + '.rth'
+
+    def Discard(self):
+        for fname in (self.DataFileName, self.HeaderFileName):
+            if os.path.isfile(fname):
+                os.remove(fname)
+
+
+def ReadRecording(filename):
+    """Returns (columns, data) for a recording, with data a read-only memmap
+    shaped (rows, len(columns)). Rows are derived from the file size so a
+    recording cut short by a crash can still be read."""
+    datafilename = os.path.splitext(filename)[0] + '.dat'
+    columns = []
+    dtype = np.float64
+    with open(HeaderFileName(datafilename), 'r') as f:
+        for line in f.readlines():
+            text = line.split(": ")[0]
+            if text == "Columns":
+                columns = line.split(": ")[1].strip().split(',')
+            if text == "Data type":
+                dtype = np.dtype(line.split(": ")[1].strip())
+    rows = os.path.getsize(datafilename) // (np.dtype(dtype).itemsize * len(columns))
+    if rows == 0:
+        return columns, np.zeros((0, len(columns)), dtype=dtype)
+    return columns, np.memmap(datafilename, dtype=dtype, mode='r', shape=(rows, len(columns)))
+
+
+def ReadGaps(filename):
+    """[(row, samples)] of the samples dropped while recording: `samples` are
+    missing between data rows row - 1 and row."""
+    gaps = []
+    with open(HeaderFileName(os.path.splitext(filename)[0] + '.dat'), 'r') as f:
+        for line in f.readlines():
+            if line.split(": ")[0] == "Gaps":
+                for gap in line.split(": ")[1].strip().split(','):
+                    row, n = gap.split('+')
+                    gaps.append((int(row), int(n)))
+    return gaps
@@ -0,0 +1,123 @@
+""" Scheduler.py
+Periodic tasks on absolute deadlines for RTDAQ-32bit
+    PeriodicTask    A callable run every period, with its timing statistics
+    Scheduler       Runs periodic tasks in one thread, earliest deadline first
+Deadlines are kept in perf_counter_ns and advanced by exactly one period per
+run, so the work time of a task does not stretch its period and errors do
+not accumulate. A run that starts after its next deadline has passed is an
+overrun; the periods it missed are skipped rather than run back to back.
+Lateness (start of a run minus its deadline) is histogrammed per task.
+Waits sleep on the stop event; a spin before each deadline, polling the clock
+with the GIL released in between, is opt-in for sub-ms periods.
+"""
+
+import threading, time
+import numpy as np
+
+
+class PeriodicTask:
+    def __init__(self, name, function, period, binwidth=50e-6, bins=200):
+        """function     Callable without arguments, run in the scheduler thread
+        period          Seconds
+        binwidth, bins  Lateness histogram; the last bin collects everything later"""
+        self.Name = name
+        self.function = function
+        self.period = int(round(period * 1e9))
+        self.binwidth = int(round(binwidth * 1e9))
+        self.Jitter = np.zeros(bins, dtype=np.int64)
+        self.deadline = None
+        self.Runs = 0
+        self.Overruns = 0
+        self.Skipped = 0           # Periods dropped after overruns
+        self.MaxLate = 0           # ns
+        self.MaxWork = 0           # ns
+
+    def Run(self, start):
+        late = start - self.deadline
+        self.Jitter[min(late // self.binwidth, len(self.Jitter) - 1)] += 1
+        self.MaxLate = max(self.MaxLate, late)
+        self.function()
+        now = time.perf_counter_ns()
+        self.MaxWork = max(self.MaxWork, now - start)
+        self.Runs += 1
+        self.deadline += self.period
+        if now >= self.deadline:
+            missed = (now - self.deadline) // self.period + 1
+            self.Overruns += 1
+            self.Skipped += missed
+            self.deadline += missed * self.period
+
+    def Histogram(self):
+        """(counts, edges) of the lateness in seconds."""
+        edges = np.arange(len(self.Jitter) + 1) * self.binwidth * 1e-9
+        return self.Jitter.copy(), edges
+
+    def Summary(self):
+        """Run counts and lateness percentiles in ms, to histogram bin resolution."""
+        summary = {'period_ms': self.period * 1e-6, 'runs': self.Runs,
+                   'overruns': self.Overruns, 'skipped': self.Skipped,
+                   'max_late_ms': self.MaxLate * 1e-6, 'max_work_ms': self.MaxWork * 1e-6}
+        if self.Runs:
+            cumulative = np.cumsum(self.Jitter)
+            for p in (50, 99):
+                k = int(np.searchsorted(cumulative, cumulative[-1] * p / 100))
+                summary['p{0}_ms'.format(p)] = (k + 1) * self.binwidth * 1e-6
+        return summary
+
+
+class Scheduler:
+    def __init__(self, name='', spin=0):
+        """spin     Seconds before each deadline to stop sleeping and poll the clock"""
+        self.Name = name
+        self.spin = int(round(spin * 1e9))
+        self.Tasks = []
+        self.Lock = threading.Lock()
+        self.StopEvent = threading.Event()
+        self.Thread = None
+
+    def Add(self, name, function, period, **options):
+        """Schedules function every period seconds, first run one period from now."""
+        task = PeriodicTask(name, function, period, **options)
+        task.deadline = time.perf_counter_ns() + task.period
+        with self.Lock:
+            self.Tasks.append(task)
+        return task
+
+    def Remove(self, name):
+        with self.Lock:
+            self.Tasks = [task for task in self.Tasks if task.Name != name]
+
+    def Start(self):
+        """Runs the tasks in a new thread; Run() can be called instead from an existing one."""
+        self.StopEvent.clear()
+        self.Thread = threading.Thread(target=self.Run, daemon=True)
+        self.Thread.start()
+
+    def Stop(self):
+        self.StopEvent.set()
+        if self.Thread is not None and self.Thread is not threading.current_thread():
+            self.Thread.join()
+            self.Thread = None
+
+    def Run(self):
+        while not self.StopEvent.is_set():
+            with self.Lock:
+                tasks = list(self.Tasks)
+            if not tasks:
+                if self.StopEvent.wait(0.01):
+                    break
+                continue
+            task = min(tasks, key=lambda task: task.deadline)
+            remaining = task.deadline - time.perf_counter_ns()
+            if remaining > self.spin and self.StopEvent.wait((remaining - self.spin) * 1e-9):
+                break
+            while True:
+                now = time.perf_counter_ns()
+                if now >= task.deadline:
+                    break
+                time.sleep(0)   # Yield the GIL while spinning
+            task.Run(now)
+
+    def Summary(self):
+        with self.Lock:
+            return dict((task.Name, task.Summary()) for task in self.Tasks)
@@ -1,51 +1,33 @@
 """Video.py
 VidCam: Video Camera Data Class
+The capture thread reads frames into preallocated buffers and hands the newest
+one to the Qt thread through a TripleBuffer; display and recording are
+VideoWindow's. Frames are timestamped in s since the RTDAQApp fiducial
+(SetFiducials).
 EYafuso
 Feb 2019
 """
 
-import os
 import cv2
-from PyQt5 import QtGui, QtCore, QtWidgets, uic
 import threading, time
+from Buffers import TripleBuffer
+from VideoWindow import VideoWindow
 
-class VidWin(QtWidgets.QMainWindow):
+class VidWin(VideoWindow):
     def __init__(self):
-        QtWidgets.QMainWindow.__init__(self)
-        path = os.path.abspath("") + '\\Video\\VidWindow.ui'
-        try:
-            Ui_VW = uic.loadUiType(path)[0]
-        except:
-            Ui_VW = uic.loadUiType('VidWindow.ui')[0]
-
-        self.fps = 30   #sample frames at 33 millisecond intervals
-        self.ui = Ui_VW()
-        self.ui.setupUi(self)
-        self.ui.vsIntegrate.setMinimum(0)
-        self.ui.vsIntegrate.setMaximum(100)
-        self.exposure = 33 #exposure setting in milliseconds
-        self.ui.vsIntegrate.setValue(self.exposure)
-        self.ui.lTs.setText(str(self.exposure))
-
-        self.ui.vsIntegrate.valueChanged.connect(self.setExposure)
-        self.PixMap = QtGui.QPixmap()
+        VideoWindow.__init__(self)
 
         self.CamNum = 0
         self.CamThread = None
         self.bAcquiring = False
+        self.FrameCount = 0
         self.doLiveVideo()
 
-        self.bShow = True
-
         self.MoveToStart()
 
-    def setExposure(self):
-        temp = self.ui.vsIntegrate.value()
-        self.ui.lTs.setText(str(temp))
-
     def doLiveVideo(self):
         if self.CamThread == None:
-            self.CamThread = threading.Thread(target=self.LiveVideoThread)
+            self.CamThread = threading.Thread(target=self.LiveVideoThread, daemon=True)
             self.bAcquiring = True
             self.CamThread.start()
 
@@ -53,51 +35,37 @@ class VidWin(QtWidgets.QMainWindow):
         pass
 
     def LiveVideoThread(self):
+        # Capture only: no conversion, allocation or Qt calls, so display never holds up the camera
         self.cam = cv2.VideoCapture(self.CamNum)
-        width = self.cam.get(cv2.CAP_PROP_FRAME_WIDTH)
-        height = self.cam.get(cv2.CAP_PROP_FRAME_HEIGHT)
         self.fps = self.cam.get(cv2.CAP_PROP_FPS)
         if self.fps == 0: self.fps = 33
-        self.ui.lVideo.setMinimumSize(1, 1)
-        self.ui.lVideo.installEventFilter(self)
-
-        while self.bAcquiring:
-            ret, frame = self.cam.read()
+        ret, frame = self.cam.read()
+        if ret and frame is not None:
+            self.FrameShape = frame.shape
+            self.Frames = TripleBuffer(frame.shape, frame.dtype)
+
+        while self.bAcquiring and self.Frames is not None:
+            back = self.Frames.Back()
+            ret, frame = self.cam.read(back)    # read() blocks until the next frame
+            t = time.time() - self.t0
             if ret == True and frame is not None:
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                image = QtGui.QImage(frame,
-                                     width,
-                                     height,
-                                     QtGui.QImage.Format_RGB888)
-                self.PixMap = QtGui.QPixmap.fromImage(image)
-                self.ui.lVideo.setPixmap(self.PixMap)
-            time.sleep(1/self.fps)
+                if frame is not back:
+                    back[...] = frame
+                self.RecordFrame(back, t, self.FrameCount)
+                self.Frames.Publish((self.FrameCount, t))
+                self.FrameCount += 1
+            else:
+                time.sleep(1/self.fps)
         self.cam.release()
         cv2.destroyAllWindows()
 
-    def MoveToStart(self):
-        ag = QtWidgets.QDesktopWidget().availableGeometry()
-        sg = QtWidgets.QDesktopWidget().screenGeometry()
-
-        vidwingeo = self.geometry()
-        x = 0 # ag.width() - vidwingeo.width()
-        y = 0 # 2 * ag.height() - sg.height() - vidwingeo.height()
-        self.move(x, y)
-
-    def eventFilter(self, source, event):
-        if (source is self.ui.lVideo and event.type() == QtCore.QEvent.Paint):
-            self.ui.lVideo.setAlignment(QtCore.Qt.AlignCenter)
-            self.ui.lVideo.setPixmap(self.PixMap.scaled(self.ui.lVideo.size(),
-                                                        QtCore.Qt.KeepAspectRatio,
-                                                        QtCore.Qt.SmoothTransformation))
-        return super(VidWin, self).eventFilter(source, event)
-
     def closeEvent(self, event):
         self.bAcquiring = False
+        self.StopDisplay()
         if self.CamThread != None:
             self.CamThread.join()
             event.accept()
         else:
             self.bShow = False
             self.hide()
-            event.ignore()
\ No newline at end of file
+            event.ignore()
@@ -0,0 +1,106 @@
+""" VideoRecorder.py
+Video recording for RTDAQ-32bit
+The capture thread copies each frame into a ring of slots in a memory-mapped
+file and an encoder process writes them with cv2.VideoWriter, so encoding
+neither holds up capture nor competes for the acquisition process' GIL.
+Every frame handed to the encoder gets a row in a Recorder stream, in the
+same timebase as the current traces (s since the RTDAQApp fiducial):
+    Time            Capture time of the frame
+    Frame           Frame number in the video file
+    CaptureFrame    Camera frame counter; gaps are frames dropped before encoding
+so the video can be seeked to any event, or aligned with the other streams.
+    VideoRecorder   Capture side; Write() never blocks, a full ring drops frames
+    EncodeFrames    Encoder process
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import cv2
+import numpy as np
+from Recorder import StreamRecorder
+
+IndexColumns = ['Time', 'Frame', 'CaptureFrame']
+
+
+def EncodeFrames(ringfilename, shape, slots, videofilename, fourcc, fps, filled, encoded):
+    # Encoder process: ring positions arrive on `filled`, None ends the recording
+    ring = np.memmap(ringfilename, dtype=np.uint8, mode='r', shape=(slots,) + tuple(shape))
+    writer = cv2.VideoWriter(videofilename, cv2.VideoWriter_fourcc(*fourcc), fps, (shape[1], shape[0]))
+    while True:
+        position = filled.get()
+        if position is None:
+            break
+        writer.write(np.asarray(ring[position % slots]))
+        encoded.value = position + 1
+    writer.release()
+
+
+class VideoRecorder:
+    def __init__(self, filename, fps, fourcc='MJPG', slots=64):
+        """filename     Video file (.avi); the frame index goes next to it as <name>.dat/.rth
+        slots           Frames the ring holds while the encoder catches up"""
+        self.VideoFileName = filename
+        self.Index = StreamRecorder(os.path.splitext(filename)[0] + '.dat', IndexColumns)
+        self.fps = fps
+        self.fourcc = fourcc
+        self.slots = slots
+        self.RingFileName = None
+        self.Process = None
+        self.Frames = 0         # Frames handed to the encoder
+        self.Dropped = 0        # Frames dropped because the ring was full
+
+    def Start(self, shape):
+        """shape    (height, width, 3) of the BGR frames to record"""
+        fd, self.RingFileName = tempfile.mkstemp(prefix='frames_', suffix='.dat',
+                                                 dir=os.path.dirname(os.path.abspath(self.VideoFileName)))
+        os.close(fd)
+        self.shape = tuple(shape)
+        self.ring = np.memmap(self.RingFileName, dtype=np.uint8, mode='w+', shape=(self.slots,) + self.shape)
+        self.filled = multiprocessing.Queue()
+        self.encoded = multiprocessing.Value('q', 0, lock=False)    # Single writer: the encoder
+        self.Process = multiprocessing.Process(target=EncodeFrames,
+                                               args=(self.RingFileName, self.shape, self.slots, self.VideoFileName,
+                                                     self.fourcc, self.fps, self.filled, self.encoded),
+                                               daemon=True)
+        self.Process.start()
+        self.Index.Start()
+
+    def Write(self, frame, t, capture):
+        """Queue one frame captured at t (s since the fiducial). Never blocks;
+        returns False if the frame was dropped."""
+        if self.Process is None:
+            return False
+        if self.Frames - self.encoded.value >= self.slots:
+            self.Dropped += 1
+            return False
+        self.ring[self.Frames % self.slots] = frame
+        self.filled.put(self.Frames)
+        self.Index.Write([[t], [self.Frames], [capture]])
+        self.Frames += 1
+        return True
+
+    def Stop(self):
+        if self.Process is None:
+            return
+        self.filled.put(None)
+        self.Process.join()
+        self.Process = None
+        self.Index.Stop()
+        self.ring = None
+        os.remove(self.RingFileName)
+        if self.Dropped:
+            print('Video ring full, frames dropped from', self.VideoFileName, ':', self.Dropped)
+
+    def Move(self, base):
+        """Rename a stopped recording to base.avi, with the index in base.dat/.rth."""
+        video = base + os.path.splitext(self.VideoFileName)[1]
+        shutil.move(self.VideoFileName, video)
+        self.VideoFileName = video
+        self.Index.Move(base)
+
+    def Discard(self):
+        self.Index.Discard()
+        if os.path.isfile(self.VideoFileName):
+            os.remove(self.VideoFileName)
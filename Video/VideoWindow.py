@@ -0,0 +1,127 @@
+""" VideoWindow.py
+Display and recording half of the RTDAQ-32bit video windows (Video.VidWin,
+Lucam.LuCAMWindow). A subclass runs its own capture thread and, for every
+frame, calls RecordFrame() and Publish()es the BGR frame through
+self.Frames (a TripleBuffer); this class shows the newest one at
+DisplayRate, scaled once per frame into buffers cached per label size, and
+hands frames to a VideoRecorder while recording.
+Frame times are in s since the RTDAQApp fiducial (SetFiducials).
+"""
+
+import os
+import collections
+import cv2
+import numpy as np
+from PyQt5 import QtGui, QtCore, QtWidgets, uic
+import threading, time
+from VideoRecorder import VideoRecorder
+
+class VideoWindow(QtWidgets.QMainWindow):
+    def __init__(self):
+        QtWidgets.QMainWindow.__init__(self)
+        Ui_VW = uic.loadUiType(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'VidWindow.ui'))[0]
+
+        self.fps = 30   #sample frames at 33 millisecond intervals
+        self.ui = Ui_VW()
+        self.ui.setupUi(self)
+        self.ui.vsIntegrate.setMinimum(0)
+        self.ui.vsIntegrate.setMaximum(100)
+        self.exposure = 33 #exposure setting in milliseconds
+        self.ui.vsIntegrate.setValue(self.exposure)
+        self.ui.lTs.setText(str(self.exposure))
+
+        self.ui.vsIntegrate.valueChanged.connect(self.setExposure)
+        self.ui.lVideo.setMinimumSize(1, 1)
+        self.ui.lVideo.setAlignment(QtCore.Qt.AlignCenter)
+        self.ui.lVideo.installEventFilter(self)
+
+        self.Frames = None          # TripleBuffer of BGR frames, set up by the subclass
+        self.FrameShape = None
+        self.t0 = time.time()
+        self.Recorder = None        # VideoRecorder while recording
+        self.RecordLock = threading.Lock()
+        self.LastFrame = None       # Front buffer on display, rescaled on resize
+        self.DisplayCache = collections.OrderedDict()   # (width, height) -> scaled, rgb, QImage
+        self.DisplayRate = 30       # Hz
+        self.DisplayTimer = QtCore.QTimer(self)
+        self.DisplayTimer.timeout.connect(self.RefreshVideo)
+        self.DisplayTimer.start(int(1000 / self.DisplayRate))
+
+        self.bShow = True
+
+    def setExposure(self):
+        temp = self.ui.vsIntegrate.value()
+        self.ui.lTs.setText(str(temp))
+
+    def SetFiducials(self, t):
+        self.t0 = t
+
+    def StartRecording(self, filename):
+        """Records from the next frame on; returns the VideoRecorder, None before the first frame."""
+        if self.FrameShape is None:
+            print('No video frames to record')
+            return None
+        recorder = VideoRecorder(filename, self.fps)
+        recorder.Start(self.FrameShape)
+        with self.RecordLock:
+            self.Recorder = recorder
+        return recorder
+
+    def StopRecording(self):
+        with self.RecordLock:
+            recorder, self.Recorder = self.Recorder, None
+        if recorder is not None:
+            recorder.Stop()
+        return recorder
+
+    def RecordFrame(self, frame, t, counter):
+        # Capture thread; never blocks, see VideoRecorder.Write
+        with self.RecordLock:
+            if self.Recorder is not None:
+                self.Recorder.Write(frame, t, counter)
+
+    def RefreshVideo(self):
+        # Qt thread, at DisplayRate; frames captured in between are skipped
+        if self.Frames is None:
+            return
+        frame, info = self.Frames.Take()
+        if frame is not None:
+            self.LastFrame = frame
+            self.ShowFrame(frame)
+
+    def ShowFrame(self, frame):
+        h, w = frame.shape[:2]
+        size = self.ui.lVideo.size()
+        scale = min(size.width() / w, size.height() / h)
+        key = (max(int(w * scale), 1), max(int(h * scale), 1))
+        if key not in self.DisplayCache:
+            scaled = np.empty((key[1], key[0], 3), dtype=np.uint8)
+            rgb = np.empty_like(scaled)
+            image = QtGui.QImage(rgb.data, key[0], key[1], 3 * key[0], QtGui.QImage.Format_RGB888)
+            self.DisplayCache[key] = (scaled, rgb, image)
+            while len(self.DisplayCache) > 4:
+                self.DisplayCache.popitem(last=False)
+        scaled, rgb, image = self.DisplayCache[key]
+        cv2.resize(frame, key, dst=scaled, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(scaled, cv2.COLOR_BGR2RGB, dst=rgb)
+        self.ui.lVideo.setPixmap(QtGui.QPixmap.fromImage(image))
+
+    def MoveToStart(self):
+        ag = QtWidgets.QDesktopWidget().availableGeometry()
+        sg = QtWidgets.QDesktopWidget().screenGeometry()
+
+        vidwingeo = self.geometry()
+        x = 0 # ag.width() - vidwingeo.width()
+        y = 0 # 2 * ag.height() - sg.height() - vidwingeo.height()
+        self.move(x, y)
+
+    def eventFilter(self, source, event):
+        # Rescale on resize only; paint events draw the pixmap already set
+        if (source is self.ui.lVideo and event.type() == QtCore.QEvent.Resize and self.LastFrame is not None):
+            self.ShowFrame(self.LastFrame)
+        return super(VideoWindow, self).eventFilter(source, event)
+
+    def StopDisplay(self):
+        # Shared part of closing: no more display refreshes, recording finished
+        self.DisplayTimer.stop()
+        self.StopRecording()
@@ -1,10 +1,12 @@
 # ...for class debugging
 
+import os, sys
+sys.path.append(os.path.abspath('..'))   # Shared modules (Buffers.py) live at the project root
+from PyQt5 import QtWidgets
 from Video import *
-import sys
 
 if __name__ == "__main__":
     app = QtWidgets.QApplication(sys.argv)
     window = VidWin()
     window.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    sys.exit(app.exec_())
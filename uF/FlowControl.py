@@ -0,0 +1,132 @@
+""" FlowControl.py
+Closed-loop flow regulation for the Elveflow OB1
+FlowPID reads the flow sensor and sets the regulator pressure from its own
+Scheduler thread at a fixed rate, so the loop latency does not depend on the
+GUI. Period and lateness of every iteration are measured, and so is the
+settling time of every set-point change.
+"""
+
+import threading, time
+import numpy as np
+from Buffers import RingBuffer
+from Scheduler import Scheduler
+
+
+class FlowPID:
+    def __init__(self, read, write, period=0.02, kp=10.0, ki=50.0, kd=0.0,
+                 limits=(-900, 6000), band=0.05, hold=0.5, history=100000):
+        """read     Callable returning the measured flow (uL/min), None when the read fails
+        write       Callable (pressure) setting the regulator, mbar
+        period      Loop period, s
+        kp, ki, kd  Gains in mbar per uL/min, per uL/min s and per uL/min/s; tune per chip
+        limits      Regulator range, mbar
+        band, hold  A set-point change has settled once the flow stays within
+                    band * step size of the target for hold seconds"""
+        self.read = read
+        self.write = write
+        self.period = period
+        self.kp, self.ki, self.kd = kp, ki, kd
+        self.limits = limits
+        self.band = band
+        self.hold = hold
+        self.Lock = threading.Lock()
+        self.Scheduler = Scheduler('FlowPID')
+        self.Task = None
+        self.Target = 0.0
+        self.Pressure = 0.0
+        # rows: tick time (s since Start), target, flow (uL/min), pressure (mbar)
+        self.Samples = RingBuffer(history, 4)
+        self.SettlingTimes = []
+        self.Failures = 0
+        self.tStep = None       # perf_counter at the set-point change being timed
+        self.stepSize = None    # Error at the first iteration after it
+        self.tInBand = None
+        self.Reset()
+
+    def Reset(self):
+        self.integral = 0.0
+        self.lastError = None
+        self.tLast = None
+        self.bias = 0.0
+
+    def SetTarget(self, flow):
+        with self.Lock:
+            self.Target = float(flow)
+            self.tStep = time.perf_counter()
+            self.stepSize = None
+            self.tInBand = None
+
+    def Start(self, pressure=0.0):
+        """Regulates from the current regulator pressure, used as the output bias."""
+        if self.IsRunning():
+            return
+        with self.Lock:
+            self.Reset()
+            self.Samples.Clear()
+            self.bias = float(pressure)
+            self.t0 = time.perf_counter()
+        if self.Task is not None:
+            self.Scheduler.Remove(self.Task.Name)
+        self.Task = self.Scheduler.Add('Step', self.Step, self.period)
+        self.Scheduler.Start()
+
+    def Stop(self):
+        self.Scheduler.Stop()
+
+    def IsRunning(self):
+        return self.Scheduler.Thread is not None
+
+    def Step(self):
+        # Scheduler thread, once per period
+        now = time.perf_counter()
+        flow = self.read()
+        if flow is None:
+            self.Failures += 1
+            return
+        with self.Lock:
+            error = self.Target - flow
+            dt = self.period if self.tLast is None else now - self.tLast
+            derivative = 0.0 if self.lastError is None else (error - self.lastError) / dt
+            integral = self.integral + error * dt
+            output = self.bias + self.kp * error + self.ki * integral + self.kd * derivative
+            lo, hi = self.limits
+            if lo <= output <= hi:
+                self.integral = integral    # Integrate only while unsaturated (anti-windup)
+            output = min(max(output, lo), hi)
+            self.tLast, self.lastError = now, error
+            self.Samples.Append([[now - self.t0], [self.Target], [flow], [output]])
+            if self.tStep is not None and self.stepSize is None:
+                self.stepSize = abs(error)
+                if self.stepSize == 0:
+                    self.tStep = None
+            if self.tStep is not None:
+                if abs(error) <= self.band * self.stepSize:
+                    if self.tInBand is None:
+                        self.tInBand = now
+                    elif now - self.tInBand >= self.hold:
+                        self.SettlingTimes.append(self.tInBand - self.tStep)
+                        self.tStep = None
+                else:
+                    self.tInBand = None
+        self.write(output)
+        self.Pressure = output
+
+    def Summary(self):
+        """Loop period, lateness and settling statistics; times in ms unless noted."""
+        with self.Lock:
+            t = np.array(self.Samples.View()[0])
+        summary = {'failures': self.Failures, 'steps_settled': len(self.SettlingTimes)}
+        if self.Task is not None:
+            task = self.Task.Summary()
+            summary.update({'overruns': task['overruns'], 'skipped': task['skipped'],
+                            'late_p99_ms': task.get('p99_ms'), 'late_max_ms': task['max_late_ms']})
+        if len(t) > 1:
+            periods = np.diff(t) * 1e3
+            summary.update({'period_ms': float(periods.mean()),
+                            'period_sd_ms': float(periods.std()),
+                            'period_max_ms': float(periods.max())})
+        if self.SettlingTimes:
+            settling = np.array(self.SettlingTimes)
+            summary.update({'settling_median_s': float(np.median(settling)),
+                            'settling_max_s': float(settling.max())})
+        return summary
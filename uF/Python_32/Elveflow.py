@@ -0,0 +1,117 @@
+""" Elveflow.py
+ctypes bindings of the Elveflow SDK (Elveflow32.dll) for RTDAQ-32bit
+    Load        Loads the DLL once per path, with every prototype bound
+    OB1         One OB1 controller; reads all channels from a single acquisition
+Prototypes follow DLL32/Elveflow32.h and are set on the DLL functions once, at
+load, so calls go straight to the bound functions. uF.py and the SDK module
+Elveflow32.py share the same handle.
+"""
+
+import os
+from ctypes import *
+import numpy as np
+
+CalibrationLength = 1000
+Calibration = c_double * CalibrationLength      # Calibration array, as every SDK call expects
+
+# Function name, argtypes; every function returns an int32 error code, 0 on success
+Prototypes = [
+    ('AF1_Initialization',           [c_char_p, c_uint16, c_uint16, POINTER(c_int32)]),
+    ('F_S_R_Initialization',         [c_char_p, c_uint16, c_uint16, c_uint16, c_uint16, POINTER(c_int32)]),
+    ('MUX_Initialization',           [c_char_p, POINTER(c_int32)]),
+    ('MUX_Set_all_valves',           [c_int32, POINTER(c_int32), c_int32]),
+    ('MUX_Dist_Initialization',      [c_char_p, POINTER(c_int32)]),
+    ('OB1_Initialization',           [c_char_p, c_uint16, c_uint16, c_uint16, c_uint16, POINTER(c_int32)]),
+    ('Elveflow_Calibration_Default', [POINTER(Calibration), c_int32]),
+    ('Elveflow_Calibration_Load',    [c_char_p, POINTER(Calibration), c_int32]),
+    ('Elveflow_Calibration_Save',    [c_char_p, POINTER(Calibration), c_int32]),
+    ('OB1_Calib',                    [c_int32, POINTER(Calibration), c_int32]),
+    ('OB1_Get_Press',                [c_int32, c_int32, c_int32, POINTER(Calibration), POINTER(c_double), c_int32]),
+    ('OB1_Set_Press',                [c_int32, c_int32, c_double, POINTER(Calibration), c_int32]),
+    ('AF1_Calib',                    [c_int32, POINTER(Calibration), c_int32]),
+    ('AF1_Get_Press',                [c_int32, c_int32, POINTER(Calibration), POINTER(c_double), c_int32]),
+    ('AF1_Set_Press',                [c_int32, c_double, POINTER(Calibration), c_int32]),
+    ('OB1_Destructor',               [c_int32]),
+    ('OB1_Get_Sens_Data',            [c_int32, c_int32, c_int32, POINTER(c_double)]),
+    ('OB1_Get_Trig',                 [c_int32, POINTER(c_int32)]),
+    ('OB1_Set_Trig',                 [c_int32, c_int32]),
+    ('AF1_Destructor',               [c_int32]),
+    ('AF1_Get_Flow_rate',            [c_int32, POINTER(c_double)]),
+    ('AF1_Get_Trig',                 [c_int32, POINTER(c_int32)]),
+    ('AF1_Set_Trig',                 [c_int32, c_int32]),
+    ('F_S_R_Destructor',             [c_int32]),
+    ('F_S_R_Get_Sensor_data',        [c_int32, c_int32, POINTER(c_double)]),
+    ('MUX_Destructor',               [c_int32]),
+    ('MUX_Get_Trig',                 [c_int32, POINTER(c_int32)]),
+    ('MUX_Set_indiv_valve',          [c_int32, c_int32, c_int32, c_int32]),
+    ('MUX_Set_Trig',                 [c_int32, c_int32]),
+    ('MUX_Dist_Destructor',          [c_int32]),
+    ('MUX_Dist_Get_Valve',           [c_int32, POINTER(c_int32)]),
+    ('MUX_Dist_Set_Valve',           [c_int32, c_int32]),
+    ('OB1_Add_Sens',                 [c_int32, c_int32, c_uint16, c_uint16, c_uint16, c_uint16]),
+    ('BFS_Destructor',               [c_int32]),
+    ('BFS_Initialization',           [c_char_p, POINTER(c_int32)]),
+    ('BFS_Get_Density',              [c_int32, POINTER(c_double)]),
+    ('BFS_Get_Flow',                 [c_int32, POINTER(c_double)]),
+    ('BFS_Get_Temperature',          [c_int32, POINTER(c_double)]),
+    ('BFS_Set_Filter',               [c_int32, c_double]),
+    ('Elveflow_EXAMPLE_PID',         [c_int32, c_double, c_int32, c_double, c_double, POINTER(c_int32), POINTER(c_double)]),
+    ('MUX_Wire_Set_all_valves',      [c_int32, POINTER(c_int32), c_int32]),
+    ('OB1_Set_All_Press',            [c_int32, POINTER(c_double), POINTER(c_double), c_int32, c_int32]),
+    ('BFS_Zeroing',                  [c_int32]),
+    ('BFS_Get_Mass_Flow',            [c_int32, POINTER(c_double)]),
+    ('OB1_Reset_Instr',              [c_int32]),
+    ('OB1_Reset_Digit_Sens',         [c_int32, c_int32]),
+]
+
+Libraries = {}
+
+
+def Load(path):
+    """CDLL of the SDK at path with the prototypes bound. Functions missing from
+    older DLL versions are left unbound."""
+    path = os.path.abspath(path)
+    if path not in Libraries:
+        dll = CDLL(path)
+        for name, argtypes in Prototypes:
+            try:
+                function = getattr(dll, name)
+            except AttributeError:
+                continue
+            function.argtypes = argtypes
+            function.restype = c_int32
+        Libraries[path] = dll
+    return Libraries[path]
+
+
+class OB1:
+    def __init__(self, dll, instrument, calibration, channels=4):
+        """dll      From Load()
+        instrument  OB1 ID from OB1_Initialization
+        calibration Calibration array"""
+        self.getPress = dll.OB1_Get_Press
+        self.getSensor = dll.OB1_Get_Sens_Data
+        self.ID = int(instrument)
+        self.Calibration = calibration
+        self.Channels = channels
+        self.Pressure = np.full(channels, np.nan)      # mbar
+        self.Sensor = np.full(channels, np.nan)        # Sensor units, e.g. uL/min
+        self.value = c_double()
+
+    def ReadAll(self):
+        """Regulator pressure and sensor value of every channel. The first call
+        acquires over USB; the rest read the values the DLL stored from it (see
+        OB1_Get_Press in Elveflow32.h). Channels that fail read NaN. Returns the
+        first nonzero error code, 0 if all reads succeeded."""
+        value = self.value
+        result = 0
+        for c in range(self.Channels):
+            error = self.getPress(self.ID, c + 1, 1 if c == 0 else 0, self.Calibration,
+                                  byref(value), CalibrationLength)
+            self.Pressure[c] = np.nan if error else value.value
+            result = result or error
+        for c in range(self.Channels):
+            error = self.getSensor(self.ID, c + 1, 0, byref(value))
+            self.Sensor[c] = np.nan if error else value.value
+            result = result or error
+        return result
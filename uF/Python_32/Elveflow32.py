@@ -1,8 +1,10 @@
 # this python routine load the ElveflowDLL.
 # It defines all function prototype for use with python lib
+# The prototypes are bound once, in Elveflow.py, and shared with uF.py
 
 from ctypes import *
-ElveflowDLL=CDLL('D:/dev/SDK/DLL32/DLL32/Elveflow32.dll')# change this path 
+import Elveflow
+ElveflowDLL=Elveflow.Load('D:/dev/SDK/DLL32/DLL32/Elveflow32.dll')# change this path 
 
 
  # Elveflow Library
@@ -12,10 +14,7 @@ ElveflowDLL=CDLL('D:/dev/SDK/DLL32/DLL32/Elveflow32.dll')# change this path
  # and regulator, and sensor. It return the AF1 ID (number >=0) to be used 
  # with other function 
  #
-def AF1_Initialization (Device_Name, Pressure_Regulator, Sensor, AF1_ID_out):
-	X_AF1_Initialization=ElveflowDLL.AF1_Initialization
-	X_AF1_Initialization.argtypes=[c_char_p, c_uint16, c_uint16, POINTER(c_int32)]
-	return X_AF1_Initialization (Device_Name, Pressure_Regulator, Sensor, AF1_ID_out)
+AF1_Initialization=ElveflowDLL.AF1_Initialization
 
 
 
@@ -30,10 +29,7 @@ def AF1_Initialization (Device_Name, Pressure_Regulator, Sensor, AF1_ID_out):
  # otherwise they will not be taken into account and the user will be informed 
  # by a prompt message.
  #
-def F_S_R_Initialization (Device_Name, Sens_Ch_1, Sens_Ch_2, Sens_Ch_3, Sens_Ch_4, F_S_Reader_ID_out):
-	X_F_S_R_Initialization=ElveflowDLL.F_S_R_Initialization
-	X_F_S_R_Initialization.argtypes=[c_char_p, c_uint16, c_uint16, c_uint16, c_uint16, POINTER(c_int32)]
-	return X_F_S_R_Initialization (Device_Name, Sens_Ch_1, Sens_Ch_2, Sens_Ch_3, Sens_Ch_4, F_S_Reader_ID_out)
+F_S_R_Initialization=ElveflowDLL.F_S_R_Initialization
 
 
 
@@ -43,10 +39,7 @@ def F_S_R_Initialization (Device_Name, Sens_Ch_1, Sens_Ch_2, Sens_Ch_3, Sens_Ch_
  # Initiate the MUX device using device name (could be obtained in NI MAX). It 
  # return the F_S_R ID (number >=0) to be used with other function
  #
-def MUX_Initialization (Device_Name, MUX_ID_out):
-	X_MUX_Initialization=ElveflowDLL.MUX_Initialization
-	X_MUX_Initialization.argtypes=[c_char_p, POINTER(c_int32)]
-	return X_MUX_Initialization (Device_Name, MUX_ID_out)
+MUX_Initialization=ElveflowDLL.MUX_Initialization
 
 
 
@@ -64,10 +57,7 @@ def MUX_Initialization (Device_Name, MUX_ID_out):
  # 
  #
 # use ctypes c_int32*16 for array_valve_in
-def MUX_Set_all_valves (MUX_ID_in, array_valve_in, len):
-	X_MUX_Set_all_valves=ElveflowDLL.MUX_Set_all_valves
-	X_MUX_Set_all_valves.argtypes=[c_int32, POINTER(c_int32), c_int32]
-	return X_MUX_Set_all_valves (MUX_ID_in, array_valve_in, len)
+MUX_Set_all_valves=ElveflowDLL.MUX_Set_all_valves
 
 
 
@@ -79,10 +69,7 @@ def MUX_Set_all_valves (MUX_ID_in, array_valve_in, len):
  # It return the MUX Distributor ID (number >=0) to be used with other 
  # function
  #
-def MUX_Dist_Initialization (Visa_COM, MUX_Dist_ID_out):
-	X_MUX_Dist_Initialization=ElveflowDLL.MUX_Dist_Initialization
-	X_MUX_Dist_Initialization.argtypes=[c_char_p, POINTER(c_int32)]
-	return X_MUX_Dist_Initialization (Visa_COM, MUX_Dist_ID_out)
+MUX_Dist_Initialization=ElveflowDLL.MUX_Dist_Initialization
 
 
 
@@ -95,10 +82,7 @@ def MUX_Dist_Initialization (Visa_COM, MUX_Dist_ID_out):
  # targed OB1. If an error occurs during the initialization process, the OB1 
  # ID value will be -1. 
  #
-def OB1_Initialization (Device_Name, Reg_Ch_1, Reg_Ch_2, Reg_Ch_3, Reg_Ch_4, OB1_ID_out):
-	X_OB1_Initialization=ElveflowDLL.OB1_Initialization
-	X_OB1_Initialization.argtypes=[c_char_p, c_uint16, c_uint16, c_uint16, c_uint16, POINTER(c_int32)]
-	return X_OB1_Initialization (Device_Name, Reg_Ch_1, Reg_Ch_2, Reg_Ch_3, Reg_Ch_4, OB1_ID_out)
+OB1_Initialization=ElveflowDLL.OB1_Initialization
 
 
 
@@ -108,10 +92,7 @@ def OB1_Initialization (Device_Name, Reg_Ch_1, Reg_Ch_2, Reg_Ch_3, Reg_Ch_4, OB1
  # Set default Calib in Calib cluster, len is the Calib_Array_out array length
  #
 # use ctypes c_double*1000 for calibration array
-def Elveflow_Calibration_Default (Calib_Array_out, len):
-	X_Elveflow_Calibration_Default=ElveflowDLL.Elveflow_Calibration_Default
-	X_Elveflow_Calibration_Default.argtypes=[POINTER(c_double*1000), c_int32]
-	return X_Elveflow_Calibration_Default (Calib_Array_out, len)
+Elveflow_Calibration_Default=ElveflowDLL.Elveflow_Calibration_Default
 
 
 
@@ -124,10 +105,7 @@ def Elveflow_Calibration_Default (Calib_Array_out, len):
  # or not a path. The function indicate if the file was found.
  #
 # use ctypes c_double*1000 for calibration array
-def Elveflow_Calibration_Load (Path, Calib_Array_out, len):
-	X_Elveflow_Calibration_Load=ElveflowDLL.Elveflow_Calibration_Load
-	X_Elveflow_Calibration_Load.argtypes=[c_char_p, POINTER(c_double*1000), c_int32]
-	return X_Elveflow_Calibration_Load (Path, Calib_Array_out, len)
+Elveflow_Calibration_Load=ElveflowDLL.Elveflow_Calibration_Load
 
 
 
@@ -139,10 +117,7 @@ def Elveflow_Calibration_Load (Path, Calib_Array_out, len):
  # path if Path is not valid, empty or not a path.
  #
 # use ctypes c_double*1000 for calibration array
-def Elveflow_Calibration_Save (Path, Calib_Array_in, len):
-	X_Elveflow_Calibration_Save=ElveflowDLL.Elveflow_Calibration_Save
-	X_Elveflow_Calibration_Save.argtypes=[c_char_p, POINTER(c_double*1000), c_int32]
-	return X_Elveflow_Calibration_Save (Path, Calib_Array_in, len)
+Elveflow_Calibration_Save=ElveflowDLL.Elveflow_Calibration_Save
 
 
 
@@ -155,10 +130,7 @@ def Elveflow_Calibration_Save (Path, Calib_Array_in, len):
  # Len correspond to the Calib_array_out length.
  #
 # use ctypes c_double*1000 for calibration array
-def OB1_Calib (OB1_ID_in, Calib_array_out, len):
-	X_OB1_Calib=ElveflowDLL.OB1_Calib
-	X_OB1_Calib.argtypes=[c_int32, POINTER(c_double*1000), c_int32]
-	return X_OB1_Calib (OB1_ID_in, Calib_array_out, len)
+OB1_Calib=ElveflowDLL.OB1_Calib
 
 
 
@@ -180,10 +152,7 @@ def OB1_Calib (OB1_ID_in, Calib_array_out, len):
  #
 # use ctypes c_double*1000 for calibration array
 # use ctype c_double*4 for pressure array
-def OB1_Get_Press (OB1_ID, Channel_1_to_4, Acquire_Data1True0False, Calib_array_in, Pressure, Calib_Array_len):
-	X_OB1_Get_Press=ElveflowDLL.OB1_Get_Press
-	X_OB1_Get_Press.argtypes=[c_int32, c_int32, c_int32, POINTER(c_double*1000), POINTER(c_double), c_int32]
-	return X_OB1_Get_Press (OB1_ID, Channel_1_to_4, Acquire_Data1True0False, Calib_array_in, Pressure, Calib_Array_len)
+OB1_Get_Press=ElveflowDLL.OB1_Get_Press
 
 
 
@@ -195,10 +164,7 @@ def OB1_Get_Press (OB1_ID, Channel_1_to_4, Acquire_Data1True0False, Calib_array_
  # length.
  #
 # use ctypes c_double*1000 for calibration array
-def OB1_Set_Press (OB1_ID, Channel_1_to_4, Pressure, Calib_array_in, Calib_Array_len):
-	X_OB1_Set_Press=ElveflowDLL.OB1_Set_Press
-	X_OB1_Set_Press.argtypes=[c_int32, c_int32, c_double, POINTER(c_double*1000), c_int32]
-	return X_OB1_Set_Press (OB1_ID, Channel_1_to_4, Pressure, Calib_array_in, Calib_Array_len)
+OB1_Set_Press=ElveflowDLL.OB1_Set_Press
 
 
 
@@ -209,10 +175,7 @@ def OB1_Set_Press (OB1_ID, Channel_1_to_4, Pressure, Calib_array_in, Calib_Array
  # the Calib_array_out length.
  #
 # use ctypes c_double*1000 for calibration array
-def AF1_Calib (AF1_ID_in, Calib_array_out, len):
-	X_AF1_Calib=ElveflowDLL.AF1_Calib
-	X_AF1_Calib.argtypes=[c_int32, POINTER(c_double*1000), c_int32]
-	return X_AF1_Calib (AF1_ID_in, Calib_array_out, len)
+AF1_Calib=ElveflowDLL.AF1_Calib
 
 
 
@@ -224,14 +187,9 @@ def AF1_Calib (AF1_ID_in, Calib_array_out, len):
  # length.
  #
 # use ctypes c_double*1000 for calibration array
-def AF1_Get_Press (AF1_ID_in, Integration_time, Calib_array_in, Pressure, len):
-	X_AF1_Get_Press=ElveflowDLL.AF1_Get_Press
-	X_AF1_Get_Press.argtypes=[c_int32, c_int32, POINTER(c_double*1000), POINTER(c_double), c_int32]
-	return X_AF1_Get_Press (AF1_ID_in, Integration_time, Calib_array_in, Pressure, len)
+AF1_Get_Press=ElveflowDLL.AF1_Get_Press
 
 
-        self.AIOUSB.ADC_GetChannelV.argtypes = (ctypes.c_ulong, ctypes.c_ulong, ctypes.POINTER(ctypes.c_double))
-        self.AIOUSB.ADC_GetChannelV.restype = ctypes.c_ulong
  # Elveflow Library
  # AF1 Device
  # 
@@ -240,10 +198,7 @@ def AF1_Get_Press (AF1_ID_in, Integration_time, Calib_array_in, Pressure, len):
  # 
  #
 # use ctypes c_double*1000 for calibration array
-def AF1_Set_Press (AF1_ID_in, Pressure, Calib_array_in, len):
-	X_AF1_Set_Press=ElveflowDLL.AF1_Set_Press
-	X_AF1_Set_Press.argtypes=[c_int32, c_double, POINTER(c_double*1000), c_int32]
-	return X_AF1_Set_Press (AF1_ID_in, Pressure, Calib_array_in, len)
+AF1_Set_Press=ElveflowDLL.AF1_Set_Press
 
 
 
@@ -252,10 +207,7 @@ def AF1_Set_Press (AF1_ID_in, Pressure, Calib_array_in, len):
  # 
  # Close communication with OB1
  #
-def OB1_Destructor (OB1_ID):
-	X_OB1_Destructor=ElveflowDLL.OB1_Destructor
-	X_OB1_Destructor.argtypes=[c_int32]
-	return X_OB1_Destructor (OB1_ID)
+OB1_Destructor=ElveflowDLL.OB1_Destructor
 
 
 
@@ -278,10 +230,7 @@ def OB1_Destructor (OB1_ID):
  # NB: For Digital Flow Senor, If the connection is lots, OB1 will be reseted 
  # and the return value will be zero
  #
-def OB1_Get_Sens_Data (OB1_ID, Channel_1_to_4, Acquire_Data1True0False, Sens_Data):
-	X_OB1_Get_Sens_Data=ElveflowDLL.OB1_Get_Sens_Data
-	X_OB1_Get_Sens_Data.argtypes=[c_int32, c_int32, c_int32, POINTER(c_double)]
-	return X_OB1_Get_Sens_Data (OB1_ID, Channel_1_to_4, Acquire_Data1True0False, Sens_Data)
+OB1_Get_Sens_Data=ElveflowDLL.OB1_Get_Sens_Data
 
 
 
@@ -290,10 +239,7 @@ def OB1_Get_Sens_Data (OB1_ID, Channel_1_to_4, Acquire_Data1True0False, Sens_Dat
  # 
  # Get the trigger of the OB1 (0 = 0V, 1 =3,3V)
  #
-def OB1_Get_Trig (OB1_ID, Trigger):
-	X_OB1_Get_Trig=ElveflowDLL.OB1_Get_Trig
-	X_OB1_Get_Trig.argtypes=[c_int32, POINTER(c_int32)]
-	return X_OB1_Get_Trig (OB1_ID, Trigger)
+OB1_Get_Trig=ElveflowDLL.OB1_Get_Trig
 
 
 
@@ -302,10 +248,7 @@ def OB1_Get_Trig (OB1_ID, Trigger):
  # 
  # Set the trigger of the OB1 (0 = 0V, 1 =3,3V)
  #
-def OB1_Set_Trig (OB1_ID, trigger):
-	X_OB1_Set_Trig=ElveflowDLL.OB1_Set_Trig
-	X_OB1_Set_Trig.argtypes=[c_int32, c_int32]
-	return X_OB1_Set_Trig (OB1_ID, trigger)
+OB1_Set_Trig=ElveflowDLL.OB1_Set_Trig
 
 
 
@@ -314,23 +257,15 @@ def OB1_Set_Trig (OB1_ID, trigger):
  # 
  # Close Communication with AF1
  #
-def AF1_Destructor (AF1_ID_in):
-	X_AF1_Destructor=ElveflowDLL.AF1_Destructor
-	X_AF1_Destructor.argtypes=[c_int32]
-	return X_AF1_Destructor (AF1_ID_in)
+AF1_Destructor=ElveflowDLL.AF1_Destructor
 
-        self.AIOUSB.ADC_GetChannelV.argtypes = (ctypes.c_ulong, ctypes.c_ulong, ctypes.POINTER(ctypes.c_double))
-        self.AIOUSB.ADC_GetChannelV.restype = ctypes.c_ulong
 
  # Elveflow Library
  # AF1 Device
  # 
  # Get the Flow rate from the flow sensor connected on the AF1
  #
-def AF1_Get_Flow_rate (AF1_ID_in, Flow):
-	X_AF1_Get_Flow_rate=ElveflowDLL.AF1_Get_Flow_rate
-	X_AF1_Get_Flow_rate.argtypes=[c_int32, POINTER(c_double)]
-	return X_AF1_Get_Flow_rate (AF1_ID_in, Flow)
+AF1_Get_Flow_rate=ElveflowDLL.AF1_Get_Flow_rate
 
 
 
@@ -340,10 +275,7 @@ def AF1_Get_Flow_rate (AF1_ID_in, Flow):
  # Get the trigger of the AF1 device (0=0V, 1=5V).
  # 
  #
-def AF1_Get_Trig (AF1_ID_in, trigger):
-	X_AF1_Get_Trig=ElveflowDLL.AF1_Get_Trig
-	X_AF1_Get_Trig.argtypes=[c_int32, POINTER(c_int32)]
-	return X_AF1_Get_Trig (AF1_ID_in, trigger)
+AF1_Get_Trig=ElveflowDLL.AF1_Get_Trig
 
 
 
@@ -352,10 +284,7 @@ def AF1_Get_Trig (AF1_ID_in, trigger):
  # 
  # Set the Trigger of the AF1 device (0=0V, 1=5V).
  #
-def AF1_Set_Trig (AF1_ID_in, trigger):
-	X_AF1_Set_Trig=ElveflowDLL.AF1_Set_Trig
-	X_AF1_Set_Trig.argtypes=[c_int32, c_int32]
-	return X_AF1_Set_Trig (AF1_ID_in, trigger)
+AF1_Set_Trig=ElveflowDLL.AF1_Set_Trig
 
 
 
@@ -364,10 +293,7 @@ def AF1_Set_Trig (AF1_ID_in, trigger):
  # 
  # Close Communication with F_S_R.
  #
-def F_S_R_Destructor (F_S_Reader_ID_in):
-	X_F_S_R_Destructor=ElveflowDLL.F_S_R_Destructor
-	X_F_S_R_Destructor.argtypes=[c_int32]
-	return X_F_S_R_Destructor (F_S_Reader_ID_in)
+F_S_R_Destructor=ElveflowDLL.F_S_R_Destructor
 
 
 
@@ -376,10 +302,7 @@ def F_S_R_Destructor (F_S_Reader_ID_in):
  # 
  # Get the data from the selected channel.
  #
-def F_S_R_Get_Sensor_data (F_S_Reader_ID_in, Channel_1_to_4, output):
-	X_F_S_R_Get_Sensor_data=ElveflowDLL.F_S_R_Get_Sensor_data
-	X_F_S_R_Get_Sensor_data.argtypes=[c_int32, c_int32, POINTER(c_double)]
-	return X_F_S_R_Get_Sensor_data (F_S_Reader_ID_in, Channel_1_to_4, output)
+F_S_R_Get_Sensor_data=ElveflowDLL.F_S_R_Get_Sensor_data
 
 
 
@@ -388,10 +311,7 @@ def F_S_R_Get_Sensor_data (F_S_Reader_ID_in, Channel_1_to_4, output):
  # 
  # Close the communication of the MUX device
  #
-def MUX_Destructor (MUX_ID_in):
-	X_MUX_Destructor=ElveflowDLL.MUX_Destructor
-	X_MUX_Destructor.argtypes=[c_int32]
-	return X_MUX_Destructor (MUX_ID_in)
+MUX_Destructor=ElveflowDLL.MUX_Destructor
 
 
 
@@ -400,10 +320,7 @@ def MUX_Destructor (MUX_ID_in):
  # 
  # Get the trigger of the MUX device (0=0V, 1=5V).
  #
-def MUX_Get_Trig (MUX_ID_in, Trigger):
-	X_MUX_Get_Trig=ElveflowDLL.MUX_Get_Trig
-	X_MUX_Get_Trig.argtypes=[c_int32, POINTER(c_int32)]
-	return X_MUX_Get_Trig (MUX_ID_in, Trigger)
+MUX_Get_Trig=ElveflowDLL.MUX_Get_Trig
 
 
 
@@ -414,10 +331,7 @@ def MUX_Get_Trig (MUX_ID_in, Trigger):
  # addressed using Input and Output parameter which corresponds to the 
  # fluidics inputs and outputs of the instrument. 
  #
-def MUX_Set_indiv_valve (MUX_ID_in, Input, Ouput, OpenClose):
-	X_MUX_Set_indiv_valve=ElveflowDLL.MUX_Set_indiv_valve
-	X_MUX_Set_indiv_valve.argtypes=[c_int32, c_int32, c_int32, c_int32]
-	return X_MUX_Set_indiv_valve (MUX_ID_in, Input, Ouput, OpenClose)
+MUX_Set_indiv_valve=ElveflowDLL.MUX_Set_indiv_valve
 
 
 
@@ -426,10 +340,7 @@ def MUX_Set_indiv_valve (MUX_ID_in, Input, Ouput, OpenClose):
  # 
  # Set the Trigger of the MUX device (0=0V, 1=5V).
  #
-def MUX_Set_Trig (MUX_ID_in, Trigger):
-	X_MUX_Set_Trig=ElveflowDLL.MUX_Set_Trig
-	X_MUX_Set_Trig.argtypes=[c_int32, c_int32]
-	return X_MUX_Set_Trig (MUX_ID_in, Trigger)
+MUX_Set_Trig=ElveflowDLL.MUX_Set_Trig
 
 
 
@@ -438,10 +349,7 @@ def MUX_Set_Trig (MUX_ID_in, Trigger):
  # 
  # Close Communication with MUX distributor device
  #
-def MUX_Dist_Destructor (MUX_Dist_ID_in):
-	X_MUX_Dist_Destructor=ElveflowDLL.MUX_Dist_Destructor
-	X_MUX_Dist_Destructor.argtypes=[c_int32]
-	return X_MUX_Dist_Destructor (MUX_Dist_ID_in)
+MUX_Dist_Destructor=ElveflowDLL.MUX_Dist_Destructor
 
 
 
@@ -450,10 +358,7 @@ def MUX_Dist_Destructor (MUX_Dist_ID_in):
  # 
  # Get the active valve
  #
-def MUX_Dist_Get_Valve (MUX_Dist_ID_in, selected_Valve):
-	X_MUX_Dist_Get_Valve=ElveflowDLL.MUX_Dist_Get_Valve
-	X_MUX_Dist_Get_Valve.argtypes=[c_int32, POINTER(c_int32)]
-	return X_MUX_Dist_Get_Valve (MUX_Dist_ID_in, selected_Valve)
+MUX_Dist_Get_Valve=ElveflowDLL.MUX_Dist_Get_Valve
 
 
 
@@ -462,10 +367,7 @@ def MUX_Dist_Get_Valve (MUX_Dist_ID_in, selected_Valve):
  # 
  # Set the active valve
  #
-def MUX_Dist_Set_Valve (MUX_Dist_ID_in, selected_Valve):
-	X_MUX_Dist_Set_Valve=ElveflowDLL.MUX_Dist_Set_Valve
-	X_MUX_Dist_Set_Valve.argtypes=[c_int32, c_int32]
-	return X_MUX_Dist_Set_Valve (MUX_Dist_ID_in, selected_Valve)
+MUX_Dist_Set_Valve=ElveflowDLL.MUX_Dist_Set_Valve
 
 
 
@@ -488,10 +390,7 @@ def MUX_Dist_Set_Valve (MUX_Dist_ID_in, selected_Valve):
  # If the sensor is not compatible with the OB1 version, or no digital sensor 
  # are detected an error will be thrown as output of the function.
  #
-def OB1_Add_Sens (OB1_ID, Channel_1_to_4, SensorType, DigitalAnalog, FSens_Digit_Calib, FSens_Digit_Resolution):
-	X_OB1_Add_Sens=ElveflowDLL.OB1_Add_Sens
-	X_OB1_Add_Sens.argtypes=[c_int32, c_int32, c_uint16, c_uint16, c_uint16, ]
-	return X_OB1_Add_Sens (OB1_ID, Channel_1_to_4, SensorType, DigitalAnalog, FSens_Digit_Calib, FSens_Digit_Resolution)
+OB1_Add_Sens=ElveflowDLL.OB1_Add_Sens
 
 
 
@@ -500,10 +399,7 @@ def OB1_Add_Sens (OB1_ID, Channel_1_to_4, SensorType, DigitalAnalog, FSens_Digit
  # 
  # Close Communication with BFS device
  #
-def BFS_Destructor (BFS_ID_in):
-	X_BFS_Destructor=ElveflowDLL.BFS_Destructor
-	X_BFS_Destructor.argtypes=[c_int32]
-	return X_BFS_Destructor (BFS_ID_in)
+BFS_Destructor=ElveflowDLL.BFS_Destructor
 
 
 
@@ -514,10 +410,7 @@ def BFS_Destructor (BFS_ID_in):
  # the com port that could be found in windows device manager). It return the 
  # BFS ID (number >=0) to be used with other function 
  #
-def BFS_Initialization (Visa_COM, BFS_ID_out):
-	X_BFS_Initialization=ElveflowDLL.BFS_Initialization
-	X_BFS_Initialization.argtypes=[c_char_p, POINTER(c_int32)]
-	return X_BFS_Initialization (Visa_COM, BFS_ID_out)
+BFS_Initialization=ElveflowDLL.BFS_Initialization
 
 
 
@@ -526,10 +419,7 @@ def BFS_Initialization (Visa_COM, BFS_ID_out):
  # 
  # Get fluid density (in g/L) for the BFS defined by the BFS_ID
  #
-def BFS_Get_Density (BFS_ID_in, Density):
-	X_BFS_Get_Density=ElveflowDLL.BFS_Get_Density
-	X_BFS_Get_Density.argtypes=[c_int32, POINTER(c_double)]
-	return X_BFS_Get_Density (BFS_ID_in, Density)
+BFS_Get_Density=ElveflowDLL.BFS_Get_Density
 
 
 
@@ -543,10 +433,7 @@ def BFS_Get_Density (BFS_ID_in, Density):
  # the density might change. If you get +inf or -inf, the density wasn't 
  # correctly measured. 
  #
-def BFS_Get_Flow (BFS_ID_in, Flow):
-	X_BFS_Get_Flow=ElveflowDLL.BFS_Get_Flow
-	X_BFS_Get_Flow.argtypes=[c_int32, POINTER(c_double)]
-	return X_BFS_Get_Flow (BFS_ID_in, Flow)
+BFS_Get_Flow=ElveflowDLL.BFS_Get_Flow
 
 
 
@@ -555,10 +442,7 @@ def BFS_Get_Flow (BFS_ID_in, Flow):
  # 
  # Get the fluid temperature (in �C) of the BFS defined by the BFS_ID
  #
-def BFS_Get_Temperature (BFS_ID_in, Temperature):
-	X_BFS_Get_Temperature=ElveflowDLL.BFS_Get_Temperature
-	X_BFS_Get_Temperature.argtypes=[c_int32, POINTER(c_double)]
-	return X_BFS_Get_Temperature (BFS_ID_in, Temperature)
+BFS_Get_Temperature=ElveflowDLL.BFS_Get_Temperature
 
 
 
@@ -573,10 +457,7 @@ def BFS_Get_Temperature (BFS_ID_in, Temperature):
  # 
  # Default value is 0.1  
  #
-def BFS_Set_Filter (BFS_ID_in, Filter_value):
-	X_BFS_Set_Filter=ElveflowDLL.BFS_Set_Filter
-	X_BFS_Set_Filter.argtypes=[c_int32, c_double]
-	return X_BFS_Set_Filter (BFS_ID_in, Filter_value)
+BFS_Set_Filter=ElveflowDLL.BFS_Set_Filter
 
 
 
@@ -602,10 +483,7 @@ def BFS_Set_Filter (BFS_ID_in, Filter_value):
  # Integ=integral(I#e#dt) and can be reset. 
  #   
  #
-def Elveflow_EXAMPLE_PID (PID_ID_in, actualValue, Reset, P, I, PID_ID_out, value):
-	X_Elveflow_EXAMPLE_PID=ElveflowDLL.Elveflow_EXAMPLE_PID
-	X_Elveflow_EXAMPLE_PID.argtypes=[c_int32, c_double, c_int32, c_double, c_double, POINTER(c_int32), POINTER(c_double)]
-	return X_Elveflow_EXAMPLE_PID (PID_ID_in, actualValue, Reset, P, I, PID_ID_out, value)
+Elveflow_EXAMPLE_PID=ElveflowDLL.Elveflow_EXAMPLE_PID
 
 
 
@@ -617,10 +495,7 @@ def Elveflow_EXAMPLE_PID (PID_ID_in, actualValue, Reset, P, I, PID_ID_out, value
  # array does not contain exactly 16 element nothing happened
  # 
  #
-def MUX_Wire_Set_all_valves (MUX_ID_in, array_valve_in, len):
-	X_MUX_Wire_Set_all_valves=ElveflowDLL.MUX_Wire_Set_all_valves
-	X_MUX_Wire_Set_all_valves.argtypes=[c_int32, POINTER(c_int32), c_int32]
-	return X_MUX_Wire_Set_all_valves (MUX_ID_in, array_valve_in, len)
+MUX_Wire_Set_all_valves=ElveflowDLL.MUX_Wire_Set_all_valves
 
 
 
@@ -637,46 +512,28 @@ def MUX_Wire_Set_all_valves (MUX_ID_in, array_valve_in, len):
  # 
  # If only One channel need to be set, use OB1_Set_Pressure.
  #
-def OB1_Set_All_Press (OB1_ID, Pressure_array_in, Calib_array_in, Pressure_Array_Len, Calib_Array_Len):
-	X_OB1_Set_All_Press=ElveflowDLL.OB1_Set_All_Press
-	X_OB1_Set_All_Press.argtypes=[c_int32, POINTER(c_double), POINTER(c_double), c_int32, c_int32]
-	return X_OB1_Set_All_Press (OB1_ID, Pressure_array_in, Calib_array_in, Pressure_Array_Len, Calib_Array_Len)
+OB1_Set_All_Press=ElveflowDLL.OB1_Set_All_Press
 
 
 
  # BFS_Zeroing
  #
-def BFS_Zeroing (BFS_ID_in):
-	X_BFS_Zeroing=ElveflowDLL.BFS_Zeroing
-	X_BFS_Zeroing.argtypes=[c_int32]
-	return X_BFS_Zeroing (BFS_ID_in)
+BFS_Zeroing=ElveflowDLL.BFS_Zeroing
 
 
 
  # BFS_Get_Mass_Flow
  #
-def BFS_Get_Mass_Flow (BFS_ID_in, MassFlow):
-	X_BFS_Get_Mass_Flow=ElveflowDLL.BFS_Get_Mass_Flow
-	X_BFS_Get_Mass_Flow.argtypes=[c_int32, POINTER(c_double)]
-	return X_BFS_Get_Mass_Flow (BFS_ID_in, MassFlow)
+BFS_Get_Mass_Flow=ElveflowDLL.BFS_Get_Mass_Flow
 
 
 
  # OB1_Reset_Instr
  #
-def OB1_Reset_Instr (OB1_ID):
-	X_OB1_Reset_Instr=ElveflowDLL.OB1_Reset_Instr
-	X_OB1_Reset_Instr.argtypes=[c_int32]
-	return X_OB1_Reset_Instr (OB1_ID)
+OB1_Reset_Instr=ElveflowDLL.OB1_Reset_Instr
 
 
 
  # OB1_Reset_Digit_Sens
  #
-def OB1_Reset_Digit_Sens (OB1_ID, Channel_1_to_4):
-	X_OB1_Reset_Digit_Sens=ElveflowDLL.OB1_Reset_Digit_Sens
-	X_OB1_Reset_Digit_Sens.argtypes=[c_int32, c_int32]
-	return X_OB1_Reset_Digit_Sens (OB1_ID, Channel_1_to_4)
-
-
-	return 0
\ No newline at end of file
+OB1_Reset_Digit_Sens=ElveflowDLL.OB1_Reset_Digit_Sens
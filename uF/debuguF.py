@@ -1,12 +1,12 @@
 # ...for class debugging
 
+import os, sys
+sys.path.append(os.path.abspath('..'))   # Shared modules (Scheduler.py) live at the project root
 from uF import *
-import sys
 
 if __name__ == "__main__":
     app = QtWidgets.QApplication(sys.argv)
     window = uF()
-    window.DAQThread = threading.Thread(target=window.DataAcquisitionThread)
-    window.DAQThread.start()
+    window.StartAcquisition()
     window.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    sys.exit(app.exec_())
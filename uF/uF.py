@@ -9,17 +9,23 @@ Acquires USB data:
 Sets USB data:
     set pressure: all channels or one at a time
     event trigger
+Regulates flow:
+    FlowControl.FlowPID on channel 1, in its own thread
 E.Yafuso
 June 2019
 """
 
-import os
+import os, sys
 from ctypes import *
 import pandas
 import numpy as np
 import pyqtgraph
-from PyQt5 import QtWidgets, uic
+from PyQt5 import QtCore, QtWidgets, uic
 import threading, time
+from Scheduler import Scheduler
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Python_32'))
+import Elveflow     # Elveflow SDK bindings, shared with Python_32/Elveflow32.py
+from FlowControl import FlowPID
 
 
 class uF(QtWidgets.QMainWindow):
@@ -35,16 +41,20 @@ class uF(QtWidgets.QMainWindow):
         self.ui.setupUi(self)
         path = os.path.abspath("") + '\\uF\\Python_32\\DLL32\\Elveflow32.dll'
         try:
-            self.Elveflow = CDLL(path)
+            self.Elveflow = Elveflow.Load(path)
         except:
-            self.Elveflow = CDLL(os.path.abspath("") + '\\Python_32\\DLL32\\Elveflow32.dll')
+            self.Elveflow = Elveflow.Load(os.path.abspath("") + '\\Python_32\\DLL32\\Elveflow32.dll')
         self.bAcquiring = False
-        self.DAQThread = 0
+        self.Scheduler = Scheduler('uF')    # Worker thread polling the OB1
+        self.DataLock = threading.Lock()
+        self.DeviceLock = threading.Lock()     # One DLL call at a time on the OB1
+        self.PollRate = 100     # Hz
+        self.PlotRate = 30      # Hz
 
         # Initialize OB1 (Kenobi)
         self.Instr_ID = c_int32()
         # Error code = 0 if initialization successful
-        error = self.OB1_Initialization('01C9D9C3'.encode('ascii'), 1, 2, 4, 3, byref(self.Instr_ID))
+        error = self.Elveflow.OB1_Initialization('01C9D9C3'.encode('ascii'), 1, 2, 4, 3, byref(self.Instr_ID))
         if error:
             print("Device initialization error: ", error)
         else:
@@ -52,19 +62,22 @@ class uF(QtWidgets.QMainWindow):
             self.bAcquiring = True
 
         # Add digital flow sensor with water calibration
-        error = self.OB1_Add_Sens(self.Instr_ID, 1, 1, 1, 0, 7)
+        error = self.Elveflow.OB1_Add_Sens(self.Instr_ID, 1, 1, 1, 0, 7)
         if error:
             QtWidgets.QMessageBox.information(self, 'Elveflow ERROR', "Digital flow sensor failure.")
             self.bAcquiring = False
             print('Error adding digital flow sensor: %d' % error)
 
-        self.Cal = (c_double * 1000)()  # calibration should have 1000 elements
-        error = self.Elveflow_Calibration_Default(byref(self.Cal), 1000)
+        self.Cal = Elveflow.Calibration()
+        error = self.Elveflow.Elveflow_Calibration_Default(byref(self.Cal), Elveflow.CalibrationLength)
         if error:
             QtWidgets.QMessageBox.information(self, 'Elveflow ERROR', "Calibration failure.")
             self.bAcquiring = False
         # else:
         #     for i in range(0,1000): print('[',i,']: ',self.Cal[i])
+        self.OB1 = Elveflow.OB1(self.Elveflow, self.Instr_ID.value, self.Cal)
+        self.flowValue = c_double()
+        self.FlowControl = FlowPID(self.ReadFlow, self.WritePressure)   # Channel 1 flow regulation
 
         # Class attributes
         self.maxLen = 1000
@@ -90,6 +103,9 @@ class uF(QtWidgets.QMainWindow):
         self.pplot = self.p.plot([], pen=(0, 0, 255), linewidth=.5, name='P')
         self.psetplot = self.p.plot([], pen=(127, 127, 127), linewidth=.5, name='P-set')
         self.flowplot = self.f.plot([], pen=(0, 255, 0), linewidth=.5, name='Flow')
+        self.PlotTimer = QtCore.QTimer(self)
+        self.PlotTimer.timeout.connect(self.RefreshPlot)
+        self.PlotTimer.start(int(1000 / self.PlotRate))
 
         self.pset = 0
         self.ui.vsP.setMinimum(-900)
@@ -112,28 +128,42 @@ class uF(QtWidgets.QMainWindow):
         self.move(x, y)
 
     def setPressure(self):
+        # Manual pressure from the slider ends flow regulation
+        if self.FlowControl.IsRunning():
+            self.SetFlow(None)
         temp = self.ui.vsP.value()
-        self.pset = int(temp)
         self.ui.lsetPressure.setText(str(temp))
-
-        # Set actual pressure on OB-1...
-        set_channel = 1 #assume using channel 1 for now
-        set_channel = c_int32(set_channel)  # convert to c_int32
-        set_pressure = float(temp)
-        set_pressure = c_double(set_pressure)  # convert to c_double
-        error = self.OB1_Set_Press(self.Instr_ID.value, set_channel, set_pressure, byref(self.Cal), 1000)
+        self.WritePressure(float(temp))
+
+    def WritePressure(self, pressure):
+        # Set actual pressure on OB-1, channel 1; called from the GUI and FlowPID threads
+        with self.DeviceLock:
+            error = self.Elveflow.OB1_Set_Press(self.Instr_ID.value, 1, pressure, byref(self.Cal), Elveflow.CalibrationLength)
+        self.pset = pressure
+
+    def ReadFlow(self):
+        # Channel 1 sensor, acquired afresh on every call; None if the read fails
+        with self.DeviceLock:
+            error = self.Elveflow.OB1_Get_Sens_Data(self.Instr_ID.value, 1, 1, byref(self.flowValue))
+        return None if error else self.flowValue.value
+
+    def SetFlow(self, flow):
+        """Regulates channel 1 to flow (uL/min) in the FlowPID thread; None stops regulating."""
+        if flow is None:
+            self.FlowControl.Stop()
+            print("Flow regulation:", self.FlowControl.Summary())
+            return
+        self.FlowControl.SetTarget(flow)
+        self.FlowControl.Start(self.pset)
 
     def UpdateData(self, t):
         if self.bAcquiring:
-            data_in = c_double()
-            if self.OB1_Get_Press(self.Instr_ID.value, c_int32(1), 1, self.Cal, byref(data_in), 1000):
-                self.Pdata = np.append(self.Pdata, 0)
-            else:
-                self.Pdata = np.append(self.Pdata, float(data_in.value))
-            if self.OB1_Get_Sens_Data(self.Instr_ID.value, c_int32(1), 1, byref(data_in)):
-                self.Flowdata = np.append(self.Flowdata, 0)
-            else:
-                self.Flowdata = np.append(self.Flowdata, float(data_in.value))
+            # One USB acquisition per tick for every channel; channel 1 is plotted
+            with self.DeviceLock:
+                self.OB1.ReadAll()
+            p, flow = self.OB1.Pressure[0], self.OB1.Sensor[0]
+            self.Pdata = np.append(self.Pdata, 0 if np.isnan(p) else p)
+            self.Flowdata = np.append(self.Flowdata, 0 if np.isnan(flow) else flow)
             self.Psetdata = np.append(self.Psetdata, self.pset)
 
         if __debug__ and not self.bAcquiring:
@@ -142,116 +172,32 @@ class uF(QtWidgets.QMainWindow):
             self.Flowdata = np.append(self.Flowdata, (np.sin(t[-1] + 1)+1))
             self.Psetdata = np.append(self.Psetdata, self.pset)
 
-    def DataAcquisitionThread(self):
+    def StartAcquisition(self):
+        # Polling runs in this device's own thread; plotting stays on the Qt thread
         self.t0 = time.time()
-        while (self.bAcquiring):
-            time.sleep(0.01)
-            self.t = np.append(self.t, time.time() - self.t0)
-            self.UpdateData()
-            self.DataPlot(self.t)
+        self.Scheduler.Add('UpdateData', self.Poll, 1 / self.PollRate)
+        self.Scheduler.Start()
 
-        if __debug__ and not self.bAcquiring:
-            while True:
-                time.sleep(.01)
-                self.t = np.append(self.t, time.time() - self.t0)
+    def Poll(self):
+        with self.DataLock:
+            self.t = np.append(self.t, time.time() - self.t0)
+            if self.bAcquiring:
+                self.UpdateData(self.t)
+            elif __debug__:
                 self.Pdata = np.append(self.Pdata, (np.sin(self.t[-1])+1)*3000)
                 self.Flowdata = np.append(self.Flowdata, (np.sin(self.t[-1] + 1)+1))
                 self.Psetdata = np.append(self.Psetdata, self.pset)
-                self.DataPlot(self.t)
+
+    def RefreshPlot(self):
+        # Qt thread, at PlotRate
+        with self.DataLock:
+            self.DataPlot(self.t)
 
     def DataPlot(self, t):
         self.pplot.setData(t, self.Pdata)
         self.psetplot.setData(t, self.Psetdata)
         self.flowplot.setData(t, self.Flowdata)
 
-    def OB1_Initialization(self, Device_Name, Reg_Ch_1, Reg_Ch_2, Reg_Ch_3, Reg_Ch_4, OB1_ID_out):
-        X_OB1_Initialization = self.Elveflow.OB1_Initialization
-        X_OB1_Initialization.argtypes = [c_char_p, c_uint16, c_uint16, c_uint16, c_uint16, POINTER(c_int32)]
-        return X_OB1_Initialization(Device_Name, Reg_Ch_1, Reg_Ch_2, Reg_Ch_3, Reg_Ch_4, OB1_ID_out)
-
-    # Set default Cal in Cal cluster, len is the Cal_Array_out array length
-    # use ctypes c_double*1000 for calibration array
-    def Elveflow_Calibration_Default(self, Calib_Array_out, len):
-        X_Elveflow_Calibration_Default = self.Elveflow.Elveflow_Calibration_Default
-        X_Elveflow_Calibration_Default.argtypes = [POINTER(c_double * 1000), c_int32]
-        return X_Elveflow_Calibration_Default(Calib_Array_out, len)
-
-    def Elveflow_Calibration_Load(self, Path, Calib_Array_out, len):
-        X_Elveflow_Calibration_Load = self.Elveflow.Elveflow_Calibration_Load
-        X_Elveflow_Calibration_Load.argtypes = [c_char_p, POINTER(c_double * 1000), c_int32]
-        return X_Elveflow_Calibration_Load(Path, Calib_Array_out, len)
-
-    def Elveflow_Calibration_Save(self, Path, Calib_Array_in, len):
-        X_Elveflow_Calibration_Save = self.Elveflow.Elveflow_Calibration_Save
-        X_Elveflow_Calibration_Save.argtypes = [c_char_p, POINTER(c_double * 1000), c_int32]
-        return X_Elveflow_Calibration_Save(Path, Calib_Array_in, len)
-
-    def OB1_Calib(self, OB1_ID_in, Calib_array_out, len):
-        X_OB1_Calib = self.Elveflow.OB1_Calib
-        X_OB1_Calib.argtypes = [c_int32, POINTER(c_double * 1000), c_int32]
-        return X_OB1_Calib(OB1_ID_in, Calib_array_out, len)
-
-    def OB1_Get_Press(self, OB1_ID, Channel_1_to_4, Acquire_Data1True0False, Calib_array_in, Pressure, Calib_Array_len):
-        X_OB1_Get_Press = self.Elveflow.OB1_Get_Press
-        X_OB1_Get_Press.argtypes = [c_int32, c_int32, c_int32, POINTER(c_double * 1000), POINTER(c_double), c_int32]
-        return X_OB1_Get_Press(OB1_ID, Channel_1_to_4, Acquire_Data1True0False, Calib_array_in, Pressure,
-                               Calib_Array_len)
-
-    def OB1_Get_Sens_Data(self, OB1_ID, Channel_1_to_4, Acquire_Data1True0False, Sens_Data):
-        X_OB1_Get_Sens_Data = self.Elveflow.OB1_Get_Sens_Data
-        X_OB1_Get_Sens_Data.argtypes = [c_int32, c_int32, c_int32, POINTER(c_double)]
-        return X_OB1_Get_Sens_Data(OB1_ID, Channel_1_to_4, Acquire_Data1True0False, Sens_Data)
-
-    def OB1_Get_Trig(self, OB1_ID, Trigger):
-        X_OB1_Get_Trig = self.Elveflow.OB1_Get_Trig
-        X_OB1_Get_Trig.argtypes = [c_int32, POINTER(c_int32)]
-        return X_OB1_Get_Trig(OB1_ID, Trigger)
-
-    # Set the trigger of the OB1 (0 = 0V, 1 = 3.3V)
-    def OB1_Set_Trig(self, OB1_ID, trigger):
-        X_OB1_Set_Trig = self.Elveflow.OB1_Set_Trig
-        X_OB1_Set_Trig.argtypes = [c_int32, c_int32]
-        return X_OB1_Set_Trig(OB1_ID, trigger)
-
-    def OB1_Add_Sens(self, OB1_ID, Channel_1_to_4, SensorType, DigitalAnalog, FSens_Digit_Calib,
-                     FSens_Digit_Resolution):
-        X_OB1_Add_Sens = self.Elveflow.OB1_Add_Sens
-        X_OB1_Add_Sens.argtypes = [c_int32, c_int32, c_uint16, c_uint16, c_uint16, ]
-        return X_OB1_Add_Sens(OB1_ID, Channel_1_to_4, SensorType, DigitalAnalog, FSens_Digit_Calib,
-                              FSens_Digit_Resolution)
-
-    def OB1_Set_Press(self, OB1_ID, Channel_1_to_4, Pressure, Calib_array_in, Calib_Array_len):
-        X_OB1_Set_Press = self.Elveflow.OB1_Set_Press
-        X_OB1_Set_Press.argtypes = [c_int32, c_int32, c_double, POINTER(c_double * 1000), c_int32]
-        return X_OB1_Set_Press(OB1_ID, Channel_1_to_4, Pressure, Calib_array_in, Calib_Array_len)
-
-    def OB1_Set_All_Press(self, OB1_ID, Pressure_array_in, Calib_array_in, Pressure_Array_Len, Calib_Array_Len):
-        X_OB1_Set_All_Press = self.Elveflow.OB1_Set_All_Press
-        X_OB1_Set_All_Press.argtypes = [c_int32, POINTER(c_double), POINTER(c_double), c_int32, c_int32]
-        return X_OB1_Set_All_Press(OB1_ID, Pressure_array_in, Calib_array_in, Pressure_Array_Len, Calib_Array_Len)
-
-    def OB1_Reset_Instr(self, OB1_ID):
-        X_OB1_Reset_Instr = self.Elveflow.OB1_Reset_Instr
-        X_OB1_Reset_Instr.argtypes = [c_int32]
-        return X_OB1_Reset_Instr(OB1_ID)
-
-    def OB1_Reset_Digit_Sens(self, OB1_ID, Channel_1_to_4):
-        X_OB1_Reset_Digit_Sens = self.Elveflow.OB1_Reset_Digit_Sens
-        X_OB1_Reset_Digit_Sens.argtypes = [c_int32, c_int32]
-        return X_OB1_Reset_Digit_Sens(OB1_ID, Channel_1_to_4)
-
-    # For illustration: feedback loop idea
-    def Elveflow_EXAMPLE_PID(self, PID_ID_in, actualValue, Reset, P, I, PID_ID_out, value):
-        X_Elveflow_EXAMPLE_PID = self.Elveflow.Elveflow_EXAMPLE_PID
-        X_Elveflow_EXAMPLE_PID.argtypes = [c_int32, c_double, c_int32, c_double, c_double, POINTER(c_int32),
-                                           POINTER(c_double)]
-        return X_Elveflow_EXAMPLE_PID(PID_ID_in, actualValue, Reset, P, I, PID_ID_out, value)
-
-    def OB1_Destructor(self, OB1_ID):
-        X_OB1_Destructor = self.Elveflow.OB1_Destructor
-        X_OB1_Destructor.argtypes = [c_int32]
-        return X_OB1_Destructor(OB1_ID)
-
     def OpenScriptDialog(self):
         self.filename = QtWidgets.QFileDialog.getOpenFileName(self,
                                                               'Open file',
@@ -281,7 +227,10 @@ class uF(QtWidgets.QMainWindow):
                 i = i + k
 
     def ExecuteCmd(self, cmd, nIndent, i):
-        if cmd == 'wait':
+        if cmd == 'flow':
+            value = str(self.script[i][1+nIndent])
+            self.SetFlow(None if value == 'off' else float(value))  # uL/min, or off
+        elif cmd == 'wait':
             pause = float(self.script[i][1+nIndent]) / 1000 #wait in milliseconds
             time.sleep(pause)
         elif cmd == 'absolute':
@@ -307,9 +256,11 @@ class uF(QtWidgets.QMainWindow):
 
     def closeEvent(self, event):
         self.bAcquiring = False
-        if self.DAQThread and self.DAQThread != None:
-            self.DAQThread.join()
-
+        if self.FlowControl.IsRunning():
+            self.SetFlow(None)
+        if self.Scheduler.Thread is not None:
+            self.PlotTimer.stop()
+            self.Scheduler.Stop()
             event.accept()
         else:
             self.bShow = False